@@ -0,0 +1,137 @@
+from typing import List, Optional, Sequence
+
+import asyncpg
+
+from .connection import acquire
+
+__all__ = [
+    "create_job",
+    "claim_job",
+    "get_job",
+    "recent_jobs",
+    "running_job_ids",
+    "fetch_recipients",
+    "save_checkpoint",
+    "release_job",
+    "finish_job",
+    "cancel_job",
+    "mark_blocked",
+]
+
+
+async def create_job(created_by: int, from_chat_id: int, message_id: int) -> int:
+    async with acquire("broadcast.create_job") as conn:
+        return await conn.fetchval(
+            "INSERT INTO broadcast_jobs(created_by, from_chat_id, message_id) VALUES($1,$2,$3) RETURNING id",
+            created_by,
+            from_chat_id,
+            message_id,
+        )
+
+
+async def claim_job(job_id: int, lease_seconds: float) -> Optional[asyncpg.Record]:
+    """Берёт рассылку в работу, если её не выполняет другой экземпляр (аренда истекла)."""
+    async with acquire("broadcast.claim_job") as conn:
+        return await conn.fetchrow(
+            """
+            UPDATE broadcast_jobs SET lease_until = now() + make_interval(secs => $2)
+            WHERE id = $1 AND status = 'running' AND (lease_until IS NULL OR lease_until < now())
+            RETURNING *
+            """,
+            job_id,
+            lease_seconds,
+        )
+
+
+async def get_job(job_id: int) -> Optional[asyncpg.Record]:
+    async with acquire("broadcast.get_job") as conn:
+        return await conn.fetchrow("SELECT * FROM broadcast_jobs WHERE id=$1", job_id)
+
+
+async def recent_jobs(limit: int = 5) -> List[asyncpg.Record]:
+    async with acquire("broadcast.recent_jobs") as conn:
+        return await conn.fetch("SELECT * FROM broadcast_jobs ORDER BY id DESC LIMIT $1", limit)
+
+
+async def running_job_ids() -> List[int]:
+    async with acquire("broadcast.running_job_ids") as conn:
+        rows = await conn.fetch("SELECT id FROM broadcast_jobs WHERE status = 'running' ORDER BY id")
+    return [row["id"] for row in rows]
+
+
+async def fetch_recipients(after_user_id: int, limit: int) -> List[int]:
+    """Страница получателей с ``user_id > after_user_id`` по возрастанию, не больше ``limit``.
+
+    Каждая страница — отдельный короткий запрос по первичному ключу (keyset):
+    соединение не удерживается, пока страница рассылается, и снимок БД не
+    держит очистку ``bot_users``.
+    """
+    async with acquire("broadcast.fetch_recipients") as conn:
+        rows = await conn.fetch(
+            "SELECT user_id FROM bot_users WHERE user_id > $1 AND blocked_at IS NULL ORDER BY user_id LIMIT $2",
+            after_user_id,
+            limit,
+        )
+    return [row["user_id"] for row in rows]
+
+
+async def save_checkpoint(
+    job_id: int,
+    last_user_id: int,
+    sent: int,
+    failed: int,
+    blocked: int,
+    lease_seconds: float,
+) -> Optional[str]:
+    """Сохраняет прогресс и продлевает аренду. Возвращает текущий статус задания."""
+    async with acquire("broadcast.save_checkpoint") as conn:
+        return await conn.fetchval(
+            """
+            UPDATE broadcast_jobs
+            SET last_user_id = $2, sent = $3, failed = $4, blocked = $5,
+                lease_until = now() + make_interval(secs => $6)
+            WHERE id = $1
+            RETURNING status
+            """,
+            job_id,
+            last_user_id,
+            sent,
+            failed,
+            blocked,
+            lease_seconds,
+        )
+
+
+async def release_job(job_id: int) -> None:
+    """Снимает аренду: незавершённую рассылку сразу подхватит следующий запуск."""
+    async with acquire("broadcast.release_job") as conn:
+        await conn.execute("UPDATE broadcast_jobs SET lease_until = NULL WHERE id=$1", job_id)
+
+
+async def finish_job(job_id: int) -> None:
+    async with acquire("broadcast.finish_job") as conn:
+        await conn.execute(
+            "UPDATE broadcast_jobs SET status = 'done', finished_at = now(), lease_until = NULL "
+            "WHERE id=$1 AND status = 'running'",
+            job_id,
+        )
+
+
+async def cancel_job(job_id: int) -> bool:
+    async with acquire("broadcast.cancel_job") as conn:
+        result = await conn.execute(
+            "UPDATE broadcast_jobs SET status = 'cancelled', finished_at = now() WHERE id=$1 AND status = 'running'",
+            job_id,
+        )
+    return result.endswith(" 1")
+
+
+async def mark_blocked(user_ids: Sequence[int]) -> None:
+    """Помечает пользователей, заблокировавших бота: следующие рассылки их пропустят."""
+    if not user_ids:
+        return
+    async with acquire("broadcast.mark_blocked") as conn:
+        await conn.execute(
+            "UPDATE bot_users SET blocked_at = now() WHERE user_id = ANY($1::bigint[]) AND blocked_at IS NULL",
+            list(user_ids),
+        )
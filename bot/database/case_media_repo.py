@@ -0,0 +1,58 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+from .connection import acquire
+
+__all__ = [
+    "CaseMediaRef",
+    "load_case_media",
+    "save_case_media",
+]
+
+# (chat_id, message_ids)
+CaseMediaRef = Tuple[int, Sequence[int]]
+
+_UPSERT_SQL = """
+INSERT INTO case_media(user_id, chat_id, message_ids, updated_at)
+VALUES($1, $2, $3, now())
+ON CONFLICT (user_id) DO UPDATE
+SET chat_id = EXCLUDED.chat_id, message_ids = EXCLUDED.message_ids, updated_at = now()
+"""
+
+
+async def load_case_media(user_id: int, max_age: float) -> Optional[CaseMediaRef]:
+    """Сообщения кейса пользователя, если запись моложе ``max_age`` секунд."""
+    async with acquire("case_media.load_case_media") as conn:
+        row = await conn.fetchrow(
+            "SELECT chat_id, message_ids FROM case_media "
+            "WHERE user_id=$1 AND updated_at > now() - make_interval(secs => $2)",
+            user_id,
+            max_age,
+        )
+    if row is None:
+        return None
+    return row["chat_id"], row["message_ids"]
+
+
+async def save_case_media(batch: Dict[int, Optional[CaseMediaRef]], max_age: float) -> None:
+    """Пишет пачку изменений одной транзакцией; None — удалить запись.
+
+    Заодно удаляет записи старше ``max_age``: такие сообщения Telegram
+    уже не даст удалить.
+    """
+    upserts = []
+    deletes = []
+    for user_id, ref in batch.items():
+        if ref is None or not ref[1]:
+            deletes.append(user_id)
+        else:
+            upserts.append((user_id, ref[0], list(ref[1])))
+    async with acquire("case_media.save_case_media") as conn:
+        async with conn.transaction():
+            if deletes:
+                await conn.execute("DELETE FROM case_media WHERE user_id = ANY($1::bigint[])", deletes)
+            if upserts:
+                await conn.executemany(_UPSERT_SQL, upserts)
+            await conn.execute(
+                "DELETE FROM case_media WHERE updated_at < now() - make_interval(secs => $1)",
+                max_age,
+            )
@@ -0,0 +1,48 @@
+import asyncpg
+from typing import Any, Callable, Dict
+
+from config import settings
+from .connection import acquire
+
+__all__ = [
+    "CATALOG_CHANNEL",
+    "fetch_catalog",
+    "listen_catalog_changes",
+]
+
+CATALOG_CHANNEL = "catalog_changed"
+
+
+async def fetch_catalog() -> Dict[str, Any]:
+    """Читает справочник целиком из одного согласованного снимка БД."""
+    async with acquire("catalog.fetch_catalog") as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            version = await conn.fetchval("SELECT version FROM catalog_meta")
+            templates = await conn.fetch(
+                "SELECT key, name, base_price, description, emoji FROM catalog_templates ORDER BY position, key"
+            )
+            modules = await conn.fetch(
+                "SELECT key, name, price, description, emoji FROM catalog_modules ORDER BY position, key"
+            )
+            support = await conn.fetch("SELECT key, name, price, emoji FROM catalog_support ORDER BY position, key")
+            included = await conn.fetch(
+                "SELECT template_key, module_key FROM catalog_template_modules ORDER BY template_key, position"
+            )
+    return {
+        "version": version,
+        "templates": [dict(row) for row in templates],
+        "modules": [dict(row) for row in modules],
+        "support": [dict(row) for row in support],
+        "included": [(row["template_key"], row["module_key"]) for row in included],
+    }
+
+
+async def listen_catalog_changes(callback: Callable[[str], None]) -> asyncpg.Connection:
+    """Открывает отдельное соединение и подписывается на NOTIFY catalog_changed.
+
+    ``callback`` получает payload уведомления (новую версию справочника).
+    Соединение живёт вне пула: LISTEN привязан к конкретной сессии.
+    """
+    conn = await asyncpg.connect(dsn=settings.database_url)
+    await conn.add_listener(CATALOG_CHANNEL, lambda _conn, _pid, _channel, payload: callback(payload))
+    return conn
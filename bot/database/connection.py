@@ -1,18 +1,110 @@
 import asyncpg
-from typing import Optional
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from config import settings
+from utils.metrics import REGISTRY
 
 _pool: Optional[asyncpg.Pool] = None
+# Хуки, выполняемые перед закрытием пула (сброс буферов отложенной записи)
+_shutdown_hooks: List[Callable[[], Awaitable[None]]] = []
+
+# Метрики пула: ожидание свободного соединения и время операций репозиториев
+_acquire_wait = REGISTRY.histogram(
+    "db_pool_acquire_wait_seconds", "Ожидание свободного соединения пула"
+).labels()
+_operation_duration = REGISTRY.histogram(
+    "db_operation_duration_seconds", "Время работы операции репозитория с соединением", ("operation",)
+)
+_connections_opened = REGISTRY.counter(
+    "db_connections_opened_total", "Открыто соединений пулом (включая пересоздание)"
+).labels()
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Вызывается для каждого нового соединения пула (учёт пересоздания соединений)."""
+    _connections_opened.inc()
+
+async def init_pool() -> asyncpg.Pool:
+    """Создаёт пул по настройкам и прогревает его. Вызывается при старте бота."""
+    global _pool
+    if _pool is None:
+        _pool = await asyncpg.create_pool(
+            dsn=settings.database_url,
+            min_size=settings.db_pool_min_size,
+            max_size=settings.db_pool_max_size,
+            max_queries=settings.db_max_queries,
+            max_inactive_connection_lifetime=settings.db_max_inactive_connection_lifetime,
+            statement_cache_size=settings.db_statement_cache_size,
+            command_timeout=settings.db_command_timeout,
+            init=_init_connection,
+            server_settings={"application_name": "iwebix_bot", "timezone": "UTC"},
+        )
+        # первый запрос после деплоя не должен платить за установку соединения
+        async with _pool.acquire() as conn:
+            await conn.fetchval("SELECT 1")
+    return _pool
 
 async def get_pool() -> asyncpg.Pool:
     """Возвращает глобальный пул подключений к базе данных PostgreSQL."""
-    global _pool
     if _pool is None:
-        _pool = await asyncpg.create_pool(dsn=settings.database_url)
+        return await init_pool()
     return _pool
 
+@asynccontextmanager
+async def acquire(name: str) -> AsyncIterator[asyncpg.Connection]:
+    """Соединение из пула с учётом метрик.
+
+    ``name`` — имя операции репозитория (например, ``"user.load_user"``),
+    по нему копится гистограмма времени работы с соединением.
+    """
+    pool = await get_pool()
+    started = time.perf_counter()
+    async with pool.acquire() as conn:
+        acquired = time.perf_counter()
+        _acquire_wait.observe(acquired - started)
+        try:
+            yield conn
+        finally:
+            _operation_duration.labels(name).observe(time.perf_counter() - acquired)
+
+def pool_stats() -> Dict[str, Any]:
+    """Состояние пула и накопленные гистограммы (ожидание acquire, время операций)."""
+    stats: Dict[str, Any] = {
+        "size": 0,
+        "idle": 0,
+        "in_use": 0,
+        "min_size": settings.db_pool_min_size,
+        "max_size": settings.db_pool_max_size,
+        "connections_opened": _connections_opened.value,
+        "acquire_wait": _acquire_wait.snapshot(),
+        "queries": {values[0]: hist.snapshot() for values, hist in _operation_duration.items()},
+    }
+    if _pool is not None:
+        stats["size"] = _pool.get_size()
+        stats["idle"] = _pool.get_idle_size()
+        stats["in_use"] = stats["size"] - stats["idle"]
+    return stats
+
+def _pool_gauges() -> Dict[Tuple[str, ...], float]:
+    if _pool is None:
+        return {}
+    size, idle = _pool.get_size(), _pool.get_idle_size()
+    return {("in_use",): size - idle, ("idle",): idle}
+
+REGISTRY.gauge("db_pool_connections", "Соединения пула по состоянию", _pool_gauges, ("state",))
+
+def register_shutdown_hook(hook: Callable[[], Awaitable[None]]) -> None:
+    """Регистрирует корутину, которую close_pool выполнит до закрытия пула."""
+    _shutdown_hooks.append(hook)
+
 async def close_pool() -> None:
-    """Закрывает пул при завершении работы приложения."""
+    """Сбрасывает буферы и закрывает пул при завершении работы приложения."""
+    for hook in _shutdown_hooks:
+        try:
+            await hook()
+        except Exception:
+            logging.exception("Ошибка в shutdown-хуке %r", hook)
     if _pool and not _pool._closed:
-        await _pool.close() 
\ No newline at end of file
+        await _pool.close()
\ No newline at end of file
@@ -0,0 +1,60 @@
+from typing import Any, Dict, List, Optional
+
+from .connection import acquire
+
+__all__ = [
+    "fetch_coupons",
+    "redeem_coupon",
+]
+
+# Погашение занимает строку купона (UPDATE держит блокировку до конца транзакции),
+# поэтому параллельные нажатия по одному купону выполняются по очереди: общий лимит
+# проверяется условием UPDATE, а лимит на пользователя — следующей командой, которая
+# уже видит погашения, завершившиеся до получения блокировки.
+_CLAIM_SQL = """
+UPDATE coupons SET used_count = used_count + 1
+WHERE code = $1 AND active
+  AND (expires_at IS NULL OR expires_at > now())
+  AND (max_uses IS NULL OR used_count < max_uses)
+RETURNING per_user_limit
+"""
+
+_RECORD_SQL = """
+INSERT INTO coupon_redemptions(code, user_id)
+SELECT $1, $2
+WHERE (SELECT count(*) FROM coupon_redemptions WHERE code = $1 AND user_id = $2) < $3
+RETURNING id
+"""
+
+
+class _LimitReached(Exception):
+    """Откатывает транзакцию погашения: пользователь исчерпал свой лимит."""
+
+
+async def fetch_coupons() -> List[Dict[str, Any]]:
+    """Действующие купоны: истёкшие и выключенные не загружаются."""
+    async with acquire("coupon.fetch_coupons") as conn:
+        rows = await conn.fetch(
+            "SELECT code, discount_type, discount_value, expires_at FROM coupons "
+            "WHERE active AND (expires_at IS NULL OR expires_at > now())"
+        )
+    return [dict(row) for row in rows]
+
+
+async def redeem_coupon(code: str, user_id: int) -> Optional[bool]:
+    """Погашает купон за пользователя.
+
+    True — погашен; False — пользователь уже исчерпал свой лимит по купону;
+    None — купона нет, он истёк, выключен или исчерпан общий лимит.
+    """
+    async with acquire("coupon.redeem_coupon") as conn:
+        try:
+            async with conn.transaction():
+                per_user_limit = await conn.fetchval(_CLAIM_SQL, code)
+                if per_user_limit is None:
+                    return None
+                if await conn.fetchval(_RECORD_SQL, code, user_id, per_user_limit) is None:
+                    raise _LimitReached
+        except _LimitReached:
+            return False
+    return True
@@ -0,0 +1,141 @@
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from .connection import acquire
+
+__all__ = [
+    "EventRecord",
+    "FunnelStep",
+    "load_event_keys",
+    "register_event_keys",
+    "save_funnel_steps",
+    "save_events",
+    "ensure_event_partitions",
+    "refresh_funnel_rollups",
+    "fetch_funnel",
+]
+
+# (ts, user_id, key_id)
+EventRecord = Tuple[datetime, int, int]
+# (funnel, key_id, step, name)
+FunnelStep = Tuple[str, int, int, str]
+
+# Ключ advisory lock: агрегаты воронок пересчитывает один экземпляр за раз
+_ROLLUP_LOCK_KEY = 7_240_312
+
+_ROLLUP_USERS_SQL = """
+WITH new_seen AS (
+    INSERT INTO funnel_seen(funnel, step, day, user_id)
+    SELECT DISTINCT s.funnel, s.step, e.ts::date, e.user_id
+    FROM interaction_events e
+    JOIN funnel_steps s ON s.key_id = e.key_id
+    WHERE e.ts > $1 AND e.ts <= $2
+    ON CONFLICT DO NOTHING
+    RETURNING funnel, step, day
+)
+INSERT INTO funnel_daily(funnel, step, day, users)
+SELECT funnel, step, day, count(*) FROM new_seen GROUP BY funnel, step, day
+ON CONFLICT (funnel, step, day) DO UPDATE SET users = funnel_daily.users + EXCLUDED.users
+"""
+
+_ROLLUP_EVENTS_SQL = """
+INSERT INTO funnel_daily(funnel, step, day, events)
+SELECT s.funnel, s.step, e.ts::date, count(*)
+FROM interaction_events e
+JOIN funnel_steps s ON s.key_id = e.key_id
+WHERE e.ts > $1 AND e.ts <= $2
+GROUP BY s.funnel, s.step, e.ts::date
+ON CONFLICT (funnel, step, day) DO UPDATE SET events = funnel_daily.events + EXCLUDED.events
+"""
+
+
+async def load_event_keys() -> Dict[str, int]:
+    async with acquire("events.load_event_keys") as conn:
+        rows = await conn.fetch("SELECT id, key FROM interaction_keys")
+    return {row["key"]: row["id"] for row in rows}
+
+
+async def register_event_keys(keys: Sequence[str]) -> Dict[str, int]:
+    """Заводит коды для новых ключей и возвращает {key: id} для всех переданных."""
+    async with acquire("events.register_event_keys") as conn:
+        await conn.execute(
+            "INSERT INTO interaction_keys(key) SELECT unnest($1::text[]) ON CONFLICT (key) DO NOTHING",
+            list(keys),
+        )
+        rows = await conn.fetch("SELECT id, key FROM interaction_keys WHERE key = ANY($1::text[])", list(keys))
+    return {row["key"]: row["id"] for row in rows}
+
+
+async def save_funnel_steps(steps: Iterable[FunnelStep], *, replace: bool = False) -> None:
+    """Сохраняет соответствие ключей шагам воронок. ``replace`` — заменить целиком."""
+    steps = list(steps)
+    async with acquire("events.save_funnel_steps") as conn:
+        async with conn.transaction():
+            if replace:
+                await conn.execute("DELETE FROM funnel_steps")
+            if steps:
+                await conn.executemany(
+                    "INSERT INTO funnel_steps(funnel, key_id, step, name) VALUES($1,$2,$3,$4) "
+                    "ON CONFLICT (funnel, key_id) DO UPDATE SET step = EXCLUDED.step, name = EXCLUDED.name",
+                    steps,
+                )
+
+
+async def save_events(records: List[EventRecord]) -> None:
+    """Пишет пачку событий одним COPY."""
+    async with acquire("events.save_events") as conn:
+        await conn.copy_records_to_table(
+            "interaction_events",
+            records=records,
+            columns=("ts", "user_id", "key_id"),
+        )
+
+
+async def ensure_event_partitions(months_ahead: int = 1) -> None:
+    async with acquire("events.ensure_event_partitions") as conn:
+        await conn.execute("SELECT ensure_interaction_event_partitions($1)", months_ahead)
+
+
+async def refresh_funnel_rollups(lag_seconds: float) -> bool:
+    """Досчитывает агрегаты по событиям, появившимся с прошлого пересчёта.
+
+    Обрабатываются события старше ``lag_seconds``: к этому моменту все
+    экземпляры успевают сбросить свои буферы. Возвращает False, если пересчёт
+    уже выполняет другой экземпляр.
+    """
+    async with acquire("events.refresh_funnel_rollups") as conn:
+        async with conn.transaction():
+            if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)", _ROLLUP_LOCK_KEY):
+                return False
+            bounds = await conn.fetchrow(
+                "SELECT last_ts AS low, now() - make_interval(secs => $1) AS high "
+                "FROM funnel_rollup_state FOR UPDATE",
+                lag_seconds,
+            )
+            low, high = bounds["low"], bounds["high"]
+            await conn.execute(_ROLLUP_USERS_SQL, low, high)
+            await conn.execute(_ROLLUP_EVENTS_SQL, low, high)
+            await conn.execute("UPDATE funnel_rollup_state SET last_ts = greatest(last_ts, $1)", high)
+    return True
+
+
+async def fetch_funnel(funnel: str, since: date, until: date) -> List[Tuple[int, str, int, int]]:
+    """Воронка за период: [(step, name, users, events)] по порядку шагов.
+
+    ``users`` — сумма дневных уникальных пользователей шага.
+    """
+    async with acquire("events.fetch_funnel") as conn:
+        rows = await conn.fetch(
+            """
+            SELECT d.step, min(s.name) AS name, sum(d.users) AS users, sum(d.events) AS events
+            FROM funnel_daily d
+            JOIN (SELECT DISTINCT funnel, step, name FROM funnel_steps) s USING (funnel, step)
+            WHERE d.funnel = $1 AND d.day BETWEEN $2 AND $3
+            GROUP BY d.step
+            ORDER BY d.step
+            """,
+            funnel,
+            since,
+            until,
+        )
+    return [(row["step"], row["name"], int(row["users"]), int(row["events"])) for row in rows]
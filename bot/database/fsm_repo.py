@@ -0,0 +1,75 @@
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from .connection import acquire
+from .user_repo import USER_COLUMNS, UserRow, user_from_record
+
+__all__ = [
+    "FSMKey",
+    "FSMRecord",
+    "load_state",
+    "load_state_with_user",
+    "save_states",
+]
+
+# (bot_id, chat_id, user_id, destiny)
+FSMKey = Tuple[int, int, int, str]
+# (state, data)
+FSMRecord = Tuple[Optional[str], Dict[str, Any]]
+
+_UPSERT_SQL = """
+INSERT INTO fsm_states(bot_id, chat_id, user_id, destiny, state, data, updated_at)
+VALUES($1, $2, $3, $4, $5, $6::jsonb, now())
+ON CONFLICT (bot_id, chat_id, user_id, destiny) DO UPDATE
+SET state = EXCLUDED.state, data = EXCLUDED.data, updated_at = now()
+"""
+
+# состояние и строка bot_users за одно обращение; каждой из строк может не быть
+_LOAD_WITH_USER_SQL = f"""
+SELECT f.state, f.data, {USER_COLUMNS}
+FROM (SELECT $1::bigint AS bot_id, $2::bigint AS chat_id, $3::bigint AS user_id, $4::text AS destiny) k
+LEFT JOIN fsm_states f
+    ON f.bot_id = k.bot_id AND f.chat_id = k.chat_id AND f.user_id = k.user_id AND f.destiny = k.destiny
+LEFT JOIN bot_users u ON u.user_id = k.user_id
+"""
+
+_DELETE_SQL = """
+DELETE FROM fsm_states
+WHERE bot_id=$1 AND chat_id=$2 AND user_id=$3 AND destiny=$4
+"""
+
+
+async def load_state(key: FSMKey) -> Optional[FSMRecord]:
+    async with acquire("fsm.load_state") as conn:
+        row = await conn.fetchrow(
+            "SELECT state, data FROM fsm_states WHERE bot_id=$1 AND chat_id=$2 AND user_id=$3 AND destiny=$4",
+            *key,
+        )
+    if row is None:
+        return None
+    return row["state"], json.loads(row["data"])
+
+
+async def load_state_with_user(key: FSMKey) -> Tuple[Optional[FSMRecord], UserRow]:
+    """Состояние FSM вместе с данными пользователя ``key``: один запрос вместо двух."""
+    async with acquire("fsm.load_state_with_user") as conn:
+        row = await conn.fetchrow(_LOAD_WITH_USER_SQL, *key)
+    record = (row["state"], json.loads(row["data"])) if row["data"] is not None else None
+    return record, user_from_record(row)
+
+
+async def save_states(batch: Dict[FSMKey, FSMRecord]) -> None:
+    """Пишет пачку состояний одной транзакцией. Пустые записи удаляются."""
+    upserts = []
+    deletes = []
+    for key, (state, data) in batch.items():
+        if state is None and not data:
+            deletes.append(key)
+        else:
+            upserts.append((*key, state, json.dumps(data, ensure_ascii=False)))
+    async with acquire("fsm.save_states") as conn:
+        async with conn.transaction():
+            if deletes:
+                await conn.executemany(_DELETE_SQL, deletes)
+            if upserts:
+                await conn.executemany(_UPSERT_SQL, upserts)
@@ -0,0 +1,98 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Dict, Optional
+from weakref import WeakValueDictionary
+
+from aiogram import Bot
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from config import settings
+from utils.cache import MISSING, TTLCache
+from .connection import register_shutdown_hook
+from .fsm_repo import FSMKey, FSMRecord, load_state, load_state_with_user, save_states
+from .user_repo import remember_user, user_cached
+from .write_behind import WriteBehindBuffer
+
+__all__ = ["PostgresStorage"]
+
+
+def _db_key(key: StorageKey) -> FSMKey:
+    return key.bot_id, key.chat_id, key.user_id, key.destiny
+
+
+class PostgresStorage(BaseStorage):
+    """FSM-хранилище: горячий слой в памяти + персистентность в PostgreSQL.
+
+    Активные состояния читаются из ограниченного LRU/TTL-кэша. Изменения сразу
+    видны в кэше, а в таблицу ``fsm_states`` попадают пачками через
+    write-behind буфер. TTL кэша ограничивает время, в течение которого
+    экземпляр может не видеть изменений, сделанных другим экземпляром.
+
+    Если состояния нет в памяти, а пользователя нет и в кэше ``user_repo``,
+    строка ``bot_users`` читается тем же запросом: первый апдейт «холодного»
+    пользователя обходится одним обращением к БД, а не двумя.
+    """
+
+    def __init__(self) -> None:
+        self._hot: TTLCache[FSMKey, FSMRecord] = TTLCache(
+            maxsize=settings.fsm_hot_size,
+            ttl=settings.fsm_hot_ttl,
+        )
+        self._buffer: WriteBehindBuffer[FSMKey, FSMRecord] = WriteBehindBuffer(
+            save_states,
+            interval=settings.fsm_flush_interval,
+            max_batch=settings.fsm_flush_batch_size,
+            name="fsm_states",
+        )
+        self._locks: "WeakValueDictionary[FSMKey, asyncio.Lock]" = WeakValueDictionary()
+        register_shutdown_hook(self._buffer.close)
+
+    async def _get_record(self, key: FSMKey) -> FSMRecord:
+        record = self._hot.get(key)
+        if record is MISSING:
+            record = self._buffer.get(key)
+        if record is MISSING:
+            user_id = key[2]
+            if user_cached(user_id):
+                loaded = await load_state(key)
+            else:
+                loaded, user = await load_state_with_user(key)
+                remember_user(user_id, user)
+            record = loaded or (None, {})
+        self._hot.set(key, record)
+        return record
+
+    def _put_record(self, key: FSMKey, record: FSMRecord) -> None:
+        self._hot.set(key, record)
+        self._buffer.put(key, record)
+
+    @asynccontextmanager
+    async def lock(self, bot: Bot, key: StorageKey) -> AsyncGenerator[None, None]:
+        db_key = _db_key(key)
+        lock = self._locks.get(db_key)
+        if lock is None:
+            lock = self._locks[db_key] = asyncio.Lock()
+        async with lock:
+            yield None
+
+    async def set_state(self, bot: Bot, key: StorageKey, state: StateType = None) -> None:
+        db_key = _db_key(key)
+        _, data = await self._get_record(db_key)
+        self._put_record(db_key, (state.state if isinstance(state, State) else state, data))
+
+    async def get_state(self, bot: Bot, key: StorageKey) -> Optional[str]:
+        state, _ = await self._get_record(_db_key(key))
+        return state
+
+    async def set_data(self, bot: Bot, key: StorageKey, data: Dict[str, Any]) -> None:
+        db_key = _db_key(key)
+        state, _ = await self._get_record(db_key)
+        self._put_record(db_key, (state, data.copy()))
+
+    async def get_data(self, bot: Bot, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._get_record(_db_key(key))
+        return data.copy()
+
+    async def close(self) -> None:
+        await self._buffer.flush()
@@ -0,0 +1,31 @@
+from typing import Dict, Tuple
+
+from .connection import acquire
+
+__all__ = [
+    "get_file_ids",
+    "save_file_id",
+]
+
+async def get_file_ids() -> Dict[Tuple[str, str], str]:
+    """Все сохранённые file_id в виде {(path, content_hash): file_id}."""
+    async with acquire("media.get_file_ids") as conn:
+        rows = await conn.fetch("SELECT path, content_hash, file_id FROM media_files")
+        return {(row["path"], row["content_hash"]): row["file_id"] for row in rows}
+
+async def save_file_id(path: str, content_hash: str, file_id: str) -> None:
+    """Сохраняет file_id для актуальной версии файла и удаляет устаревшие версии."""
+    async with acquire("media.save_file_id") as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "DELETE FROM media_files WHERE path=$1 AND content_hash<>$2",
+                path,
+                content_hash,
+            )
+            await conn.execute(
+                "INSERT INTO media_files(path, content_hash, file_id) VALUES($1,$2,$3) "
+                "ON CONFLICT (path, content_hash) DO UPDATE SET file_id = $3, uploaded_at = now()",
+                path,
+                content_hash,
+                file_id,
+            )
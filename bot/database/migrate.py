@@ -0,0 +1,58 @@
+import logging
+from pathlib import Path
+from typing import List, Tuple
+
+from .connection import acquire
+
+__all__ = [
+    "MIGRATIONS_DIR",
+    "run_migrations",
+]
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+# Ключ advisory lock: несколько экземпляров бота не применяют миграции одновременно
+_ADVISORY_LOCK_KEY = 7_240_311
+
+_VERSION_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version    INTEGER PRIMARY KEY,
+    name       TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+
+def _load_migrations() -> List[Tuple[int, str, str]]:
+    """Читает файлы вида ``0001_name.sql`` и возвращает [(version, name, sql)] по порядку."""
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        version, _, name = path.stem.partition("_")
+        migrations.append((int(version), name, path.read_text(encoding="utf-8")))
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Duplicate migration versions in %s" % MIGRATIONS_DIR)
+    return migrations
+
+
+async def run_migrations() -> None:
+    """Применяет недостающие миграции. Вызывается один раз при старте бота."""
+    migrations = _load_migrations()
+    async with acquire("migrate.run_migrations") as conn:
+        await conn.execute("SELECT pg_advisory_lock($1)", _ADVISORY_LOCK_KEY)
+        try:
+            await conn.execute(_VERSION_TABLE_SQL)
+            applied = {row["version"] for row in await conn.fetch("SELECT version FROM schema_version")}
+            for version, name, sql in migrations:
+                if version in applied:
+                    continue
+                async with conn.transaction():
+                    await conn.execute(sql)
+                    await conn.execute(
+                        "INSERT INTO schema_version(version, name) VALUES($1,$2)",
+                        version,
+                        name,
+                    )
+                logging.info("Применена миграция %04d_%s", version, name)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _ADVISORY_LOCK_KEY)
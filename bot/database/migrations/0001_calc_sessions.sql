@@ -0,0 +1,8 @@
+CREATE TABLE IF NOT EXISTS calc_sessions (
+    user_id   BIGINT PRIMARY KEY,
+    step      SMALLINT NOT NULL DEFAULT 1,
+    category  TEXT,
+    template  TEXT,
+    modules   TEXT[] DEFAULT '{}',
+    support   TEXT
+);
@@ -0,0 +1,4 @@
+CREATE TABLE IF NOT EXISTS bot_users (
+    user_id BIGINT PRIMARY KEY,
+    coupon_code TEXT
+);
@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS media_files (
+    path         TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    file_id      TEXT NOT NULL,
+    uploaded_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (path, content_hash)
+);
@@ -0,0 +1,15 @@
+CREATE TABLE IF NOT EXISTS fsm_states (
+    bot_id     BIGINT NOT NULL,
+    chat_id    BIGINT NOT NULL,
+    user_id    BIGINT NOT NULL,
+    destiny    TEXT NOT NULL DEFAULT 'default',
+    state      TEXT,
+    data       JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (bot_id, chat_id, user_id, destiny)
+);
+
+CREATE INDEX IF NOT EXISTS fsm_states_user_id_idx ON fsm_states (user_id);
+
+-- состояние мастера теперь целиком хранится в fsm_states
+DROP TABLE IF EXISTS calc_sessions;
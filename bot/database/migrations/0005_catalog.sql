@@ -0,0 +1,142 @@
+-- Справочник калькулятора: шаблоны, модули, пакеты поддержки.
+-- Любое изменение увеличивает catalog_meta.version и шлёт NOTIFY catalog_changed,
+-- по которому работающие экземпляры бота перечитывают справочник без рестарта.
+
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    id      BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 1
+);
+INSERT INTO catalog_meta(id, version) VALUES (TRUE, 1) ON CONFLICT (id) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS catalog_templates (
+    key         TEXT PRIMARY KEY,
+    name        TEXT NOT NULL,
+    base_price  INTEGER NOT NULL CHECK (base_price >= 0),
+    description TEXT NOT NULL DEFAULT '',
+    emoji       TEXT,
+    position    SMALLINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS catalog_modules (
+    key         TEXT PRIMARY KEY,
+    name        TEXT NOT NULL,
+    price       INTEGER NOT NULL CHECK (price >= 0),
+    description TEXT NOT NULL DEFAULT '',
+    emoji       TEXT,
+    position    SMALLINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS catalog_support (
+    key      TEXT PRIMARY KEY,
+    name     TEXT NOT NULL,
+    price    INTEGER NOT NULL CHECK (price >= 0),
+    emoji    TEXT,
+    position SMALLINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS catalog_template_modules (
+    template_key TEXT NOT NULL REFERENCES catalog_templates(key) ON DELETE CASCADE,
+    module_key   TEXT NOT NULL REFERENCES catalog_modules(key) ON DELETE CASCADE,
+    position     SMALLINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (template_key, module_key)
+);
+
+INSERT INTO catalog_templates(key, name, base_price, description, emoji, position) VALUES
+    ('infobot', 'Информационный-бот', 20000, 'Автоматически отвечает на вопросы, представляет портфолио 24/7', '🤖', 0),
+    ('tickets', 'Продажа билетов', 30000, 'Онлайн-продажа билетов и мест на мероприятия прямо в Telegram', '🎟️', 1),
+    ('schedule', 'Продажа услуг (запись)', 35000, 'Автоматическая запись клиентов, свободные окна, напоминания, аналитика в админке', '📆', 2),
+    ('courses', 'Продажа курсов', 35000, 'Демонстрация продукта, продажа обучающих программ и напоминания', '📚', 3),
+    ('photo', 'Все для фото-видиографа', 30000, 'Демонстрация портфолио, бронирование дат для съёмок, напоминания', '📷', 4),
+    ('coursebot', 'Создание курса-бота', 40000, 'Проведение обучающих программ в формате чат-бота: уроки, тесты, сертификаты', '🎓', 5),
+    ('shop', 'Интернет-магазин', 45000, 'Полноценные продажи товаров в Telegram с оплатой и админкой', '🛒', 6),
+    ('builder', 'Собрать модульно', 0, 'Конструктор проекта — выберите нужные модули', '🧩', 7)
+ON CONFLICT (key) DO NOTHING;
+
+INSERT INTO catalog_modules(key, name, price, description, emoji, position) VALUES
+    ('calendar', 'Расписание мероприятий', 4000, 'События, слоты, напоминания.', '🗓️', 0),
+    ('booking', 'Онлайн-запись', 5000, 'Онлайн-запись с выбором времени.', '📆', 1),
+    ('payments', 'Роботизированные оплаты', 7000, 'Stripe, ЮKassa, СБП.', '💳', 2),
+    ('portfolio', 'Галерея/Портфолио', 4000, 'Красивый показ работ.', '🖼️', 3),
+    ('mailing', 'Рассылки и напоминания', 4000, 'Авторассылки, push-напоминания.', '📧', 4),
+    ('loyalty', 'Система лояльности', 3000, 'Купоны, баллы и кэшбэк.', '🎁', 5),
+    ('crm', 'CRM-интеграция', 5000, 'Передаёт лиды в Amo/B24.', '📋', 6),
+    ('documents', 'Автогенерация документов', 5000, 'PDF договор с данными клиента.', '📄', 7),
+    ('webapp', 'Web-App приложение', 10000, 'Кастомное приложение внутри Telegram.', '🌐', 8),
+    ('webapp_shop', 'Web-App витрина', 12000, 'Каталог товара в Web-App.', '🛒', 9),
+    ('quest', 'Лид-магнит (квест-игра)', 3000, 'Игровой сценарий с бонусом', '🎲', 10),
+    ('admin_panel', 'Админ-панель с аналитикой', 6000, 'Управление + статистика.', '🛠️', 11)
+ON CONFLICT (key) DO NOTHING;
+
+INSERT INTO catalog_support(key, name, price, emoji, position) VALUES
+    ('support_6', 'Поддержка 6 мес.', 3000, '🔄', 0),
+    ('support_12', 'Поддержка 12 мес.', 5500, '🤝', 1),
+    ('no_support', 'Без поддержки', 0, '🚫', 2)
+ON CONFLICT (key) DO NOTHING;
+
+INSERT INTO catalog_template_modules(template_key, module_key, position) VALUES
+    ('infobot', 'portfolio', 0),
+    ('infobot', 'quest', 1),
+    ('tickets', 'admin_panel', 0),
+    ('tickets', 'booking', 1),
+    ('tickets', 'mailing', 2),
+    ('tickets', 'calendar', 3),
+    ('tickets', 'portfolio', 4),
+    ('tickets', 'quest', 5),
+    ('schedule', 'admin_panel', 0),
+    ('schedule', 'calendar', 1),
+    ('schedule', 'portfolio', 2),
+    ('schedule', 'mailing', 3),
+    ('schedule', 'loyalty', 4),
+    ('schedule', 'quest', 5),
+    ('courses', 'admin_panel', 0),
+    ('courses', 'calendar', 1),
+    ('courses', 'mailing', 2),
+    ('courses', 'loyalty', 3),
+    ('courses', 'portfolio', 4),
+    ('courses', 'quest', 5),
+    ('photo', 'booking', 0),
+    ('photo', 'portfolio', 1),
+    ('photo', 'calendar', 2),
+    ('photo', 'mailing', 3),
+    ('photo', 'loyalty', 4),
+    ('photo', 'quest', 5),
+    ('coursebot', 'admin_panel', 0),
+    ('coursebot', 'documents', 1),
+    ('coursebot', 'calendar', 2),
+    ('coursebot', 'mailing', 3),
+    ('coursebot', 'portfolio', 4),
+    ('coursebot', 'loyalty', 5),
+    ('coursebot', 'quest', 6),
+    ('shop', 'payments', 0),
+    ('shop', 'portfolio', 1),
+    ('shop', 'mailing', 2),
+    ('shop', 'loyalty', 3),
+    ('shop', 'crm', 4),
+    ('shop', 'admin_panel', 5)
+ON CONFLICT (template_key, module_key) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION catalog_bump_version() RETURNS trigger AS $$
+DECLARE
+    new_version BIGINT;
+BEGIN
+    UPDATE catalog_meta SET version = version + 1 RETURNING version INTO new_version;
+    PERFORM pg_notify('catalog_changed', new_version::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_templates_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON catalog_templates
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
+
+CREATE TRIGGER catalog_modules_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON catalog_modules
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
+
+CREATE TRIGGER catalog_support_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON catalog_support
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
+
+CREATE TRIGGER catalog_template_modules_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON catalog_template_modules
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
@@ -0,0 +1,70 @@
+-- Журнал нажатий: компактные строки (время, пользователь, smallint-код ключа),
+-- помесячные партиции и инкрементальные агрегаты воронок.
+
+-- Словарь ключей событий (callback_data, команды). В событиях хранится только id.
+CREATE TABLE IF NOT EXISTS interaction_keys (
+    id  SMALLINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS interaction_events (
+    ts      TIMESTAMPTZ NOT NULL,
+    user_id BIGINT NOT NULL,
+    key_id  SMALLINT NOT NULL
+) PARTITION BY RANGE (ts);
+
+CREATE INDEX IF NOT EXISTS interaction_events_ts_idx ON interaction_events (ts);
+
+-- Создаёт партиции текущего месяца и months_ahead следующих
+CREATE OR REPLACE FUNCTION ensure_interaction_event_partitions(months_ahead INTEGER DEFAULT 1)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    month_start DATE := date_trunc('month', now())::date;
+    lower_bound DATE;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        lower_bound := (month_start + make_interval(months => i))::date;
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF interaction_events FOR VALUES FROM (%L) TO (%L)',
+            'interaction_events_' || to_char(lower_bound, 'YYYYMM'),
+            lower_bound,
+            (lower_bound + INTERVAL '1 month')::date
+        );
+    END LOOP;
+END $$;
+
+SELECT ensure_interaction_event_partitions(1);
+
+-- Шаги воронок. Соответствие ключ -> шаг вычисляет бот (services/interaction_events.py)
+CREATE TABLE IF NOT EXISTS funnel_steps (
+    funnel TEXT NOT NULL,
+    key_id SMALLINT NOT NULL REFERENCES interaction_keys(id),
+    step   SMALLINT NOT NULL,
+    name   TEXT NOT NULL,
+    PRIMARY KEY (funnel, key_id)
+);
+
+-- Уникальные пользователи шага за день (для инкрементального подсчёта users)
+CREATE TABLE IF NOT EXISTS funnel_seen (
+    funnel  TEXT NOT NULL,
+    step    SMALLINT NOT NULL,
+    day     DATE NOT NULL,
+    user_id BIGINT NOT NULL,
+    PRIMARY KEY (funnel, step, day, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS funnel_daily (
+    funnel TEXT NOT NULL,
+    step   SMALLINT NOT NULL,
+    day    DATE NOT NULL,
+    users  INTEGER NOT NULL DEFAULT 0,
+    events INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (funnel, step, day)
+);
+
+-- Граница уже агрегированных событий
+CREATE TABLE IF NOT EXISTS funnel_rollup_state (
+    id      BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    last_ts TIMESTAMPTZ NOT NULL DEFAULT '-infinity'
+);
+INSERT INTO funnel_rollup_state(id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,22 @@
+-- Рассылки: пользователи, заблокировавшие бота, и задания с контрольной точкой.
+
+ALTER TABLE bot_users ADD COLUMN IF NOT EXISTS blocked_at TIMESTAMPTZ;
+
+CREATE TABLE IF NOT EXISTS broadcast_jobs (
+    id           BIGSERIAL PRIMARY KEY,
+    created_by   BIGINT NOT NULL,
+    from_chat_id BIGINT NOT NULL,
+    message_id   BIGINT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'done', 'cancelled')),
+    -- все получатели с user_id <= last_user_id уже обработаны
+    last_user_id BIGINT NOT NULL DEFAULT 0,
+    sent         INTEGER NOT NULL DEFAULT 0,
+    failed       INTEGER NOT NULL DEFAULT 0,
+    blocked      INTEGER NOT NULL DEFAULT 0,
+    -- экземпляр, выполняющий рассылку, продлевает аренду на каждой контрольной точке
+    lease_until  TIMESTAMPTZ,
+    created_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at  TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS broadcast_jobs_running_idx ON broadcast_jobs (id) WHERE status = 'running';
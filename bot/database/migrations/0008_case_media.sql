@@ -0,0 +1,9 @@
+-- Сообщения с медиа кейсов, которые нужно удалить при возврате к списку примеров.
+CREATE TABLE IF NOT EXISTS case_media (
+    user_id     BIGINT PRIMARY KEY,
+    chat_id     BIGINT NOT NULL,
+    message_ids BIGINT[] NOT NULL,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS case_media_updated_at_idx ON case_media (updated_at);
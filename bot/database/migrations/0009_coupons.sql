@@ -0,0 +1,36 @@
+-- Купоны: скидка (процент или сумма в рублях), срок действия, общий лимит
+-- и лимит на пользователя. Каждое погашение пишется в журнал coupon_redemptions.
+CREATE TABLE IF NOT EXISTS coupons (
+    code           TEXT PRIMARY KEY,
+    discount_type  TEXT NOT NULL CHECK (discount_type IN ('percent', 'fixed')),
+    discount_value INTEGER NOT NULL CHECK (discount_value > 0),
+    expires_at     TIMESTAMPTZ,
+    -- NULL — без общего лимита
+    max_uses       INTEGER CHECK (max_uses > 0),
+    per_user_limit INTEGER NOT NULL DEFAULT 1 CHECK (per_user_limit > 0),
+    used_count     INTEGER NOT NULL DEFAULT 0,
+    active         BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+    CHECK (discount_type <> 'percent' OR discount_value <= 100)
+);
+
+CREATE TABLE IF NOT EXISTS coupon_redemptions (
+    id          BIGSERIAL PRIMARY KEY,
+    code        TEXT NOT NULL REFERENCES coupons(code),
+    user_id     BIGINT NOT NULL,
+    redeemed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS coupon_redemptions_code_user_idx ON coupon_redemptions (code, user_id);
+
+INSERT INTO coupons(code, discount_type, discount_value) VALUES ('BOT5', 'percent', 5)
+ON CONFLICT (code) DO NOTHING;
+
+-- купоны, выданные до появления журнала
+INSERT INTO coupon_redemptions(code, user_id)
+SELECT u.coupon_code, u.user_id
+FROM bot_users u
+JOIN coupons c ON c.code = u.coupon_code
+WHERE NOT EXISTS (SELECT 1 FROM coupon_redemptions r WHERE r.code = u.coupon_code AND r.user_id = u.user_id);
+
+UPDATE coupons c SET used_count = (SELECT count(*) FROM coupon_redemptions r WHERE r.code = c.code);
@@ -1,45 +1,83 @@
 import asyncpg
-from typing import Optional
+from typing import Dict, NamedTuple, Optional
 
-from .connection import get_pool
+from config import settings
+from utils.cache import MISSING, TTLCache
+from .connection import acquire
 
 __all__ = [
-    "get_coupon",
-    "set_coupon",
+    "UserRow",
+    "NEW_USER",
+    "USER_COLUMNS",
+    "user_from_record",
+    "user_cached",
+    "remember_user",
+    "load_user",
+    "save_user_changes",
+    "user_cache_stats",
 ]
 
-_TABLE_INITIALIZED = False
-
-async def _ensure_table() -> None:
-    global _TABLE_INITIALIZED
-    if _TABLE_INITIALIZED:
-        return
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        await conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS bot_users (
-                user_id BIGINT PRIMARY KEY,
-                coupon_code TEXT
-            );
-            """
-        )
-    _TABLE_INITIALIZED = True
-
-async def get_coupon(user_id: int) -> Optional[str]:
-    await _ensure_table()
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow("SELECT coupon_code FROM bot_users WHERE user_id=$1", user_id)
-        return row["coupon_code"] if row and row["coupon_code"] else None
-
-async def set_coupon(user_id: int, coupon_code: str) -> None:
-    await _ensure_table()
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        await conn.execute(
-            "INSERT INTO bot_users(user_id, coupon_code) VALUES($1,$2) "
-            "ON CONFLICT (user_id) DO UPDATE SET coupon_code = $2",
+class UserRow(NamedTuple):
+    """Данные пользователя из bot_users, которые нужны хендлерам."""
+
+    registered: bool
+    coupon_code: Optional[str]
+    blocked: bool
+
+# строки в bot_users ещё нет
+NEW_USER = UserRow(False, None, False)
+
+# столбцы для запросов вида ... LEFT JOIN bot_users u ON u.user_id = ...
+USER_COLUMNS = "u.user_id IS NOT NULL AS registered, u.coupon_code, u.blocked_at IS NOT NULL AS blocked"
+
+# user_id -> UserRow. Кэшируем и отсутствие строки
+_user_cache: TTLCache[int, UserRow] = TTLCache(
+    maxsize=settings.coupon_cache_size,
+    ttl=settings.coupon_cache_ttl,
+)
+
+# одна команда на все изменения апдейта; строка без изменений не перезаписывается
+_SAVE_SQL = """
+INSERT INTO bot_users(user_id, coupon_code) VALUES($1, $2)
+ON CONFLICT (user_id) DO UPDATE SET
+    coupon_code = CASE WHEN $3 THEN EXCLUDED.coupon_code ELSE bot_users.coupon_code END,
+    blocked_at = CASE WHEN $4 THEN NULL ELSE bot_users.blocked_at END
+WHERE $3 OR ($4 AND bot_users.blocked_at IS NOT NULL)
+"""
+
+def user_from_record(record: asyncpg.Record) -> UserRow:
+    return UserRow(record["registered"], record["coupon_code"] or None, record["blocked"])
+
+def user_cached(user_id: int) -> bool:
+    return user_id in _user_cache
+
+def remember_user(user_id: int, user: UserRow) -> None:
+    _user_cache.set(user_id, user)
+
+async def load_user(user_id: int) -> UserRow:
+    cached = _user_cache.get(user_id)
+    if cached is not MISSING:
+        return cached
+    async with acquire("user.load_user") as conn:
+        record = await conn.fetchrow(
+            f"SELECT {USER_COLUMNS} FROM (SELECT $1::bigint AS user_id) one "
+            "LEFT JOIN bot_users u ON u.user_id = one.user_id",
             user_id,
-            coupon_code,
-        ) 
\ No newline at end of file
+        )
+    user = user_from_record(record)
+    _user_cache.set(user_id, user)
+    return user
+
+async def save_user_changes(user_id: int, user: UserRow, *, coupon_changed: bool, touched: bool) -> None:
+    """Записывает изменения одного апдейта одной командой и обновляет кэш.
+
+    ``user`` — состояние после апдейта; ``touched`` регистрирует пользователя
+    (получатель рассылок) и снимает отметку о блокировке.
+    """
+    async with acquire("user.save_user_changes") as conn:
+        await conn.execute(_SAVE_SQL, user_id, user.coupon_code, coupon_changed, touched)
+    _user_cache.set(user_id, user)
+
+def user_cache_stats() -> Dict[str, int]:
+    """Счётчики кэша пользователей: hits, misses, size."""
+    return _user_cache.stats()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+from utils.cache import MISSING
+
+__all__ = ["WriteBehindBuffer"]
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class WriteBehindBuffer(Generic[K, V]):
+    """Буфер отложенной записи.
+
+    Изменения копятся в словаре (по ключу хранится только последнее состояние)
+    и сбрасываются одной пачкой фоновой задачей — по таймеру ``interval`` или
+    при накоплении ``max_batch`` ключей. ``close()`` выполняет финальный сброс.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[Dict[K, V]], Awaitable[None]],
+        *,
+        interval: float,
+        max_batch: int,
+        name: str,
+    ) -> None:
+        self.interval = interval
+        self.max_batch = max_batch
+        self.name = name
+        self._flush_fn = flush
+        self._pending: Dict[K, V] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def get(self, key: K, default: Any = MISSING) -> Any:
+        """Ещё не записанное состояние ключа (для чтения собственных записей)."""
+        return self._pending.get(key, default)
+
+    def put(self, key: K, value: V) -> None:
+        self._pending[key] = value
+        self._ensure_started()
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"write-behind:{self.name}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Записывает всё накопленное. При ошибке изменения возвращаются в буфер."""
+        if not self._pending:
+            return
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            try:
+                await self._flush_fn(batch)
+            except Exception:
+                logging.exception("Write-behind %s: не удалось записать %d изменений", self.name, len(batch))
+                # более свежие изменения, пришедшие во время записи, важнее
+                batch.update(self._pending)
+                self._pending = batch
+
+    async def close(self) -> None:
+        """Останавливает фоновую задачу и сбрасывает остаток буфера."""
+        if self._task is not None:
+            # отменяем только вне записи, чтобы не потерять взятую пачку
+            async with self._flush_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,53 @@
+from aiogram import Bot, F, Router, types
+from aiogram.filters import Command, CommandObject
+
+from config import settings
+from database.broadcast_repo import cancel_job, create_job, recent_jobs
+from services.broadcast import active_broadcasts, start_broadcast
+
+router = Router()
+# все команды роутера доступны только администраторам
+router.message.filter(F.from_user.id.in_(settings.admin_ids))
+
+
+@router.message(Command("broadcast"))
+async def handle_broadcast(message: types.Message, bot: Bot) -> None:
+    """Запускает рассылку сообщения, на которое отвечает администратор."""
+    source = message.reply_to_message
+    if source is None:
+        await message.answer("Ответьте командой /broadcast на сообщение, которое нужно разослать.")
+        return
+    job_id = await create_job(message.from_user.id, source.chat.id, source.message_id)
+    start_broadcast(bot, job_id)
+    await message.answer(f"Рассылка #{job_id} запущена. Статус: /broadcast_status, отмена: /broadcast_cancel {job_id}")
+
+
+@router.message(Command("broadcast_status"))
+async def handle_broadcast_status(message: types.Message) -> None:
+    """Показывает последние рассылки и их прогресс."""
+    jobs = await recent_jobs()
+    if not jobs:
+        await message.answer("Рассылок ещё не было.")
+        return
+    active = set(active_broadcasts())
+    lines = []
+    for job in jobs:
+        marker = " (идёт здесь)" if job["id"] in active else ""
+        lines.append(
+            f"#{job['id']} {job['status']}{marker}: отправлено {job['sent']}, "
+            f"заблокировали {job['blocked']}, ошибок {job['failed']}"
+        )
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("broadcast_cancel"))
+async def handle_broadcast_cancel(message: types.Message, command: CommandObject) -> None:
+    """Отменяет рассылку. Остановка происходит на ближайшей контрольной точке."""
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Укажите номер рассылки: /broadcast_cancel 12")
+        return
+    job_id = int(command.args.strip())
+    if await cancel_job(job_id):
+        await message.answer(f"Рассылка #{job_id} будет остановлена.")
+    else:
+        await message.answer(f"Рассылка #{job_id} не найдена или уже завершена.")
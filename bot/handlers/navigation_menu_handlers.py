@@ -1,11 +1,12 @@
-import logging
-from aiogram import Router, types
+from aiogram import Bot, Router, types
 import asyncio
+import functools
 from aiogram.fsm.context import FSMContext
 from aiogram.exceptions import TelegramBadRequest
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile, InputMediaPhoto, InputMediaVideo
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from urllib.parse import quote
-from typing import Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 # ---------------------------------------------------------------------------
 # Утилита форматирования цены
@@ -18,49 +19,43 @@ def _fmt_price(value: int) -> str:
 from config import settings
 from keyboards.navigation_menu_keyboard import get_navigation_menu
 from keyboards.cost_calculator_keyboard import (
-    get_template_keyboard,
     get_modules_keyboard,
-    get_support_keyboard,
     get_contact_keyboard,
     get_simple_contact_keyboard,
-    get_category_keyboard,
-)
-from keyboards.examples_keyboard import (
-    get_examples_keyboard,
-    get_case_keyboard,
 )
+from keyboards.callback_data import QuizAnswerCallback, TemplateCallback
+from keyboards.examples_keyboard import get_case_keyboard
 from states.cost_calculator_states import CostCalculatorStates as States
 from states.need_bot_game_states import NeedBotGameStates as NBStates
-from services.cost_calculator_service import (
-    COST_TEMPLATES,
-    MODULES,
-    SUPPORT_PACKAGES,
-    calculate_total,
+from services.catalog import Catalog, current_catalog, get_catalog
+from services.case_media_store import case_media_store, delete_messages
+from services.coupons import UNAVAILABLE, coupon_discount, describe_discount, redeem
+from services.media_registry import build_album, remember_album
+from services.screens import (
+    CATALOG_UPDATED,
+    CATEGORY,
+    EXAMPLES,
+    MENU_PROMPT,
+    Screen,
+    catalog_screens,
+    quiz_answer,
+    quiz_question,
 )
+from utils.callback_index import CallbackIndex
+from utils.log_pipeline import log_event, truncate_preview
 
-from database.user_repo import get_coupon, set_coupon
-from database.calc_repo import get_session, upsert_session, drop_session
-
-# Иконки для модулей
-MODULE_EMOJIS = {
-    "calendar": "🗓️",
-    "payments": "💳",
-    "portfolio": "🖼️",
-    "mailing": "📧",
-    "loyalty": "🎁",
-    "crm": "📋",
-    "documents": "📄",
-    "webapp": "🌐",
-    "webapp_shop": "🛒",
-    "quest": "🎲",
-    "admin_panel": "🛠️",
-    "booking": "📆",
-}
+from middlewares.logging_middleware import describe_callback
+from middlewares.user_context_middleware import UserContext
+
+# Медиа кейсов (альбомы). Отправляются по file_id после первой загрузки
+CASE_SHOP_MEDIA = ("media/shop1.png", "media/shop2.png", "media/shop.mp4")
+CASE_BOOKING_MEDIA = ("media/booking.jpg", "media/booking.mp4")
 
-# Хранилище сообщений медиа по пользователю
-case_media_store: Dict[int, List[types.Message]] = {}
 
 router = Router()
+# все нажатия этого модуля маршрутизируются одним хендлером по индексу
+callbacks = CallbackIndex()
+callbacks.attach(router)
 
 # ---------------------------------------------------------------------------
 # Логирование нажатий кнопок
@@ -101,27 +96,41 @@ BUTTON_TITLES = {
 # ---------------------------------------------------------------------------
 
 
-def log_button(callback: types.CallbackQuery, preview_text: str) -> None:
-    """Логирует нажатую кнопку и первые строки ответа."""
-    username = (
-        f"@{callback.from_user.username}"
-        if callback.from_user.username
-        else callback.from_user.full_name
-    )
-    title = BUTTON_TITLES.get(callback.data, callback.data)
-
+def _button_preview(preview_text: str) -> str:
     # Превью ограничиваем, но стараемся захватить строку с итоговой стоимостью
-    lines = preview_text.split("\n")
     preview_lines = []
-    for line in lines:
+    for line in preview_text.split("\n", 25):
         preview_lines.append(line)
         if "Итоговая стоимость" in line:
             break
         if len(preview_lines) >= 25:
             break
-    preview = "\n".join(preview_lines).strip()
+    return truncate_preview("\n".join(preview_lines).strip(), settings.log_preview_chars)
 
-    logging.info("%s -> %s | %s", username, title, preview)
+
+def log_button(callback: types.CallbackQuery, preview_text: str, *, sample: float = 1.0) -> None:
+    """Добавляет к событию нажатия название кнопки и первые строки ответа.
+
+    На нажатие пишется одно событие "callback" (его выпускает
+    ``InteractionLoggingMiddleware``), ``sample`` относится к нему целиком.
+    Превью строится лениво — только если событие действительно попадёт в лог.
+    """
+
+    def preview() -> str:
+        return _button_preview(preview_text)
+
+    title = BUTTON_TITLES.get(callback.data, callback.data)
+    if describe_callback(sample=sample, preview=preview, title=title):
+        return
+    log_event(
+        "button",
+        sample=sample,
+        preview=preview,
+        user_id=callback.from_user.id,
+        username=callback.from_user.username,
+        callback=callback.data,
+        title=title,
+    )
 
 
 async def safe_edit(
@@ -139,19 +148,148 @@ async def safe_edit(
             return
         raise
 
+
+class _CatalogExpired(Exception):
+    """Снимка справочника, с которым начат мастер, больше нет."""
+
+
+async def wizard_context(state: FSMContext) -> Tuple[Dict[str, Any], Catalog]:
+    """Данные мастера и снимок справочника, с которым мастер был начат.
+
+    Если снимок вытеснен или потерян при рестарте, бросает ``_CatalogExpired``:
+    шаг, обёрнутый :func:`wizard_step`, начнёт мастер заново.
+    """
+    data = await state.get_data()
+    catalog = get_catalog(data.get("catalog_version"))
+    if catalog is None:
+        raise _CatalogExpired
+    return data, catalog
+
+
+async def _restart_wizard(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
+    await state.clear()
+    await state.set_state(States.choose_category)
+    await state.update_data(catalog_version=current_catalog().version)
+    await show_screen(callback.message, CATALOG_UPDATED)
+    log_button(callback, "справочник обновился, мастер начат заново")
+    return callback.answer()
+
+
+def wizard_step(
+    handler: Callable[..., Awaitable[AnswerCallbackQuery]]
+) -> Callable[..., Awaitable[AnswerCallbackQuery]]:
+    """Шаг мастера расчёта: при потерянном снимке справочника мастер начинается заново.
+
+    Без этого выбор из старой версии (шаблон или модуль, которого уже нет)
+    падал бы с KeyError. ``wizard_context`` должен вызываться до изменения состояния.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(callback: types.CallbackQuery, state: FSMContext, *args: Any, **kwargs: Any) -> AnswerCallbackQuery:
+        try:
+            return await handler(callback, state, *args, **kwargs)
+        except _CatalogExpired:
+            return await _restart_wizard(callback, state)
+
+    return wrapper
+
+
+async def show_screen(message: types.Message, screen: Screen) -> None:
+    """Показывает готовый экран в сообщении с кнопками."""
+    await safe_edit(message, text=screen.text, reply_markup=screen.reply_markup, parse_mode=screen.parse_mode)
+
+
+def template_list(catalog: Catalog, category: str) -> Screen:
+    lists = catalog_screens(catalog).template_lists
+    return lists.get(category) or lists["all"]
+
+
+def render_summary(
+    catalog: Catalog,
+    template_key: str,
+    module_keys: List[str],
+    support_key: str,
+    coupon_code: Optional[str],
+) -> Tuple[str, InlineKeyboardMarkup]:
+    """Итог расчёта (HTML) и клавиатура «Написать мне» с тем же описанием выбора.
+
+    Скидка купона берётся из кэша определений купонов и считается движком цен.
+    """
+    quote = catalog.pricing.quote(template_key, module_keys, support_key, coupon_discount(coupon_code))
+    discount = quote.discount
+    total_after = quote.total
+
+    template = catalog.templates[template_key]
+    template_line = f"Шаблон: <i>{template['name']}</i> — <b>{_fmt_price(template['base_price'])} ₽</b>"
+
+    # блок включённых модулей
+    incl = template.get("included", [])
+    if incl:
+        incl_lines = [
+            f"{catalog.module_emojis.get(m, '🧩')} {catalog.modules[m]['name']} — {_fmt_price(catalog.modules[m]['price'])} ₽"
+            for m in incl
+        ]
+        included_block = "\n".join(incl_lines)
+    else:
+        included_block = "—"
+
+    if module_keys:
+        modules_lines = []
+        for m in module_keys:
+            price = catalog.pricing.module_price(template_key, m)
+            modules_lines.append(f"{catalog.module_emojis.get(m, '🧩')} {catalog.modules[m]['name']} — {_fmt_price(price)} ₽")
+        modules_block = "\n".join(modules_lines)
+    else:
+        modules_block = "-"
+
+    support = catalog.support[support_key]
+    package_price = _fmt_price(support['price'])
+    support_line_html = f"🤝 Пакет поддержки: <b>{support['name']}</b> (+{package_price} ₽)"
+    support_line_plain = f"🤝 Пакет поддержки: {support['name']} (+{package_price} ₽)"
+
+    summary_lines = [
+        "<b>Ваш выбор:</b>",
+        "",
+        f"{template_line}",
+        "<b>(входит):</b>",
+        f"{included_block}",
+        "",
+        "<b>Модули:</b>",
+        f"{modules_block}",
+        "",
+        f"{support_line_html}",
+    ]
+
+    if discount:
+        summary_lines.extend(["", f"Скидка по купону <i>{coupon_code}</i>: <b>-{discount} ₽</b>"])
+
+    summary_lines.extend(["", "", f"💰 Итоговая стоимость: <b>{_fmt_price(total_after)} ₽</b>"])
+
+    summary = "\n".join(summary_lines)
+    keyboard = get_contact_keyboard(
+        owner_username=settings.owner_username,
+        template=f"{template['name']} — {template['base_price']} ₽",
+        included=included_block,
+        modules=modules_block,
+        support_line=support_line_plain,
+        total=total_after,
+        coupon_code=coupon_code if discount else None,
+        discount=discount,
+    )
+    return summary, keyboard
+
 # ---------------------------------------------------------------------------
 # Уникальное решение — сразу контакт (регистрируем рано, без state, чтобы перехватить первым)
 # ---------------------------------------------------------------------------
 
 
-@router.callback_query(lambda c: c.data == "unique_solution")
-async def unique_solution_contact(callback: types.CallbackQuery, state: FSMContext) -> None:
+@callbacks.exact("unique_solution")
+async def unique_solution_contact(callback: types.CallbackQuery, state: FSMContext, user: UserContext) -> AnswerCallbackQuery:
     """Сразу открывает ЛС с заполненным текстом — без промежуточного сообщения."""
 
     await state.clear()
-    await drop_session(callback.from_user.id)
 
-    coupon_code = await get_coupon(callback.from_user.id)
+    coupon_code = user.coupon_code
     # Формируем собственный URL с текстом «уникальное решение»
     lines = [
         "Приветствую!",
@@ -172,7 +310,7 @@ async def unique_solution_contact(callback: types.CallbackQuery, state: FSMConte
     )
     await safe_edit(callback.message, text="Нажмите кнопку ниже, чтобы обсудить создание уникального Telegram-бота.", reply_markup=keyboard)
     log_button(callback, "unique_solution")
-    await callback.answer()
+    return callback.answer()
 
 
 # ---------------------------------------------------------------------------
@@ -180,164 +318,82 @@ async def unique_solution_contact(callback: types.CallbackQuery, state: FSMConte
 # ---------------------------------------------------------------------------
 
 
-QUESTIONS = [
-    {
-        "icon": "🤖",
-        "question": "Зачем мне нужен бот?",
-        "options": [
-            "Стать счастливым",
-            "Автоматизировать продажи",
-            "Предоставить поддержку 24/7",
-        ],
-        "bullets": [
-            "💬 отвечают на частые вопросы",
-            "🛒 собирают заявки и совершают продажи",
-        ],
-        "conclusion": "И это всё ПОКА люди ОТДЫХАЮТ",
-    },
-    {
-        "icon": "🎯",
-        "question": "Кому могут быть полезны боты?",
-        "options": [
-            "Экспертам",
-            "Онлайн-школам",
-            "Малому бизнесу",
-        ],
-        "bullets": [
-            "🏪 самозанятым и экспертам",
-            "🎓 онлайн-курсам",
-            "🏋️‍♂️ фитнес-клубам",
-            "🍽 ресторанам и другим оффлайн бизнесам",
-        ],
-        "conclusion": "Практически любому бизнесу с повторяющимися коммуникациями",
-    },
-    {
-        "icon": "⚙️",
-        "question": "Как упрощают задачи?",
-        "options": [
-            "Собирают лиды",
-            "Сегментируют аудиторию",
-            "Автоматизируют оплаты",
-        ],
-        "bullets": [
-            "📥 собирают лиды",
-            "📊 сегментируют аудиторию",
-            "💳 принимают оплаты без участия менеджера",
-            "😊 ДЕЛАЮТ ВАС СЧАСТЛИВЫМИ",
-        ],
-        "conclusion": "Все процессы становятся быстрее и прозрачнее.",
-    },
-]
-
-
-def build_options_keyboard(idx: int) -> InlineKeyboardMarkup:
-    buttons = [[InlineKeyboardButton(text=opt, callback_data=f"nb_opt_{idx}")] for opt in QUESTIONS[idx]["options"]]
-    buttons.append([InlineKeyboardButton(text="↩️ Вернуться в меню", callback_data="back_menu_from_needbot")])
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
-
-
-def build_after_answer_keyboard(idx: int) -> InlineKeyboardMarkup:
-    kb = []
-    if idx < len(QUESTIONS) - 1:
-        kb.append([InlineKeyboardButton(text="👉 Далее", callback_data="nb_next")])
-        kb.append([InlineKeyboardButton(text="↩️ Вернуться в меню", callback_data="back_menu_from_needbot")])
-    else:
-        kb.append([InlineKeyboardButton(text="🎁 Получить купон 5%", callback_data="need_bot_coupon")])
-    return InlineKeyboardMarkup(inline_keyboard=kb)
-
-
-@router.callback_query(lambda c: c.data == "need_bot")
-async def need_bot_start(callback: types.CallbackQuery, state: FSMContext) -> None:
+@callbacks.exact("need_bot")
+async def need_bot_start(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
     await state.set_state(NBStates.question)
     await state.update_data(q_idx=0)
-    idx = 0
-    text = f"<b><i>{QUESTIONS[idx]['question']}</i></b>"
-    await safe_edit(callback.message, text=text, reply_markup=build_options_keyboard(idx), parse_mode="HTML")
+    await show_screen(callback.message, quiz_question(0))
     log_button(callback, "need_bot_q0")
-    await callback.answer()
+    return callback.answer()
 
 
-@router.callback_query(NBStates.question, lambda c: c.data.startswith("nb_opt_"))
-async def need_bot_handle_option(callback: types.CallbackQuery, state: FSMContext) -> None:
+@callbacks.schema(QuizAnswerCallback, state=NBStates.question)
+# старые сообщения: nb_opt_<вопрос>
+@callbacks.prefix("nb_opt_", state=NBStates.question)
+async def need_bot_handle_option(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
     data = await state.get_data()
     idx = data.get("q_idx", 0)
-    # Build answer block
-    q = QUESTIONS[idx]
-    # заголовок жирный курсив + пустая строка
-    lines = [f"{q['icon']} <b><i>{q['question']}</i></b>", ""]
-    # специальная вводная строка для первого вопроса
-    if idx == 0:
-        lines.append("Боты берут на себя рутину:")
-    # пункты преимущества курсивные
-    bullet_lines = [f"<i>{b}</i>" for b in q["bullets"]]
-    lines.extend(bullet_lines)
-    lines.append("")
-    # заключительная строка как код
-    lines.append(f"<code>{q['conclusion']}</code>")
-    answer_text = "\n".join(lines)
     await state.set_state(NBStates.answer)
-    text = answer_text
-    await safe_edit(callback.message, text=text, reply_markup=build_after_answer_keyboard(idx), parse_mode="HTML")
+    await show_screen(callback.message, quiz_answer(idx))
     log_button(callback, f"need_bot_answer_{idx}")
-    await callback.answer()
+    return callback.answer()
 
 
-@router.callback_query(NBStates.answer, lambda c: c.data == "nb_next")
-async def need_bot_next_question(callback: types.CallbackQuery, state: FSMContext) -> None:
+@callbacks.exact("nb_next", state=NBStates.answer)
+async def need_bot_next_question(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
     data = await state.get_data()
     idx = data.get("q_idx", 0) + 1
     await state.update_data(q_idx=idx)
     await state.set_state(NBStates.question)
-    text = f"<b><i>{QUESTIONS[idx]['question']}</i></b>"
-    await safe_edit(callback.message, text=text, reply_markup=build_options_keyboard(idx), parse_mode="HTML")
+    await show_screen(callback.message, quiz_question(idx))
     log_button(callback, f"need_bot_q{idx}")
-    await callback.answer()
+    return callback.answer()
 
 
-@router.callback_query(lambda c: c.data == "back_menu_from_needbot")
-async def needbot_back_menu(callback: types.CallbackQuery, state: FSMContext) -> None:
+@callbacks.exact("back_menu_from_needbot")
+async def needbot_back_menu(callback: types.CallbackQuery, state: FSMContext, user: UserContext) -> AnswerCallbackQuery:
     await state.clear()
-    await safe_edit(callback.message, text="Выберите нужный пункт меню:", reply_markup=get_navigation_menu(await get_coupon(callback.from_user.id)))
+    await safe_edit(callback.message, text=MENU_PROMPT, reply_markup=get_navigation_menu(user.coupon_code))
     log_button(callback, "needbot_back_menu")
-    await callback.answer()
-
-
-@router.callback_query(NBStates.answer, lambda c: c.data == "need_bot_coupon")
-async def need_bot_coupon(callback: types.CallbackQuery, state: FSMContext) -> None:
-    await set_coupon(callback.from_user.id, "BOT5")
+    return callback.answer()
+
+
+@callbacks.exact("need_bot_coupon", state=NBStates.answer)
+async def need_bot_coupon(callback: types.CallbackQuery, state: FSMContext, user: UserContext) -> AnswerCallbackQuery:
+    code = settings.need_bot_coupon_code
+    discount = coupon_discount(code)
+    # уже полученный купон повторно не гасится; ALREADY_REDEEMED (купон погашен раньше,
+    # но не сохранился за пользователем) тоже оставляет купон за ним
+    if discount is None or (user.coupon_code != code and await redeem(user.user_id, code) == UNAVAILABLE):
+        await state.clear()
+        await safe_edit(callback.message, text="😔 Этот купон больше недоступен.", reply_markup=get_navigation_menu(user.coupon_code))
+        log_button(callback, "need_bot_coupon_unavailable")
+        return callback.answer()
+    if user.coupon_code != code:
+        user.set_coupon(code)
     await state.clear()
     text = (
-        "🎁 Купон BOT5 активирован! При расчёте стоимости будет применена скидка 5%.\n\n"
+        f"🎁 Купон {code} активирован! При расчёте стоимости будет применена скидка {describe_discount(discount)}.\n\n"
     )
-    await safe_edit(callback.message, text=text, reply_markup=get_navigation_menu(await get_coupon(callback.from_user.id)))
+    await safe_edit(callback.message, text=text, reply_markup=get_navigation_menu(user.coupon_code))
     log_button(callback, "need_bot_coupon")
-    await callback.answer()
+    return callback.answer()
 
-@router.callback_query(lambda c: c.data == "examples")
-async def show_examples(callback: types.CallbackQuery) -> None:
+@callbacks.exact("examples")
+async def show_examples(callback: types.CallbackQuery, bot: Bot) -> AnswerCallbackQuery:
     """Показывает список демонстрационных кейсов в одном сообщении с кнопками."""
     # Удаляем ранее отправленные медиа
-    media_messages = case_media_store.get(callback.from_user.id, [])
-    for msg in media_messages:
-        try:
-            await msg.delete()
-        except Exception:
-            pass
-    case_media_store[callback.from_user.id] = []
-    text = (
-        "Выберите интересующий вас демонстрационный проект: \n\n(дальше - больше !)"
-    )
+    previous = await case_media_store.pop(callback.from_user.id)
+    if previous:
+        chat_id, message_ids = previous
+        await delete_messages(bot, chat_id, message_ids, concurrency=settings.case_media_delete_concurrency)
     try:
-        await safe_edit(
-            callback.message,
-            text=text,
-            reply_markup=get_examples_keyboard(),
-        )
+        await show_screen(callback.message, EXAMPLES)
     except TelegramBadRequest:
         # Если исходное сообщение удалено или не может быть отредактировано — отправляем новое
-        await callback.message.answer(text, reply_markup=get_examples_keyboard())
-    log_button(callback, text)
-    await callback.answer()
+        await callback.message.answer(EXAMPLES.text, reply_markup=EXAMPLES.reply_markup)
+    log_button(callback, EXAMPLES.text)
+    return callback.answer()
 
 
 # ---------------------------------------------------------------------------
@@ -345,8 +401,8 @@ async def show_examples(callback: types.CallbackQuery) -> None:
 # ---------------------------------------------------------------------------
 
 
-@router.callback_query(lambda c: c.data == "case_shop")
-async def case_shop(callback: types.CallbackQuery) -> None:
+@callbacks.exact("case_shop")
+async def case_shop(callback: types.CallbackQuery) -> AnswerCallbackQuery:
     """Карточка кейса «Инфо-бот продажи билетов"""
     text = (
         "<b>🎟️ Инфо-бот продажи билетов на мероприятие</b>"
@@ -375,23 +431,18 @@ async def case_shop(callback: types.CallbackQuery) -> None:
     # Отправляем индикатор загрузки
     loading = await callback.message.answer("⏳ Идёт загрузка кейса...")
     # Сбрасываем список медиа для последующего удаления
-    case_media_store[callback.from_user.id] = []
+    case_media_store.put(callback.from_user.id, callback.message.chat.id, ())
     # Удаляем исходное сообщение с меню
     await callback.message.delete()
 
-    # Отправляем фото и видео в одном альбоме и записываем их IDs
-    media = [
-        InputMediaPhoto(media=FSInputFile("media/shop1.png")),
-        InputMediaPhoto(media=FSInputFile("media/shop2.png")),
-        InputMediaVideo(media=FSInputFile("media/shop.mp4")),
-    ]
-    # Отправляем фото и видео в одном альбоме с таймаутом
+    # Отправляем фото и видео в одном альбоме с таймаутом и записываем их IDs
     try:
+        media = await build_album(CASE_SHOP_MEDIA)
         media_messages = await asyncio.wait_for(
             callback.message.answer_media_group(media),
             timeout=10,
         )
-        case_media_store[callback.from_user.id] = media_messages
+        case_media_store.put(callback.from_user.id, callback.message.chat.id, (m.message_id for m in media_messages))
     except Exception:
         # При ошибке отправки медиа показываем описание кейса без медиа
         await loading.delete()
@@ -401,10 +452,12 @@ async def case_shop(callback: types.CallbackQuery) -> None:
             parse_mode="HTML",
             reply_markup=keyboard,
         )
-        case_media_store[callback.from_user.id] = [err_msg, desc_msg]
+        case_media_store.put(callback.from_user.id, callback.message.chat.id, (err_msg.message_id, desc_msg.message_id))
         log_button(callback, "case_shop")
-        await callback.answer()
-        return
+        return callback.answer()
+
+    # альбом уже доставлен: сбой записи file_id не меняет того, что видит пользователь
+    await remember_album(CASE_SHOP_MEDIA, media_messages)
 
     # Удаляем индикатор загрузки после небольшой задержки
     await asyncio.sleep(1)
@@ -417,11 +470,11 @@ async def case_shop(callback: types.CallbackQuery) -> None:
         reply_markup=keyboard,
     )
     log_button(callback, "case_shop")
-    await callback.answer()
+    return callback.answer()
 
 
-# @router.callback_query(lambda c: c.data == "case_booking")
-async def case_booking(callback: types.CallbackQuery) -> None:
+# @callbacks.exact("case_booking")
+async def case_booking(callback: types.CallbackQuery) -> AnswerCallbackQuery:
     """Карточка кейса «Бронирование»"""
     text = (
         "<b>📆 Бронирование</b>\n\n"
@@ -431,21 +484,18 @@ async def case_booking(callback: types.CallbackQuery) -> None:
 
     # Отправляем индикатор загрузки
     loading = await callback.message.answer("⏳ Идёт загрузка кейса...")
-    case_media_store[callback.from_user.id] = []
+    case_media_store.put(callback.from_user.id, callback.message.chat.id, ())
     # Удаляем исходное сообщение с меню
     await callback.message.delete()
 
     # Отправляем фото и видео в одном альбоме
-    media = [
-        InputMediaPhoto(media=FSInputFile("media/booking.jpg")),
-        InputMediaVideo(media=FSInputFile("media/booking.mp4")),
-    ]
     try:
+        media = await build_album(CASE_BOOKING_MEDIA)
         media_messages = await asyncio.wait_for(
             callback.message.answer_media_group(media),
             timeout=10,
         )
-        case_media_store[callback.from_user.id] = media_messages
+        case_media_store.put(callback.from_user.id, callback.message.chat.id, (m.message_id for m in media_messages))
     except Exception:
         # При ошибке отправки медиа показываем описание кейса без медиа
         await loading.delete()
@@ -455,10 +505,12 @@ async def case_booking(callback: types.CallbackQuery) -> None:
             parse_mode="HTML",
             reply_markup=get_case_keyboard(bot_url="https://t.me/example_booking_bot"),
         )
-        case_media_store[callback.from_user.id] = [err_msg, desc_msg]
+        case_media_store.put(callback.from_user.id, callback.message.chat.id, (err_msg.message_id, desc_msg.message_id))
         log_button(callback, "case_booking")
-        await callback.answer()
-        return
+        return callback.answer()
+
+    # альбом уже доставлен: сбой записи file_id не меняет того, что видит пользователь
+    await remember_album(CASE_BOOKING_MEDIA, media_messages)
 
     await asyncio.sleep(1)
     await loading.delete()
@@ -470,171 +522,107 @@ async def case_booking(callback: types.CallbackQuery) -> None:
         reply_markup=get_case_keyboard(bot_url="https://t.me/example_booking_bot"),
     )
     log_button(callback, "case_booking")
-    await callback.answer()
+    return callback.answer()
 
-@router.callback_query(lambda c: c.data == "calc_cost")
-async def start_calculator(callback: types.CallbackQuery, state: FSMContext) -> None:
-    # persist session
-    await upsert_session(callback.from_user.id, step=1)
+@callbacks.exact("calc_cost")
+async def start_calculator(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
     await state.clear()
     await state.set_state(States.choose_category)
-    await callback.message.edit_text(
-        "Шаг 1/4. Выберите вашу сферу деятельности:",
-        reply_markup=get_category_keyboard(),
-    )
-    await callback.answer()
+    # мастер до конца работает с той версией прайса, с которой начат
+    await state.update_data(catalog_version=current_catalog().version)
+    await callback.message.edit_text(CATEGORY.text, reply_markup=CATEGORY.reply_markup)
     log_button(callback, "Шаг 1/4. Выберите категорию")
-
-# ---------------------------------------------------------------------------
-# Назад из первого шага калькулятора в главное меню
-# ---------------------------------------------------------------------------
-
-# Этот обработчик нужно разместить ДО category_chosen, чтобы иметь больший приоритет
-@router.callback_query(States.choose_category, lambda c: c.data == "back_menu")
-async def category_back_menu_prior(callback: types.CallbackQuery, state: FSMContext) -> None:
-    await calc_back_menu(callback, state)
+    return callback.answer()
 
 # ------------------ category selection -----------------
 
 
-@router.callback_query(States.choose_category)
-async def category_chosen(callback: types.CallbackQuery, state: FSMContext) -> None:
+# точные маршруты (back_menu, unique_solution) важнее хендлера по умолчанию
+@callbacks.default(state=States.choose_category)
+@wizard_step
+async def category_chosen(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
     category_key = callback.data
     # basic validation
     valid_categories = {"services", "sales", "builder", "all"}
     if category_key not in valid_categories:
-        await callback.answer("Используйте кнопки", show_alert=True)
-        return
+        return callback.answer("Используйте кнопки", show_alert=True)
+    _, catalog = await wizard_context(state)
     await state.update_data(category=category_key)
-    await upsert_session(callback.from_user.id, category=category_key, step=2)
+    screens = catalog_screens(catalog)
     await state.set_state(States.choose_template)
-    message_text = "Шаг 2/4. Выберите шаблон:"
     if category_key == "builder":
         # сразу переходим к выбору модулей
         await state.update_data(template="builder", modules=[])
         await state.set_state(States.choose_modules)
-        modules_intro = (
-            "Шаг 2/3. Выберите необходимые модули:\n"
-            "<i>*Итоговая стоимость может отличаться от предварительной!</i>"
-        )
-        await safe_edit(
-            callback.message,
-            text=modules_intro,
-            reply_markup=get_modules_keyboard(selected=[], template_key="builder"),
-            parse_mode="HTML",
-        )
+        await show_screen(callback.message, screens.builder_modules)
         log_button(callback, "builder_modules")
-        await callback.answer()
-        return
+        return callback.answer()
 
-    await safe_edit(
-        callback.message,
-        text=message_text,
-        reply_markup=get_template_keyboard(category_key),
-        parse_mode="HTML",
-    )
+    await show_screen(callback.message, screens.template_lists[category_key])
     log_button(callback, f"выбрана категория {category_key}")
-    await callback.answer()
+    return callback.answer()
 
 # назад к выбору категории
-@router.callback_query(States.choose_template, lambda c: c.data == "back_category")
-async def back_to_category(callback: types.CallbackQuery, state: FSMContext) -> None:
+@callbacks.exact("back_category", state=States.choose_template)
+async def back_to_category(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
     await state.set_state(States.choose_category)
-    await safe_edit(
-        callback.message,
-        text="Шаг 1/4. Выберите вашу сферу деятельности:",
-        reply_markup=get_category_keyboard(),
-    )
-    await callback.answer()
+    await show_screen(callback.message, CATEGORY)
     log_button(callback, "назад к категориям")
+    return callback.answer()
 
 # ---------------------------------------------------------------------------
 # Back navigation handlers
 # ---------------------------------------------------------------------------
 
 
-@router.callback_query(lambda c: c.data == "back_menu")
-async def calc_back_menu(callback: types.CallbackQuery, state: FSMContext) -> None:
+@callbacks.exact("back_menu")
+async def calc_back_menu(callback: types.CallbackQuery, state: FSMContext, user: UserContext) -> AnswerCallbackQuery:
     await state.clear()
-    await drop_session(callback.from_user.id)
-    await safe_edit(callback.message, text="Выберите нужный пункт меню:", reply_markup=get_navigation_menu(await get_coupon(callback.from_user.id)))
+    await safe_edit(callback.message, text=MENU_PROMPT, reply_markup=get_navigation_menu(user.coupon_code))
     log_button(callback, "возврат в меню")
-    await callback.answer()
+    return callback.answer()
 
 
-@router.callback_query(States.choose_modules, lambda c: c.data == "back_template")
-async def back_to_template(callback: types.CallbackQuery, state: FSMContext) -> None:
-    data = await state.get_data()
-    category_key = data.get("category", "all")
+@callbacks.exact("back_template", state=States.choose_modules)
+@wizard_step
+async def back_to_template(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
+    data, catalog = await wizard_context(state)
     await state.set_state(States.choose_template)
-    await safe_edit(
-        callback.message,
-        text="Шаг 2/4. Выберите шаблон:",
-        reply_markup=get_template_keyboard(category_key),
-    )
+    await show_screen(callback.message, template_list(catalog, data.get("category", "all")))
     log_button(callback, "назад к выбору шаблона")
-    await callback.answer()
+    return callback.answer()
 
 
-@router.callback_query(States.choose_support, lambda c: c.data == "back_modules")
-async def back_to_modules(callback: types.CallbackQuery, state: FSMContext) -> None:
-    data = await state.get_data()
+@callbacks.exact("back_modules", state=States.choose_support)
+@wizard_step
+async def back_to_modules(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
+    data, catalog = await wizard_context(state)
     selected = data.get("modules", [])
     template_key = data.get("template")
-    tpl = COST_TEMPLATES[template_key]
-    included = tpl.get("included", [])
-
-    # сформировать текст карточки, как в show_template_card
-    lines = [
-        f"🗂 {tpl['name']} — <b>{_fmt_price(tpl['base_price'])} ₽</b>",
-        tpl["description"],
-        "",
-        "<b>Уже входит:</b>",
-    ]
-    if included:
-        for m in included:
-            mod = MODULES[m]
-            lines.append(f"{MODULE_EMOJIS.get(m, '🧩')} {mod['name']} — {_fmt_price(mod['price'])} ₽")
-    else:
-        lines.append("—")
-
-    lines.extend(["", "<i>Выберите доп модули с помощью кнопок ниже:</i>"])
-
-    card_text = "\n".join(lines)
+    card = catalog_screens(catalog).template_cards[template_key]
     await state.set_state(States.choose_modules)
-    await safe_edit(
+    # текст карточки готовый, клавиатура — с уже выбранными модулями
+    await show_screen(
         callback.message,
-        text=card_text,
-        reply_markup=get_modules_keyboard(selected=selected, template_key=template_key),
-        parse_mode="HTML",
+        card._replace(reply_markup=get_modules_keyboard(selected=selected, template_key=template_key, catalog=catalog)),
     )
     log_button(callback, "назад к модулям")
-    await callback.answer()
+    return callback.answer()
 #旧 обработчик выбора шаблона отключён (конфликтовал с новой карточкой)
 
-@router.callback_query(States.choose_modules)
-async def modules_choose(callback: types.CallbackQuery, state: FSMContext) -> None:
-    data = await state.get_data()
+@callbacks.default(state=States.choose_modules)
+@wizard_step
+async def modules_choose(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
+    data, catalog = await wizard_context(state)
     selected = data.get("modules", [])
 
     if callback.data == "done_modules":
         await state.set_state(States.choose_support)
-        support_intro = (
-            "Шаг 4/4. Выберите пакет технической поддержки:\n\n"
-            "🔄 Обновления контента по запросу\n"
-            "🛡️ Гарантия стабильной работы\n"
-            "💬 Консультация и ответы на вопросы"
-        )
-        await safe_edit(
-            callback.message,
-            text=support_intro,
-            reply_markup=get_support_keyboard(),
-        )
-        await callback.answer()
+        await show_screen(callback.message, catalog_screens(catalog).support)
         log_button(callback, "Шаг 4/4. Выберите пакет поддержки:")
-        return
+        return callback.answer()
     template_key = data.get("template")
-    base_allowed = [k for k in MODULES if k not in COST_TEMPLATES[template_key]["included"]]
+    base_allowed = [k for k in catalog.modules if k not in catalog.templates[template_key]["included"]]
     if template_key == "builder":
         allowed_keys = base_allowed
     elif template_key == "infobot":
@@ -643,8 +631,7 @@ async def modules_choose(callback: types.CallbackQuery, state: FSMContext) -> No
         allowed_keys = [k for k in base_allowed if k != "webapp_shop"]
 
     if callback.data not in allowed_keys:
-        await callback.answer("Используйте кнопки", show_alert=True)
-        return
+        return callback.answer("Используйте кнопки", show_alert=True)
     action = "добавлен"
     if callback.data in selected:
         selected.remove(callback.data)
@@ -652,177 +639,70 @@ async def modules_choose(callback: types.CallbackQuery, state: FSMContext) -> No
     else:
         selected.append(callback.data)
 
-    module = MODULES.get(callback.data)
+    module = catalog.modules.get(callback.data)
     if module:
         sign = "➕" if action == "добавлен" else "➖"
-        log_button(callback, f"🔧 {sign} {module['name']} ({module['price']} ₽)")
-    await state.update_data(modules=selected)
-    await callback.message.edit_reply_markup(reply_markup=get_modules_keyboard(selected=selected, template_key=template_key))
-    await callback.answer()
-
-@router.callback_query(States.choose_support)
-async def support_chosen(callback: types.CallbackQuery, state: FSMContext) -> None:
-    if callback.data not in SUPPORT_PACKAGES:
-        await callback.answer("Используйте кнопки", show_alert=True)
-        return
-    await state.update_data(support=callback.data)
-    data = await state.get_data()
-    if data["template"] == "builder":
-        mod_total = sum((((MODULES[m]["price"] * 1.25 + 999) // 1000) * 1000) for m in data["modules"])
-        total = mod_total + SUPPORT_PACKAGES[data["support"]]["price"]
-    else:
-        total = calculate_total(
-            template_key=data["template"],
-            module_keys=data["modules"],
-            support_key=data["support"],
+        log_button(
+            callback,
+            f"🔧 {sign} {module['name']} ({module['price']} ₽)",
+            sample=settings.log_module_toggle_sample,
         )
-
-    coupon_code = await get_coupon(callback.from_user.id)
-    if coupon_code == "BOT5":
-        discount = int(total * 0.05)
-        total_after = total - discount
-    else:
-        discount = 0
-        total_after = total
-
-    template_key = data["template"]
-    template = COST_TEMPLATES[template_key]
-    template_line = f"Шаблон: <i>{template['name']}</i> — <b>{_fmt_price(template['base_price'])} ₽</b>"
-
-    # блок включённых модулей
-    incl = template.get("included", [])
-    if incl:
-        incl_lines = [
-            f"{MODULE_EMOJIS.get(m, '🧩')} {MODULES[m]['name']} — {_fmt_price(MODULES[m]['price'])} ₽" for m in incl
-        ]
-        included_block = "\n".join(incl_lines)
-    else:
-        included_block = "—"
-
-    if data["modules"]:
-        modules_lines = []
-        for m in data["modules"]:
-            price = MODULES[m]["price"]
-            if data.get("template") == "builder":
-                price = ((int(price * 1.25 + 999)) // 1000) * 1000
-            modules_lines.append(f"{MODULE_EMOJIS.get(m, '🧩')} {MODULES[m]['name']} — {_fmt_price(price)} ₽")
-        modules_block = "\n".join(modules_lines)
-    else:
-        modules_block = "-"
-
-    support = SUPPORT_PACKAGES[data["support"]]
-    package_price = _fmt_price(support['price'])
-    support_line_html = f"🤝 Пакет поддержки: <b>{support['name']}</b> (+{package_price} ₽)"
-    support_line_plain = f"🤝 Пакет поддержки: {support['name']} (+{package_price} ₽)"
-
-    summary_lines = [
-        "<b>Ваш выбор:</b>",
-        "",
-        f"{template_line}",
-        "<b>(входит):</b>",
-        f"{included_block}",
-        "",
-        "<b>Модули:</b>",
-        f"{modules_block}",
-        "",
-        f"{support_line_html}",
-    ]
-
-    if discount:
-        summary_lines.extend(["", f"Скидка по купону <i>{coupon_code}</i>: <b>-{discount} ₽</b>"])
-
-    summary_lines.extend(["", "", f"💰 Итоговая стоимость: <b>{_fmt_price(total_after)} ₽</b>"])
-
-    summary = "\n".join(summary_lines)
-    await safe_edit(
-        callback.message,
-        text=summary,
-        parse_mode="HTML",
-        reply_markup=get_contact_keyboard(
-            owner_username=settings.owner_username,
-            template=f"{template['name']} — {template['base_price']} ₽",
-            included=included_block,
-            modules=modules_block,
-            support_line=support_line_plain,
-            total=total_after,
-            coupon_code=coupon_code if discount else None,
-            discount=discount,
-        ),
+    await state.update_data(modules=selected)
+    await callback.message.edit_reply_markup(
+        reply_markup=get_modules_keyboard(selected=selected, template_key=template_key, catalog=catalog)
     )
+    return callback.answer()
+
+@callbacks.default(state=States.choose_support)
+@wizard_step
+async def support_chosen(callback: types.CallbackQuery, state: FSMContext, user: UserContext) -> AnswerCallbackQuery:
+    _, catalog = await wizard_context(state)
+    if callback.data not in catalog.support:
+        return callback.answer("Используйте кнопки", show_alert=True)
+    data = await state.update_data(support=callback.data)
+    summary, keyboard = render_summary(catalog, data["template"], data["modules"], data["support"], user.coupon_code)
+    await safe_edit(callback.message, text=summary, parse_mode="HTML", reply_markup=keyboard)
     await state.clear()
-    await callback.answer()
     log_button(callback, summary)
+    return callback.answer()
 
 
-@router.callback_query(lambda c: c.data == "contact_me")
-async def contact_me(callback: types.CallbackQuery) -> None:
+@callbacks.exact("contact_me")
+async def contact_me(callback: types.CallbackQuery, user: UserContext) -> AnswerCallbackQuery:
     """Показывает кнопку для связи с автором с учётом купона."""
-    coupon_code = await get_coupon(callback.from_user.id)
-    keyboard = get_simple_contact_keyboard(owner_username=settings.owner_username, coupon_code=coupon_code)
+    keyboard = get_simple_contact_keyboard(owner_username=settings.owner_username, coupon_code=user.coupon_code)
     await safe_edit(callback.message, text="Нажмите кнопку ниже, чтобы связаться с автором.", reply_markup=keyboard)
     log_button(callback, "contact_me")
-    await callback.answer()
+    return callback.answer()
 
 # template list -> show card
-@router.callback_query(States.choose_template, lambda c: c.data.startswith("tpl_") and not c.data.startswith("tpl_ok_"))
-async def show_template_card(callback: types.CallbackQuery, state: FSMContext) -> None:
-    template_key = callback.data.split("tpl_")[1]
-    tpl = COST_TEMPLATES[template_key]
-    included = tpl.get("included", [])
-
-    # формируем текст карточки
-    lines = [
-        f"🗂 {tpl['name']} — <b>{_fmt_price(tpl['base_price'])} ₽</b>",
-        tpl["description"],
-        "",
-        "<b>Уже входит:</b>",
-    ]
-    if included:
-        for m in included:
-            mod = MODULES[m]
-            lines.append(f"{MODULE_EMOJIS.get(m, '🧩')} {mod['name']} — {_fmt_price(mod['price'])} ₽")
-    else:
-        lines.append("—")
-
-    # Подсказка перед кнопками модулей
-    lines.extend(["", "<i>Выберите доп модули с помощью кнопок ниже:</i>"])
-
-    text = "\n".join(lines)
+@callbacks.schema(TemplateCallback, state=States.choose_template)
+@wizard_step
+async def show_template_card(
+    callback: types.CallbackQuery, state: FSMContext, callback_data: TemplateCallback
+) -> AnswerCallbackQuery:
+    template_key = callback_data.key
+    _, catalog = await wizard_context(state)
+    card = catalog_screens(catalog).template_cards[template_key]
 
     # Сохраняем выбор шаблона и переходим в шаг выбора модулей (объединённый экран)
     await state.update_data(template=template_key, modules=[])
     await state.set_state(States.choose_modules)
+    await show_screen(callback.message, card)
+    return callback.answer()
 
-    await safe_edit(
-        callback.message,
-        text=text,
-        reply_markup=get_modules_keyboard(selected=[], template_key=template_key),
-        parse_mode="HTML",
-    )
-    await callback.answer()
-
-
-# confirm template — больше не используется, но оставляем для обратной совместимости
-@router.callback_query(States.choose_template, lambda c: c.data.startswith("tpl_ok_"))
-async def template_selected_confirm(callback: types.CallbackQuery, state: FSMContext) -> None:
-    # просто перенаправляем на card-поток, чтобы не ломать старые сообщения
-    new_cb = types.CallbackQuery(
-        id=callback.id,
-        from_user=callback.from_user,
-        chat_instance=callback.chat_instance,
-        message=callback.message,
-        data=f"tpl_{callback.data.split('tpl_ok_')[1]}",
-    )
-    await show_template_card(new_cb, state)
+
+# tpl_<key> и tpl_ok_<key> — кнопки старых сообщений, ведут на ту же карточку
+@callbacks.prefix("tpl_ok_", state=States.choose_template)
+@callbacks.prefix("tpl_", state=States.choose_template)
+async def template_selected_legacy(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
+    template_key = callback.data.removeprefix("tpl_ok_").removeprefix("tpl_")
+    return await show_template_card(callback, state, TemplateCallback(key=template_key))
 
 # back_templates list
-@router.callback_query(States.choose_template, lambda c: c.data == "back_templates")
-async def back_templates(callback: types.CallbackQuery, state: FSMContext) -> None:
-    data = await state.get_data()
-    category = data.get("category", "all")
-    await safe_edit(
-        callback.message,
-        text="Шаг 2/4. Выберите шаблон:",
-        reply_markup=get_template_keyboard(category),
-    )
-    await callback.answer()
\ No newline at end of file
+@callbacks.exact("back_templates", state=States.choose_template)
+@wizard_step
+async def back_templates(callback: types.CallbackQuery, state: FSMContext) -> AnswerCallbackQuery:
+    data, catalog = await wizard_context(state)
+    await show_screen(callback.message, template_list(catalog, data.get("category", "all")))
+    return callback.answer()
\ No newline at end of file
@@ -3,22 +3,15 @@ from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 
 from keyboards.navigation_menu_keyboard import get_navigation_menu
-from database.user_repo import get_coupon
+from middlewares.user_context_middleware import UserContext
+from services.screens import GREETING, MENU_PROMPT
 
 router = Router()
 
 @router.message(CommandStart())
-async def handle_start(message: types.Message, state: FSMContext) -> None:
+async def handle_start(message: types.Message, state: FSMContext, user: UserContext) -> None:
     """Отправляет приветствие и главное меню."""
     await state.clear()
-    greeting = (
-        "👋  Вас приветствует AI-ассистент Ильи\u00A0Фомича!\n\n\n"
-        "Чем могу быть полезен?\n\n"
-        "💡 расскажу, зачем нужен Telegram-бот\n\n"
-        "💼 покажу работающие примеры\n\n"
-        "💰 помогу рассчитать стоимость решения\n\n"
-        "✉ свяжу вас напрямую с Ильей"
-    )
-    await message.answer(greeting)
-    coupon_code = await get_coupon(message.from_user.id)
-    await message.answer("Выберите нужный пункт меню:", reply_markup=get_navigation_menu(coupon_code)) 
\ No newline at end of file
+    user.touch()
+    await message.answer(GREETING.text)
+    await message.answer(MENU_PROMPT, reply_markup=get_navigation_menu(user.coupon_code)) 
\ No newline at end of file
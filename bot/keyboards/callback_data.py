@@ -0,0 +1,22 @@
+from aiogram.filters.callback_data import CallbackData
+
+__all__ = [
+    "QuizAnswerCallback",
+    "TemplateCallback",
+]
+
+# Структурированные payload кнопок: "<prefix>:<поля>". Маршрутизируются по префиксу
+# (см. utils/callback_index.py); простые кнопки по-прежнему шлют строку-ключ.
+
+
+class QuizAnswerCallback(CallbackData, prefix="nb_opt"):
+    """Ответ в викторине «Зачем нужен бот?»: ``nb_opt:<вопрос>:<вариант>``."""
+
+    question: int
+    option: int
+
+
+class TemplateCallback(CallbackData, prefix="tpl"):
+    """Карточка шаблона в калькуляторе: ``tpl:<ключ шаблона>``."""
+
+    key: str
@@ -1,8 +1,11 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from urllib.parse import quote
 
-from services.cost_calculator_service import COST_TEMPLATES, MODULES, SUPPORT_PACKAGES
+from config import settings
+from keyboards.callback_data import TemplateCallback
+from services.catalog import Catalog, current_catalog, kept_versions
+from utils.cache import MISSING, TTLCache
 
 __all__ = [
     "get_template_keyboard",
@@ -11,6 +14,8 @@ __all__ = [
     "get_contact_keyboard",
     "get_simple_contact_keyboard",
     "get_category_keyboard",
+    "precompute_keyboards",
+    "keyboard_cache_stats",
 ]
 
 # ---------------------------------------------------------------------------
@@ -22,43 +27,111 @@ def _fmt_price(value: int) -> str:
     return f"{value:,}".replace(",", " ")
 
 
-# Эмодзи для модулей (должны быть объявлены до функций)
-MODULE_EMOJIS = {
-    "calendar": "🗓️",
-    "payments": "💳",
-    "portfolio": "🖼️",
-    "mailing": "📧",
-    "loyalty": "🎁",
-    "crm": "📋",
-    "documents": "📄",
-    "webapp": "🌐",
-    "webapp_shop": "🛒",
-    "quest": "🎲",
-    "admin_panel": "🛠️",
-    "booking": "📆",
-}
-
-# Эмодзи для шаблонов
-TEMPLATE_EMOJIS = {
-    "infobot": "🤖",
-    "tickets": "🎟️",
-    "schedule": "📆",
-    "courses": "📚",
-    "photo": "📷",
-    "coursebot": "🎓",
-    "shop": "🛒",
-    "builder": "🧩",
-}
-
-# Эмодзи для пакетов поддержки
-SUPPORT_EMOJIS = {
-    "no_support": "🚫",
-    "support_6": "🔄",
-    "support_12": "🤝",
-}
+# ---------------------------------------------------------------------------
+# Кэш готовых клавиатур. Клавиатуры зависят только от справочника и выбора
+# пользователя, поэтому одинаковые состояния отдаются одним и тем же объектом.
+# Версия справочника входит в ключ: после его смены старые записи вытесняются.
+# ---------------------------------------------------------------------------
+
+_keyboard_cache: TTLCache[tuple, InlineKeyboardMarkup] = TTLCache(maxsize=settings.keyboard_cache_size)
+# (catalog_version, template_key) -> доступные доп. модули (отфильтрованы и отсортированы по цене);
+# записи версий, вытесненных из снимков справочника, удаляются
+_available_modules: Dict[Tuple[int, str], Tuple[str, ...]] = {}
+
+CATEGORY_KEYS = ("services", "sales", "builder", "all")
+
+
+def keyboard_cache_stats() -> Dict[str, int]:
+    """Счётчики кэша клавиатур: hits, misses, size."""
+    return _keyboard_cache.stats()
+
+
+def _get_available_modules(catalog: Catalog, template_key: str) -> Tuple[str, ...]:
+    available = _available_modules.get((catalog.version, template_key))
+    if available is None:
+        kept = kept_versions()
+        for key in [key for key in _available_modules if key[0] not in kept]:
+            del _available_modules[key]
+        available = _build_available_modules(catalog, template_key)
+        _available_modules[(catalog.version, template_key)] = available
+    return available
+
+
+def _selection_mask(available: Tuple[str, ...], selected: Iterable[str]) -> int:
+    """Битовая маска выбранных модулей: бит i — available[i]."""
+    chosen = set(selected)
+    mask = 0
+    for bit, key in enumerate(available):
+        if key in chosen:
+            mask |= 1 << bit
+    return mask
 
 
 def get_category_keyboard() -> InlineKeyboardMarkup:
+    keyboard = _keyboard_cache.get(("category",))
+    if keyboard is MISSING:
+        keyboard = _build_category_keyboard()
+        _keyboard_cache.set(("category",), keyboard)
+    return keyboard
+
+
+def get_template_keyboard(category: str, *, catalog: Optional[Catalog] = None) -> InlineKeyboardMarkup:
+    catalog = catalog or current_catalog()
+    cache_key = ("template", catalog.version, category)
+    keyboard = _keyboard_cache.get(cache_key)
+    if keyboard is MISSING:
+        keyboard = _build_template_keyboard(catalog, category)
+        _keyboard_cache.set(cache_key, keyboard)
+    return keyboard
+
+
+def get_modules_keyboard(*, selected: List[str], template_key: str, catalog: Optional[Catalog] = None) -> InlineKeyboardMarkup:
+    """Клавиатура дополнительных модулей с учётом выбранного шаблона."""
+    catalog = catalog or current_catalog()
+    available = _get_available_modules(catalog, template_key)
+    cache_key = ("modules", catalog.version, template_key, _selection_mask(available, selected))
+    keyboard = _keyboard_cache.get(cache_key)
+    if keyboard is MISSING:
+        keyboard = _build_modules_keyboard(catalog, available, selected=selected, template_key=template_key)
+        _keyboard_cache.set(cache_key, keyboard)
+    return keyboard
+
+
+def get_support_keyboard(*, catalog: Optional[Catalog] = None) -> InlineKeyboardMarkup:
+    """Клавиатура пакета поддержки. «Без поддержки» идёт первой."""
+    catalog = catalog or current_catalog()
+    cache_key = ("support", catalog.version)
+    keyboard = _keyboard_cache.get(cache_key)
+    if keyboard is MISSING:
+        keyboard = _build_support_keyboard(catalog)
+        _keyboard_cache.set(cache_key, keyboard)
+    return keyboard
+
+
+def precompute_keyboards(template_keys: Optional[Iterable[str]] = None, *, catalog: Optional[Catalog] = None) -> int:
+    """Заранее строит клавиатуры для всех достижимых состояний выбора модулей.
+
+    Возвращает количество построенных клавиатур модулей.
+    """
+    catalog = catalog or current_catalog()
+    get_category_keyboard()
+    get_support_keyboard(catalog=catalog)
+    for category in CATEGORY_KEYS:
+        get_template_keyboard(category, catalog=catalog)
+    built = 0
+    for template_key in template_keys or catalog.templates:
+        available = _get_available_modules(catalog, template_key)
+        for mask in range(1 << len(available)):
+            selected = [key for bit, key in enumerate(available) if mask & (1 << bit)]
+            _keyboard_cache.set(
+                ("modules", catalog.version, template_key, mask),
+                _build_modules_keyboard(catalog, available, selected=selected, template_key=template_key),
+            )
+            built += 1
+    return built
+
+
+def _build_category_keyboard() -> InlineKeyboardMarkup:
     categories = [
         ("all", "🗂️ Показать всё"),
         ("builder", "🧩 Собрать из модулей"),
@@ -71,53 +144,53 @@ def get_category_keyboard() -> InlineKeyboardMarkup:
     buttons.append([InlineKeyboardButton(text="↩️ Назад", callback_data="back_menu")])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-def get_template_keyboard(category: str) -> InlineKeyboardMarkup:
-    from services.cost_calculator_service import COST_TEMPLATES  # local import to avoid cycles
+def _build_template_keyboard(catalog: Catalog, category: str) -> InlineKeyboardMarkup:
+    templates = catalog.templates
     mapping = {
         "services": ["infobot", "photo", "schedule", "coursebot"],
         "sales": ["tickets", "courses", "shop"],
-        "builder": list(COST_TEMPLATES.keys()),  # отображаем все, пользователь соберёт сам
-        "all": list(COST_TEMPLATES.keys()),
+        "builder": list(templates.keys()),  # отображаем все, пользователь соберёт сам
+        "all": list(templates.keys()),
     }
-    keys = mapping.get(category, list(COST_TEMPLATES.keys()))
-    keys_sorted = sorted(keys, key=lambda k: COST_TEMPLATES[k]["base_price"])
+    keys = [k for k in mapping.get(category, templates.keys()) if k in templates]
+    keys_sorted = sorted(keys, key=lambda k: templates[k]["base_price"])
     buttons = []
     for k in keys_sorted:
-        tpl = COST_TEMPLATES[k]
-        emoji = TEMPLATE_EMOJIS.get(k, "📂")
+        tpl = templates[k]
+        emoji = catalog.template_emojis.get(k, "📂")
         text = f"{emoji} {tpl['name']} — {_fmt_price(tpl['base_price'])} ₽"
-        buttons.append([InlineKeyboardButton(text=text, callback_data=f"tpl_{k}")])
+        buttons.append([InlineKeyboardButton(text=text, callback_data=TemplateCallback(key=k).pack())])
     buttons.append([InlineKeyboardButton(text="↩️ Назад", callback_data="back_category")])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def get_modules_keyboard(*, selected: List[str], template_key: str) -> InlineKeyboardMarkup:
-    """Клавиатура дополнительных модулей с учётом выбранного шаблона."""
-    tpl = COST_TEMPLATES.get(template_key, {})
-    included = tpl.get("included", [])
+def _build_available_modules(catalog: Catalog, template_key: str) -> Tuple[str, ...]:
+    modules = catalog.modules
+    tpl = catalog.templates.get(template_key, {})
+    included = tpl.get("included", ())
     # показываем только модули, которые не входят по умолчанию
     # дополнительная фильтрация webapp / webapp_shop
     if template_key == "shop":
         # для магазина скрываем обычный webapp, оставляем витрину
-        available_keys = [k for k in MODULES if k not in included and k != "webapp"]
+        available_keys = [k for k in modules if k not in included and k != "webapp"]
     elif template_key == "infobot":
         allowed_set = {"calendar", "mailing", "webapp", "admin_panel", "booking"}
-        available_keys = [k for k in MODULES if k in allowed_set and k not in included]
+        available_keys = [k for k in modules if k in allowed_set and k not in included]
     else:
         # для остальных скрываем витрину
-        available_keys = [k for k in MODULES if k not in included and k != "webapp_shop"]
+        available_keys = [k for k in modules if k not in included and k != "webapp_shop"]
 
     # сортируем по цене
-    available_keys = sorted(available_keys, key=lambda x: MODULES[x]["price"])
+    return tuple(sorted(available_keys, key=lambda x: modules[x]["price"]))
+
 
+def _build_modules_keyboard(catalog: Catalog, available_keys: Tuple[str, ...], *, selected: List[str], template_key: str) -> InlineKeyboardMarkup:
     keyboard = []
     for key in available_keys:
-        module = MODULES[key]
+        module = catalog.modules[key]
         prefix = "✅ " if key in selected else ""
-        emoji = MODULE_EMOJIS.get(key, "🧩")
-        price = module["price"]
-        if template_key == "builder":
-            price = ((int(price * 1.25 + 999)) // 1000) * 1000  # 25% и округление вверх до 1000
+        emoji = catalog.module_emojis.get(key, "🧩")
+        price = catalog.pricing.module_price(template_key, key)
         keyboard.append([
             InlineKeyboardButton(text=f"{prefix}{emoji} {module['name']} (+{_fmt_price(price)} ₽)", callback_data=key)
         ])
@@ -128,13 +201,13 @@ def get_modules_keyboard(*, selected: List[str], template_key: str) -> InlineKey
     ])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def get_support_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура пакета поддержки. «Без поддержки» идёт первой."""
-    order = ["no_support", "support_6", "support_12"]
+def _build_support_keyboard(catalog: Catalog) -> InlineKeyboardMarkup:
+    # по возрастанию цены: «Без поддержки» первой
+    order = sorted(catalog.support, key=lambda key: catalog.support[key]["price"])
     inline = [
         [
             InlineKeyboardButton(
-                text=f"{SUPPORT_EMOJIS.get(key, '🤝')} {SUPPORT_PACKAGES[key]['name']} (+{_fmt_price(SUPPORT_PACKAGES[key]['price'])} ₽)",
+                text=f"{catalog.support_emojis.get(key, '🤝')} {catalog.support[key]['name']} (+{_fmt_price(catalog.support[key]['price'])} ₽)",
                 callback_data=key,
             )
         ]
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import signal
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Dict, Optional
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+
+from config import settings
+from database.connection import close_pool, init_pool
+from database.migrate import run_migrations
+from keyboards.cost_calculator_keyboard import precompute_keyboards
+from metrics_server import start_metrics_server
+from middlewares.inflight_middleware import InFlightMiddleware
+from services.broadcast import resume_broadcasts
+from services.catalog import current_catalog, load_catalog, on_catalog_change, start_catalog_listener
+from services.coupons import start_coupon_refresh
+from services.interaction_events import start_interaction_events
+from services.media_registry import preload as preload_media, warm_up as warm_up_media
+from services.screens import rebuild_screens
+from sharding import consume_updates
+from utils.log_pipeline import log_event
+from utils.metrics import REGISTRY
+from webhook import start_webhook, stop_accepting
+
+__all__ = ["Lifecycle"]
+
+
+class Lifecycle:
+    """Запуск и остановка бота.
+
+    Старт идёт фазами: пул и миграции последовательно, затем параллельно —
+    проверка токена (``getMe``), справочник с экранами и клавиатурами, журнал
+    нажатий, купоны и кэш медиа. Апдейты начинают приниматься только после всех фаз;
+    время каждой пишется в лог и в gauge ``bot_startup_phase_seconds``.
+
+    По SIGTERM/SIGINT приём апдейтов прекращается, начатые хендлеры дорабатывают
+    (не дольше ``shutdown_drain_timeout``), затем сбрасываются буферы и закрывается пул.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher) -> None:
+        self.bot = bot
+        self.dp = dp
+        self.timings: Dict[str, float] = {}
+        self._in_flight = InFlightMiddleware()
+        dp.update.outer_middleware(self._in_flight)
+        self._stop = asyncio.Event()
+        self._metrics_runner: Optional[web.AppRunner] = None
+        REGISTRY.gauge(
+            "bot_startup_phase_seconds",
+            "Длительность фаз запуска",
+            lambda: {(phase,): seconds for phase, seconds in self.timings.items()},
+            ("phase",),
+        )
+
+    # -- запуск -----------------------------------------------------------------
+
+    @asynccontextmanager
+    async def _phase(self, name: str) -> AsyncIterator[None]:
+        started = time.perf_counter()
+        yield
+        self.timings[name] = time.perf_counter() - started
+        logging.info("Запуск: %s — %.0f мс", name, self.timings[name] * 1000)
+
+    async def _timed(self, name: str, step: Awaitable[None]) -> None:
+        async with self._phase(name):
+            await step
+
+    async def _check_token(self) -> None:
+        me = await self.bot.get_me()
+        logging.info("Бот @%s (id %s)", me.username, me.id)
+
+    async def _load_catalog(self) -> None:
+        await load_catalog()
+        # экраны калькулятора собираются заранее и пересобираются при смене справочника
+        rebuild_screens(current_catalog())
+        on_catalog_change(rebuild_screens)
+        if settings.keyboard_precompute:
+            logging.info("Предварительно построено клавиатур модулей: %d", precompute_keyboards())
+            on_catalog_change(lambda catalog: precompute_keyboards(catalog=catalog))
+        await start_catalog_listener()
+
+    async def _preload_media(self) -> None:
+        logging.info("Медиа с известным file_id: %d", await preload_media())
+
+    async def startup(self) -> None:
+        """Готовит всё, что нужно хендлерам; при ошибке любой фазы бот не стартует."""
+        started = time.perf_counter()
+        # пул создаётся и прогревается заранее, а не на первом апдейте
+        async with self._phase("pool"):
+            await init_pool()
+        # схема БД приводится к актуальной версии до начала приёма апдейтов
+        async with self._phase("migrations"):
+            await run_migrations()
+        await asyncio.gather(
+            self._timed("get_me", self._check_token()),
+            self._timed("catalog", self._load_catalog()),
+            self._timed("interaction_events", start_interaction_events()),
+            self._timed("coupons", start_coupon_refresh()),
+            self._timed("media", self._preload_media()),
+        )
+        async with self._phase("broadcasts"):
+            await resume_broadcasts(self.bot)
+        if settings.metrics_port:
+            self._metrics_runner = await start_metrics_server()
+        # при нескольких обработчиках медиа загружает только первый
+        if settings.media_warmup_chat_id is not None and not settings.worker_index:
+            # загрузка новых файлов в Telegram идёт в фоне и не задерживает старт
+            asyncio.create_task(warm_up_media(self.bot, settings.media_warmup_chat_id))
+        self.timings["total"] = time.perf_counter() - started
+        log_event("startup", **{f"{phase}_ms": round(seconds * 1000, 1) for phase, seconds in self.timings.items()})
+
+    # -- работа и остановка ----------------------------------------------------
+
+    def request_stop(self) -> None:
+        """Начать остановку (обработчик SIGTERM/SIGINT)."""
+        if not self._stop.is_set():
+            logging.info("Получен сигнал остановки, прекращаем приём апдейтов")
+            self._stop.set()
+
+    def _install_signal_handlers(self) -> None:
+        if settings.worker_index is not None:
+            # остановкой обработчика управляет супервизор: дописав его очередь, он закрывает stdin
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, signal.SIG_IGN)
+            return
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except NotImplementedError:
+                # Windows: остаётся KeyboardInterrupt
+                pass
+
+    async def serve(self) -> None:
+        """Принимает апдейты (поллинг, вебхук или от супервизора) до остановки, затем дожидается хендлеров."""
+        self._install_signal_handlers()
+        if settings.worker_index is not None:
+            await consume_updates(self.bot, self.dp)
+            await self._drain()
+            return
+        if settings.run_mode == "webhook":
+            runner = await start_webhook(self.dp, self.bot)
+            try:
+                await self._stop.wait()
+                stop_accepting(runner)
+                await self._drain()
+            finally:
+                await runner.cleanup()
+            return
+        # после работы в режиме вебхука getUpdates недоступен, пока вебхук не снят
+        await self.bot.delete_webhook()
+        polling = asyncio.create_task(self.dp.start_polling(self.bot))
+        stop = asyncio.create_task(self._stop.wait())
+        # поллинг завершится сам, если сигнал перехватил aiogram, иначе его останавливаем мы
+        await asyncio.wait((polling, stop), return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        if not polling.done():
+            polling.cancel()
+        (result,) = await asyncio.gather(polling, return_exceptions=True)
+        # апдейты при поллинге обрабатываются отдельными задачами и переживают сам поллинг
+        await self._drain()
+        if isinstance(result, Exception):
+            raise result
+
+    async def _drain(self) -> None:
+        started = time.perf_counter()
+        left = await self._in_flight.wait_idle(settings.shutdown_drain_timeout)
+        if left:
+            logging.warning("Остановка: %d апдейтов не завершились за %.0f с", left, settings.shutdown_drain_timeout)
+        else:
+            logging.info("Остановка: начатые апдейты завершены за %.0f мс", (time.perf_counter() - started) * 1000)
+
+    async def shutdown(self) -> None:
+        """Сбрасывает буферы (shutdown-хуки пула) и освобождает ресурсы."""
+        await close_pool()
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+        await self.bot.session.close()
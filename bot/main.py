@@ -2,34 +2,78 @@ import asyncio
 import logging
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 
 from config import settings
 from handlers.start_handler import router as start_router
 from handlers.navigation_menu_handlers import router as nav_router
-from database.connection import close_pool
+from handlers.broadcast_handler import router as broadcast_router
+from database.fsm_storage import PostgresStorage
 from middlewares.logging_middleware import InteractionLoggingMiddleware
+from middlewares.throttling_middleware import ThrottlingMiddleware
+from middlewares.outbound_scheduler import OutboundScheduler
+from middlewares.metrics_middleware import MetricsMiddleware, RequestMetricsMiddleware
+from middlewares.user_context_middleware import UserContextMiddleware
+from utils.log_pipeline import setup_logging
+from lifecycle import Lifecycle
+from sharding import Supervisor
 
-async def main() -> None:
-    logging.basicConfig(
-        level=logging.INFO,
-        format="\n%(asctime)s | %(levelname)s | %(message)s",
-    )
-    # подавим подробные логи aiogram
-    for noisy in ("aiogram.event", "aiogram.dispatcher"):
-        logging.getLogger(noisy).setLevel(logging.WARNING)
-    bot = Bot(token=settings.bot_token, parse_mode=ParseMode.HTML)
-    dp = Dispatcher()
+def create_bot() -> Bot:
+    """Бот с middleware сессии: очередь исходящих запросов и метрики Bot API."""
+    session = None
+    if settings.telegram_api_url:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url))
+    bot = Bot(token=settings.bot_token, session=session, parse_mode=ParseMode.HTML)
+    # все исходящие запросы проходят через лимиты Telegram и очередь приоритетов
+    bot.session.middleware(OutboundScheduler())
+    # метрики Bot API регистрируются после планировщика: меряется сам запрос
+    bot.session.middleware(RequestMetricsMiddleware())
+    return bot
+
+def create_dispatcher() -> Dispatcher:
+    """Диспетчер с хранилищем FSM, middleware и роутерами бота."""
+    dp = Dispatcher(storage=PostgresStorage())
     # Middlewares
     dp.message.middleware(InteractionLoggingMiddleware())
     dp.callback_query.middleware(InteractionLoggingMiddleware())
+    dp.message.middleware(MetricsMiddleware())
+    dp.callback_query.middleware(MetricsMiddleware())
+    # лимит частоты нажатий проверяется до фильтров и хендлеров
+    dp.callback_query.outer_middleware(ThrottlingMiddleware())
+    # данные пользователя (купон и пр.) — один раз на апдейт, уже после лимита нажатий
+    dp.message.outer_middleware(UserContextMiddleware())
+    dp.callback_query.outer_middleware(UserContextMiddleware())
 
     dp.include_router(start_router)
     dp.include_router(nav_router)
+    dp.include_router(broadcast_router)
+    return dp
+
+async def main() -> None:
+    # запись логов идёт в фоновом потоке, хендлеры только кладут записи в очередь
+    log_listener = setup_logging(
+        level=settings.log_level,
+        fmt=settings.log_format,
+        queue_size=settings.log_queue_size,
+    )
+    # подавим подробные логи aiogram
+    for noisy in ("aiogram.event", "aiogram.dispatcher"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+    bot = create_bot()
+    dp = create_dispatcher()
+    if settings.workers > 1 and settings.worker_index is None:
+        # супервизор: приём апдейтов и раздача их процессам-обработчикам
+        lifecycle = Supervisor(bot, dp)
+    else:
+        lifecycle = Lifecycle(bot, dp)
     try:
-        await dp.start_polling(bot)
+        await lifecycle.startup()
+        await lifecycle.serve()
     finally:
-        await close_pool()
+        await lifecycle.shutdown()
+        log_listener.stop()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
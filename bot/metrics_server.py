@@ -0,0 +1,49 @@
+import logging
+
+from aiohttp import web
+
+from config import settings
+from database.user_repo import user_cache_stats
+from keyboards.cost_calculator_keyboard import keyboard_cache_stats
+from services.interaction_events import events_stats
+from utils.log_pipeline import dropped_records
+from utils.metrics import REGISTRY
+
+__all__ = ["start_metrics_server"]
+
+
+def _register_cache_gauges() -> None:
+    REGISTRY.gauge(
+        "bot_cache_lookups",
+        "Обращения к кэшам процесса",
+        lambda: {
+            (cache, result): stats[result]
+            for cache, stats in (("user", user_cache_stats()), ("keyboard", keyboard_cache_stats()))
+            for result in ("hits", "misses")
+        },
+        ("cache", "result"),
+    )
+    REGISTRY.gauge(
+        "bot_interaction_events",
+        "Журнал нажатий: в буфере, записано, потеряно",
+        lambda: {(name,): value for name, value in events_stats().items()},
+        ("state",),
+    )
+    REGISTRY.gauge("bot_log_records_dropped", "Записи лога, не поместившиеся в очередь", lambda: {(): dropped_records()})
+
+
+async def _metrics(request: web.Request) -> web.Response:
+    return web.Response(text=REGISTRY.render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server() -> web.AppRunner:
+    """Поднимает HTTP-сервер с ``/metrics`` в текстовом формате Prometheus."""
+    _register_cache_gauges()
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.metrics_host, port=settings.metrics_port)
+    await site.start()
+    logging.info("Метрики доступны на %s:%s/metrics", settings.metrics_host, settings.metrics_port)
+    return runner
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Callable, Dict
+
+from aiogram import BaseMiddleware, types
+
+__all__ = ["InFlightMiddleware"]
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """Считает апдейты, которые сейчас обрабатываются.
+
+    Регистрируется как outer-middleware ``dp.update``: при остановке бота
+    приём апдейтов прекращается, а :meth:`wait_idle` дожидается, пока
+    начатые хендлеры допишут ответы и состояние FSM.
+    """
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Any],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        self.in_flight += 1
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> int:
+        """Ждёт завершения начатых апдейтов не дольше ``timeout`` сек.; возвращает, сколько не успело."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.in_flight
@@ -1,9 +1,55 @@
-import logging
+import time
+from contextvars import ContextVar
 from aiogram import BaseMiddleware, types
-from typing import Callable, Any, Dict
+from typing import Callable, Any, Dict, Optional
+
+from config import settings
+from services.interaction_events import record_event
+from utils.callback_index import handler_name
+from utils.log_pipeline import log_event, truncate_preview
+
+# дополнительные поля события "callback" текущего нажатия (см. describe_callback)
+_callback_details: ContextVar[Optional[Dict[str, Any]]] = ContextVar("callback_log_details", default=None)
+
+
+def describe_callback(*, sample: float = 1.0, preview: Optional[Callable[[], str]] = None, **fields: Any) -> bool:
+    """Дополняет событие "callback" текущего нажатия превью ответа и полями.
+
+    ``sample`` и ``preview`` передаются в :func:`log_event` вместе с событием,
+    отдельная запись не создаётся. False — нажатие обрабатывается мимо
+    :class:`InteractionLoggingMiddleware`, событие придётся писать самому.
+    """
+    details = _callback_details.get()
+    if details is None:
+        return False
+    details.update(fields, sample=sample, preview=preview)
+    return True
+
+
+def _message_key(text: str) -> str:
+    # команды различаем по имени, остальной текст — одним ключом
+    if text.startswith("/"):
+        return text.split(maxsplit=1)[0].split("@", 1)[0]
+    return "message"
+
+
+def _message_preview(text: str) -> Callable[[], str]:
+    def build() -> str:
+        lines = text.split("\n", 10)[:10]
+        return truncate_preview("\n".join(lines).strip(), settings.log_preview_chars)
+
+    return build
+
 
 class InteractionLoggingMiddleware(BaseMiddleware):
-    """Middleware пишет в лог, какие сообщения и callback нажимал пользователь."""
+    """Middleware пишет в лог, какие сообщения и callback нажимал пользователь.
+
+    На каждый апдейт — одно структурированное событие с именем обработчика
+    и временем его работы; превью ответа и долю сэмплирования нажатия хендлер
+    добавляет через :func:`describe_callback`. Запись уходит в очередь логирования
+    и не блокирует цикл событий. Ключ нажатия дополнительно попадает в журнал
+    interaction_events.
+    """
 
     async def __call__(
         self,
@@ -11,14 +57,34 @@ class InteractionLoggingMiddleware(BaseMiddleware):
         event: types.TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
-        username = f"@{event.from_user.username}" if event.from_user.username else event.from_user.full_name
-
-        if isinstance(event, types.Message):
-            result = await handler(event, data)
-            text = event.text or ""
-            lines = text.split("\n")
-            preview = "\n".join(lines[:10]).strip()
-            logging.info("%s -> сообщение | %s", username, preview)
-            return result
-        # callbacks логируются в самих хендлерах
-        return await handler(event, data) 
\ No newline at end of file
+        started = time.perf_counter()
+        details: Dict[str, Any] = {}
+        token = _callback_details.set(details)
+        try:
+            return await handler(event, data)
+        finally:
+            _callback_details.reset(token)
+            latency_ms = round((time.perf_counter() - started) * 1000, 2)
+            user = event.from_user
+            if isinstance(event, types.Message):
+                record_event(user.id, _message_key(event.text or ""))
+                log_event(
+                    "message",
+                    user_id=user.id,
+                    username=user.username,
+                    handler=handler_name(data),
+                    latency_ms=latency_ms,
+                    preview=_message_preview(event.text or ""),
+                )
+            elif isinstance(event, types.CallbackQuery):
+                record_event(user.id, event.data or "")
+                # превью ответа и сэмплирование задают сами хендлеры (log_button)
+                log_event(
+                    "callback",
+                    user_id=user.id,
+                    username=user.username,
+                    callback=event.data,
+                    handler=handler_name(data),
+                    latency_ms=latency_ms,
+                    **details,
+                )
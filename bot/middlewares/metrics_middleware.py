@@ -0,0 +1,104 @@
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Tuple
+
+from aiogram import BaseMiddleware, types
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramAPIError
+from aiogram.methods import TelegramMethod
+
+from config import settings
+from utils.callback_index import handler_name
+from utils.metrics import Counter, Histogram, REGISTRY
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+__all__ = [
+    "MetricsMiddleware",
+    "RequestMetricsMiddleware",
+]
+
+_handler_duration = REGISTRY.histogram(
+    "bot_handler_duration_seconds", "Время обработки апдейта хендлером", ("handler", "state")
+)
+_updates = REGISTRY.counter("bot_updates_total", "Обработанные апдейты", ("kind", "handler", "outcome"))
+_callbacks = REGISTRY.counter("bot_callbacks_total", "Нажатия по callback_data", ("key",))
+_api_duration = REGISTRY.histogram("telegram_api_duration_seconds", "Время запроса к Bot API", ("method",))
+_api_errors = REGISTRY.counter("telegram_api_errors_total", "Ошибки Bot API", ("method", "error"))
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Гистограммы времени хендлеров и счётчики апдейтов/нажатий.
+
+    Регистрируется как inner-middleware: к этому моменту известен выбранный
+    хендлер. Объекты метрик кэшируются по ключу, поэтому на апдейт — пара
+    поисков в словаре и ``perf_counter``.
+    """
+
+    def __init__(self) -> None:
+        # (kind, handler, state) -> (гистограмма, счётчик ok, счётчик error)
+        self._children: Dict[Tuple[str, str, str], Tuple[Histogram, Counter, Counter]] = {}
+        self._max_keys = settings.metrics_max_callback_keys
+
+    def _metrics_for(self, kind: str, handler: str, state: str) -> Tuple[Histogram, Counter, Counter]:
+        key = (kind, handler, state)
+        children = self._children.get(key)
+        if children is None:
+            children = self._children[key] = (
+                _handler_duration.labels(handler, state),
+                _updates.labels(kind, handler, "ok"),
+                _updates.labels(kind, handler, "error"),
+            )
+        return children
+
+    def _count_callback(self, data: str) -> None:
+        # число меток ограничено: подделанные callback_data не раздувают метрики
+        counter = _callbacks.get(data)
+        if counter is None:
+            counter = _callbacks.labels(data if len(_callbacks) < self._max_keys else "other")
+        counter.inc()
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Any],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = handler_name(data) or "unknown"
+        kind = "callback" if isinstance(event, types.CallbackQuery) else "message"
+        duration, ok, error = self._metrics_for(kind, name, data.get("raw_state") or "")
+        if kind == "callback":
+            self._count_callback(event.data or "")
+        started = time.perf_counter()
+        try:
+            result = await handler(event, data)
+        except Exception:
+            error.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - started)
+        ok.inc()
+        return result
+
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    """Время и ошибки запросов к Bot API по методам (middleware сессии).
+
+    Регистрируется после планировщика, чтобы мерить сам запрос, без ожидания в очереди.
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: "Bot",
+        method: TelegramMethod,
+    ) -> Any:
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramAPIError as exc:
+            _api_errors.labels(name, type(exc).__name__).inc()
+            raise
+        finally:
+            _api_duration.labels(name).observe(time.perf_counter() - started)
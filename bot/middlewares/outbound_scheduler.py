@@ -0,0 +1,234 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import DeleteMessage, TelegramMethod
+
+from config import settings
+from utils.metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+__all__ = [
+    "PRIORITY_INTERACTIVE",
+    "PRIORITY_BULK",
+    "bulk_priority",
+    "OutboundScheduler",
+]
+
+# Чем меньше число, тем раньше запрос уходит в Telegram
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+_priority: ContextVar[int] = ContextVar("outbound_priority", default=PRIORITY_INTERACTIVE)
+
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk"}
+_wait_seconds = REGISTRY.histogram(
+    "telegram_outbound_wait_seconds", "Ожидание запроса в планировщике до отправки", ("priority",)
+)
+_retries = REGISTRY.counter("telegram_outbound_retries_total", "Повторы запросов после 429").labels()
+
+
+@contextmanager
+def bulk_priority() -> Iterator[None]:
+    """Запросы внутри блока (рассылки, предзагрузка) пропускают интерактивные вперёд."""
+    token = _priority.set(PRIORITY_BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _GlobalGate:
+    """Общий лимит запросов в секунду с очередью по приоритетам.
+
+    Пока очередь пуста и токен есть, запрос проходит сразу. Иначе он ждёт
+    в куче ``(priority, seq)``, из которой фоновая задача выпускает запросы
+    по одному по мере пополнения токенов.
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._heap: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+
+    def depth(self) -> Dict[int, int]:
+        depth: Dict[int, int] = {}
+        for priority, _, future in self._heap:
+            if not future.done():
+                depth[priority] = depth.get(priority, 0) + 1
+        return depth
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self) -> float:
+        """0 — токен взят; иначе сколько ждать до следующего."""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._refill(now)
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0.0
+        return (1.0 - self._tokens) / self.rate
+
+    async def acquire(self, priority: int) -> None:
+        if not self._heap and self._try_take() == 0.0:
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run(), name="outbound-scheduler")
+        await future
+
+    async def _run(self) -> None:
+        while self._heap:
+            delay = self._try_take()
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+            while self._heap:
+                _, _, future = heapq.heappop(self._heap)
+                if not future.done():
+                    future.set_result(None)
+                    break
+            else:
+                # все ожидающие отменены — возвращаем токен
+                self._tokens += 1.0
+
+
+class _ChatPacer:
+    """Темп отправки в отдельный чат (GCRA): ``interval`` между запросами и запас ``burst``.
+
+    Хранит только «теоретическое время прихода» по каждому чату; записи
+    упорядочены по последнему обращению, освободившиеся удаляются с начала.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._tat: "OrderedDict[int, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def reserve(self, chat_id: int, interval: float, burst: int) -> float:
+        """Бронирует слот и возвращает задержку до него (сек.)."""
+        now = time.monotonic()
+        tat = self._tat.get(chat_id, now)
+        start = max(now, tat - (burst - 1) * interval)
+        self._tat[chat_id] = max(tat, start) + interval
+        self._tat.move_to_end(chat_id)
+        self._evict(now)
+        return start - now
+
+    def push_back(self, chat_id: int, seconds: float) -> None:
+        """После 429: следующий запрос в чат не раньше чем через ``seconds``."""
+        self._tat[chat_id] = max(self._tat.get(chat_id, 0.0), time.monotonic() + seconds)
+        self._tat.move_to_end(chat_id)
+
+    def _evict(self, now: float) -> None:
+        tat = self._tat
+        if len(tat) > self.maxsize:
+            tat.popitem(last=False)
+        for _ in range(2):
+            if not tat or next(iter(tat.values())) > now:
+                return
+            tat.popitem(last=False)
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """Планировщик исходящих запросов к Bot API (middleware сессии aiogram).
+
+    Запросы к конкретному чату выдерживают темп чата (личные — около 1/с,
+    группы — 20/мин), затем проходят общий лимит (~30/с) в порядке
+    приоритета: интерактивные правки раньше массовых рассылок. На 429
+    запрос ждёт ``retry_after`` и повторяется.
+    """
+
+    def __init__(self) -> None:
+        self.gate = _GlobalGate(settings.outbound_global_rate, settings.outbound_global_burst)
+        self.pacer = _ChatPacer(settings.outbound_max_chats)
+        self.max_retries = settings.outbound_max_retries
+        self._chat_waiting = 0
+        REGISTRY.gauge("telegram_outbound_queue_depth", "Запросы в очереди общего лимита", self._depth_gauge, ("priority",))
+        REGISTRY.gauge(
+            "telegram_outbound_chat_waiting", "Запросы, ждущие темпа своего чата", lambda: {(): self._chat_waiting}
+        )
+
+    def _depth_gauge(self) -> Dict[Tuple[str, ...], float]:
+        depth = self.gate.depth()
+        return {(name,): depth.get(priority, 0) for priority, name in _PRIORITY_NAMES.items()}
+
+    def _pace(self, chat_id: Any) -> float:
+        if isinstance(chat_id, int) and chat_id < 0:
+            return self.pacer.reserve(chat_id, 60.0 / settings.outbound_group_per_minute, settings.outbound_group_burst)
+        return self.pacer.reserve(chat_id, 1.0 / settings.outbound_chat_rate, settings.outbound_chat_burst)
+
+    async def _wait_turn(self, chat_id: Any, priority: int) -> None:
+        started = time.monotonic()
+        if chat_id is not None:
+            delay = self._pace(chat_id)
+            if delay > 0:
+                self._chat_waiting += 1
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self._chat_waiting -= 1
+        await self.gate.acquire(priority)
+        _wait_seconds.labels(_PRIORITY_NAMES[priority]).observe(time.monotonic() - started)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: "Bot",
+        method: TelegramMethod,
+    ) -> Any:
+        # удаление не создаёт сообщений и не упирается в темп чата
+        chat_id = None if isinstance(method, DeleteMessage) else getattr(method, "chat_id", None)
+        priority = _priority.get()
+        attempt = 0
+        while True:
+            await self._wait_turn(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as exc:
+                attempt += 1
+                _retries.inc()
+                if attempt > self.max_retries:
+                    raise
+                logging.warning(
+                    "429 на %s (chat_id=%s), повтор через %s с", type(method).__name__, chat_id, exc.retry_after
+                )
+                if chat_id is not None:
+                    self.pacer.push_back(chat_id, exc.retry_after)
+                else:
+                    self.gate.pause(exc.retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        """Глубина очередей и время ожидания по приоритетам."""
+        return {
+            "queued": self.gate.depth(),
+            "chat_waiting": self._chat_waiting,
+            "tracked_chats": len(self.pacer),
+            "retries": _retries.value,
+            "waits": {values[0]: hist.snapshot() for values, hist in _wait_seconds.items()},
+        }
@@ -0,0 +1,58 @@
+from aiogram import BaseMiddleware, types
+from typing import Any, Callable, Dict, Tuple
+
+from config import settings
+from states.cost_calculator_states import CostCalculatorStates
+from utils.metrics import REGISTRY
+from utils.token_bucket import TokenBucketStore
+
+# Экраны с тяжёлыми ответами (альбомы медиа)
+MEDIA_CALLBACKS = frozenset({"examples", "case_shop", "case_booking"})
+
+_throttled = REGISTRY.counter("bot_throttled_callbacks_total", "Отклонённые лимитом нажатия", ("group",))
+
+
+def callback_group(callback_data: str, raw_state: str | None) -> str:
+    """Группа лимитов для нажатия: modules, media или default."""
+    if raw_state == CostCalculatorStates.choose_modules.state:
+        return "modules"
+    if callback_data in MEDIA_CALLBACKS:
+        return "media"
+    return "default"
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничивает частоту нажатий: token bucket на пару (пользователь, группа).
+
+    Регистрируется как outer-middleware callback_query, чтобы лишние нажатия
+    отсекались до фильтров и хендлеров. Такие нажатия получают пустой
+    ``answerCallbackQuery`` (снимает «часики» на кнопке) и дальше не идут.
+    """
+
+    def __init__(self) -> None:
+        self.limits: Dict[str, Tuple[float, float]] = {
+            group: (rate, settings.throttle_burst.get(group, 1))
+            for group, rate in settings.throttle_rates.items()
+        }
+        self.buckets: TokenBucketStore[Tuple[int, str]] = TokenBucketStore(
+            maxsize=settings.throttle_max_buckets,
+            idle_ttl=settings.throttle_idle_ttl,
+        )
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Any],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, types.CallbackQuery):
+            return await handler(event, data)
+        group = callback_group(event.data or "", data.get("raw_state"))
+        limit = self.limits.get(group) or self.limits.get("default")
+        if limit is None:
+            return await handler(event, data)
+        rate, burst = limit
+        if self.buckets.consume((event.from_user.id, group), rate, burst):
+            return await handler(event, data)
+        _throttled.labels(group).inc()
+        return event.answer()
@@ -0,0 +1,79 @@
+from typing import Any, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, types
+
+from database.user_repo import UserRow, load_user, save_user_changes
+
+__all__ = ["UserContext", "UserContextMiddleware"]
+
+
+class UserContext:
+    """Данные пользователя на время одного апдейта: купон, регистрация, блокировка.
+
+    Хендлер получает объект в аргументе ``user`` и читает поля без обращения
+    к БД. Изменения (:meth:`set_coupon`, :meth:`touch`) сразу видны в полях,
+    а в БД записываются middleware одной командой после хендлера.
+    """
+
+    __slots__ = ("user_id", "registered", "coupon_code", "blocked", "coupon_changed", "touched")
+
+    def __init__(self, user_id: int, row: UserRow) -> None:
+        self.user_id = user_id
+        self.registered = row.registered
+        self.coupon_code = row.coupon_code
+        self.blocked = row.blocked
+        self.coupon_changed = False
+        self.touched = False
+
+    def set_coupon(self, coupon_code: Optional[str]) -> None:
+        self.coupon_code = coupon_code or None
+        self.coupon_changed = True
+
+    def touch(self) -> None:
+        """Регистрирует пользователя (получатель рассылок) и снимает отметку о блокировке.
+
+        Изменение записывается всегда: отметку о блокировке ставит рассылка
+        (возможно, в другом процессе) мимо кэша, и поле ``blocked`` может быть
+        устаревшим. Для пользователя без блокировки запрос ничего не меняет
+        (условие WHERE в ``user_repo``).
+        """
+        self.registered = True
+        self.blocked = False
+        self.touched = True
+
+    @property
+    def dirty(self) -> bool:
+        return self.coupon_changed or self.touched
+
+    def row(self) -> UserRow:
+        return UserRow(self.registered, self.coupon_code, self.blocked)
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """Кладёт в ``data["user"]`` :class:`UserContext` отправителя и сохраняет его изменения.
+
+    Данные берутся из кэша ``user_repo``; у «холодного» пользователя они обычно
+    уже загружены вместе с состоянием FSM (см. ``PostgresStorage``). Изменения
+    записываются, только если хендлер завершился без ошибки.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Any],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        from_user: Optional[types.User] = data.get("event_from_user")
+        if from_user is None:
+            return await handler(event, data)
+        user = UserContext(from_user.id, await load_user(from_user.id))
+        data["user"] = user
+        result = await handler(event, data)
+        if user.dirty:
+            await save_user_changes(
+                user.user_id,
+                user.row(),
+                coupon_changed=user.coupon_changed,
+                touched=user.touched,
+            )
+        return result
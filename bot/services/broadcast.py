@@ -0,0 +1,213 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+
+from config import settings
+from database.broadcast_repo import (
+    claim_job,
+    fetch_recipients,
+    finish_job,
+    get_job,
+    mark_blocked,
+    release_job,
+    running_job_ids,
+    save_checkpoint,
+)
+from database.connection import register_shutdown_hook
+from middlewares.outbound_scheduler import bulk_priority
+
+__all__ = [
+    "start_broadcast",
+    "resume_broadcasts",
+    "active_broadcasts",
+]
+
+# job_id -> задача рассылки в этом экземпляре
+_running: Dict[int, asyncio.Task] = {}
+_hook_registered = False
+
+
+class _Progress:
+    """Прогресс рассылки и вычисление контрольной точки.
+
+    Получатели ставятся в очередь по возрастанию user_id, а отправляются
+    параллельно, поэтому безопасная контрольная точка — на единицу меньше
+    минимального ещё не обработанного user_id.
+    """
+
+    def __init__(self, job) -> None:
+        self.last_enqueued: int = job["last_user_id"]
+        self.sent: int = job["sent"]
+        self.failed: int = job["failed"]
+        self.blocked: int = job["blocked"]
+        self.in_flight: Set[int] = set()
+        self.new_blocked: List[int] = []
+        self.stopped = False
+
+    def checkpoint(self) -> int:
+        return min(self.in_flight) - 1 if self.in_flight else self.last_enqueued
+
+
+async def _deliver(bot: Bot, job, user_id: int, progress: _Progress) -> None:
+    try:
+        await bot.copy_message(chat_id=user_id, from_chat_id=job["from_chat_id"], message_id=job["message_id"])
+        progress.sent += 1
+    except TelegramForbiddenError:
+        progress.blocked += 1
+        progress.new_blocked.append(user_id)
+    except TelegramAPIError as exc:
+        progress.failed += 1
+        logging.warning("Рассылка #%s: не доставлено %s: %s", job["id"], user_id, exc)
+    except Exception:
+        progress.failed += 1
+        logging.exception("Рассылка #%s: ошибка отправки %s", job["id"], user_id)
+
+
+async def _worker(bot: Bot, job, queue: "asyncio.Queue[int]", progress: _Progress) -> None:
+    with bulk_priority():
+        while True:
+            user_id = await queue.get()
+            try:
+                if not progress.stopped:
+                    await _deliver(bot, job, user_id, progress)
+            finally:
+                progress.in_flight.discard(user_id)
+                queue.task_done()
+
+
+async def _save(job_id: int, progress: _Progress) -> Optional[str]:
+    blocked, progress.new_blocked = progress.new_blocked, []
+    await mark_blocked(blocked)
+    return await save_checkpoint(
+        job_id,
+        progress.checkpoint(),
+        progress.sent,
+        progress.failed,
+        progress.blocked,
+        settings.broadcast_lease,
+    )
+
+
+async def _checkpoint_loop(job_id: int, progress: _Progress) -> None:
+    while True:
+        await asyncio.sleep(settings.broadcast_checkpoint_interval)
+        try:
+            status = await _save(job_id, progress)
+        except Exception:
+            logging.exception("Рассылка #%s: не удалось сохранить контрольную точку", job_id)
+            continue
+        if status != "running":
+            logging.info("Рассылка #%s остановлена (%s)", job_id, status)
+            progress.stopped = True
+            return
+
+
+async def _claim(job_id: int):
+    """Берёт рассылку в работу; пока аренда чужая, повторяет попытку.
+
+    Аренда может остаться и от этого же экземпляра, перезапущенного раньше,
+    чем она истекла: без повтора такая рассылка стояла бы до следующего рестарта.
+    """
+    while True:
+        job = await claim_job(job_id, settings.broadcast_lease)
+        if job is not None:
+            return job
+        current = await get_job(job_id)
+        if current is None or current["status"] != "running":
+            return None
+        logging.info(
+            "Рассылка #%s: аренда занята до %s, повторим через %.0f с",
+            job_id,
+            current["lease_until"],
+            settings.broadcast_lease,
+        )
+        await asyncio.sleep(settings.broadcast_lease)
+
+
+async def _run(bot: Bot, job_id: int) -> None:
+    job = await _claim(job_id)
+    if job is None:
+        return
+    logging.info("Рассылка #%s: старт с user_id > %s", job_id, job["last_user_id"])
+    progress = _Progress(job)
+    queue: "asyncio.Queue[int]" = asyncio.Queue(maxsize=settings.broadcast_workers * 2)
+    workers = [asyncio.create_task(_worker(bot, job, queue, progress)) for _ in range(settings.broadcast_workers)]
+    checkpoints = asyncio.create_task(_checkpoint_loop(job_id, progress))
+    completed = False
+    try:
+        while not progress.stopped:
+            page = await fetch_recipients(progress.last_enqueued, settings.broadcast_page_size)
+            for user_id in page:
+                progress.in_flight.add(user_id)
+                await queue.put(user_id)
+                progress.last_enqueued = user_id
+                if progress.stopped:
+                    break
+            if len(page) < settings.broadcast_page_size:
+                break
+        await queue.join()
+        completed = not progress.stopped
+    finally:
+        checkpoints.cancel()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(checkpoints, *workers, return_exceptions=True)
+        try:
+            await _save(job_id, progress)
+            if completed:
+                await finish_job(job_id)
+            else:
+                await release_job(job_id)
+        except Exception:
+            logging.exception("Рассылка #%s: не удалось сохранить итог", job_id)
+    outcome = "завершена" if completed else "остановлена"
+    logging.info(
+        "Рассылка #%s %s: отправлено %s, заблокировали %s, ошибок %s",
+        job_id,
+        outcome,
+        progress.sent,
+        progress.blocked,
+        progress.failed,
+    )
+    try:
+        await bot.send_message(
+            job["created_by"],
+            f"Рассылка #{job_id} {outcome}: отправлено {progress.sent}, "
+            f"заблокировали бота {progress.blocked}, ошибок {progress.failed}.",
+        )
+    except TelegramAPIError:
+        pass
+
+
+async def _stop_all() -> None:
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    # задачи сохраняют контрольную точку и снимают аренду в finally
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def start_broadcast(bot: Bot, job_id: int) -> None:
+    """Запускает рассылку в фоне (если она ещё не идёт в этом экземпляре)."""
+    global _hook_registered
+    if job_id in _running:
+        return
+    if not _hook_registered:
+        register_shutdown_hook(_stop_all)
+        _hook_registered = True
+    task = asyncio.create_task(_run(bot, job_id), name=f"broadcast:{job_id}")
+    _running[job_id] = task
+    task.add_done_callback(lambda _: _running.pop(job_id, None))
+
+
+async def resume_broadcasts(bot: Bot) -> None:
+    """Продолжает незавершённые рассылки с последней контрольной точки."""
+    for job_id in await running_job_ids():
+        start_broadcast(bot, job_id)
+
+
+def active_broadcasts() -> List[int]:
+    return sorted(_running)
@@ -0,0 +1,93 @@
+import asyncio
+from array import array
+from typing import Dict, Iterable, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+
+from config import settings
+from database.case_media_repo import CaseMediaRef, load_case_media, save_case_media
+from database.connection import register_shutdown_hook
+from database.write_behind import WriteBehindBuffer
+from utils.cache import MISSING, TTLCache
+
+__all__ = [
+    "CaseMediaStore",
+    "case_media_store",
+    "delete_messages",
+]
+
+
+class CaseMediaStore:
+    """Какие сообщения с медиа кейса показаны пользователю.
+
+    Хранит только пары ``(chat_id, message_ids)``, где message_ids — ``array('q')``.
+    Записи вытесняются по LRU и устаревают через ``ttl`` (Telegram позволяет
+    боту удалять сообщения примерно 48 часов). При ``persist=True`` изменения
+    пачками пишутся в таблицу ``case_media``, и удаление старых медиа
+    работает после рестарта.
+    """
+
+    __slots__ = ("ttl", "_cache", "_buffer")
+
+    def __init__(self, maxsize: int, ttl: float, *, persist: bool) -> None:
+        self.ttl = ttl
+        self._cache: TTLCache[int, Optional[Tuple[int, array]]] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._buffer: Optional[WriteBehindBuffer[int, Optional[CaseMediaRef]]] = None
+        if persist:
+            self._buffer = WriteBehindBuffer(
+                lambda batch: save_case_media(batch, ttl),
+                interval=settings.case_media_flush_interval,
+                max_batch=settings.case_media_flush_batch_size,
+                name="case_media",
+            )
+            register_shutdown_hook(self._buffer.close)
+
+    def put(self, user_id: int, chat_id: int, message_ids: Iterable[int]) -> None:
+        ids = array("q", message_ids)
+        self._cache.set(user_id, (chat_id, ids))
+        if self._buffer is not None:
+            self._buffer.put(user_id, (chat_id, ids) if ids else None)
+
+    async def pop(self, user_id: int) -> Optional[Tuple[int, array]]:
+        """Забирает запись пользователя (из памяти или, после рестарта, из БД)."""
+        ref = self._cache.get(user_id)
+        if ref is MISSING and self._buffer is not None:
+            pending = self._buffer.get(user_id)
+            if pending is not MISSING:
+                ref = pending
+            else:
+                loaded = await load_case_media(user_id, self.ttl)
+                ref = (loaded[0], array("q", loaded[1])) if loaded else None
+        # запоминаем «пусто», чтобы повторное нажатие не ходило в БД
+        self._cache.set(user_id, None)
+        if ref is MISSING or ref is None:
+            return None
+        if self._buffer is not None:
+            self._buffer.put(user_id, None)
+        return ref
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+
+async def delete_messages(bot: Bot, chat_id: int, message_ids: Iterable[int], *, concurrency: int) -> None:
+    """Удаляет сообщения параллельно, не больше ``concurrency`` запросов одновременно."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def delete(message_id: int) -> None:
+        async with semaphore:
+            try:
+                await bot.delete_message(chat_id, message_id)
+            except TelegramAPIError:
+                # сообщение уже удалено пользователем или слишком старое
+                pass
+
+    await asyncio.gather(*(delete(message_id) for message_id in message_ids))
+
+
+case_media_store = CaseMediaStore(
+    maxsize=settings.case_media_cache_size,
+    ttl=settings.case_media_ttl,
+    persist=settings.case_media_persist,
+)
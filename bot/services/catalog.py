@@ -0,0 +1,261 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, KeysView, List, Mapping, Optional
+
+import asyncpg
+
+from database.catalog_repo import fetch_catalog, listen_catalog_changes
+from database.connection import register_shutdown_hook
+from .cost_calculator_service import (
+    COST_TEMPLATES,
+    MODULES,
+    SUPPORT_PACKAGES,
+    MODULE_EMOJIS,
+    TEMPLATE_EMOJIS,
+    SUPPORT_EMOJIS,
+)
+from .pricing_engine import MAX_MODULES, PricingEngine
+
+__all__ = [
+    "Catalog",
+    "build_catalog",
+    "current_catalog",
+    "get_catalog",
+    "kept_versions",
+    "on_catalog_change",
+    "load_catalog",
+    "start_catalog_listener",
+]
+
+# Сколько предыдущих версий держать для мастеров, начатых до изменения прайса
+_KEEP_SNAPSHOTS = 16
+# Проверка соединения LISTEN (сек.): обрыв без закрытия сокета иначе не заметить
+_LISTEN_CHECK_INTERVAL = 30.0
+_LISTEN_RECONNECT_DELAY = 5.0
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """Неизменяемый снимок справочника калькулятора.
+
+    Структура словарей совпадает с COST_TEMPLATES / MODULES / SUPPORT_PACKAGES,
+    но все отображения только для чтения. Снимок заменяется целиком.
+    """
+
+    version: int
+    templates: Mapping[str, Mapping[str, Any]]
+    modules: Mapping[str, Mapping[str, Any]]
+    support: Mapping[str, Mapping[str, Any]]
+    module_emojis: Mapping[str, str]
+    template_emojis: Mapping[str, str]
+    support_emojis: Mapping[str, str]
+    pricing: PricingEngine
+
+
+def _freeze(items: Mapping[str, Mapping[str, Any]]) -> Mapping[str, Mapping[str, Any]]:
+    frozen = {}
+    for key, item in items.items():
+        item = dict(item)
+        if "included" in item:
+            item["included"] = tuple(item["included"])
+        frozen[key] = MappingProxyType(item)
+    return MappingProxyType(frozen)
+
+
+def build_catalog(
+    version: int,
+    templates: Mapping[str, Mapping[str, Any]],
+    modules: Mapping[str, Mapping[str, Any]],
+    support: Mapping[str, Mapping[str, Any]],
+    module_emojis: Mapping[str, str],
+    template_emojis: Mapping[str, str],
+    support_emojis: Mapping[str, str],
+) -> Catalog:
+    return Catalog(
+        version=version,
+        templates=_freeze(templates),
+        modules=_freeze(modules),
+        support=_freeze(support),
+        module_emojis=MappingProxyType(dict(module_emojis)),
+        template_emojis=MappingProxyType(dict(template_emojis)),
+        support_emojis=MappingProxyType(dict(support_emojis)),
+        pricing=PricingEngine(templates, modules, support),
+    )
+
+
+def _catalog_from_rows(raw: Dict[str, Any]) -> Catalog:
+    templates = {
+        row["key"]: {
+            "name": row["name"],
+            "base_price": row["base_price"],
+            "description": row["description"],
+            "included": [],
+        }
+        for row in raw["templates"]
+    }
+    for template_key, module_key in raw["included"]:
+        templates[template_key]["included"].append(module_key)
+    modules = {
+        row["key"]: {"name": row["name"], "price": row["price"], "desc": row["description"]}
+        for row in raw["modules"]
+    }
+    support = {row["key"]: {"name": row["name"], "price": row["price"]} for row in raw["support"]}
+    return build_catalog(
+        raw["version"],
+        templates,
+        modules,
+        support,
+        module_emojis={row["key"]: row["emoji"] for row in raw["modules"] if row["emoji"]},
+        template_emojis={row["key"]: row["emoji"] for row in raw["templates"] if row["emoji"]},
+        support_emojis={row["key"]: row["emoji"] for row in raw["support"] if row["emoji"]},
+    )
+
+
+# Встроенный справочник (версия 0) — до загрузки из БД
+_current: Catalog = build_catalog(
+    0, COST_TEMPLATES, MODULES, SUPPORT_PACKAGES, MODULE_EMOJIS, TEMPLATE_EMOJIS, SUPPORT_EMOJIS
+)
+_snapshots: "OrderedDict[int, Catalog]" = OrderedDict([(0, _current)])
+_listeners: List[Callable[[Catalog], None]] = []
+_reload_task: Optional[asyncio.Task] = None
+_reload_requested = False
+_listener_task: Optional[asyncio.Task] = None
+
+
+def current_catalog() -> Catalog:
+    """Актуальный снимок справочника. Чтение без блокировок."""
+    return _current
+
+
+def get_catalog(version: Optional[int]) -> Optional[Catalog]:
+    """Снимок нужной версии (для уже начатого мастера); без версии — актуальный.
+
+    None — снимок вытеснен или потерян при рестарте: ключи шаблонов и модулей
+    мастера в актуальном справочнике могут уже не существовать.
+    """
+    if version is None:
+        return _current
+    return _snapshots.get(version)
+
+
+def kept_versions() -> KeysView[int]:
+    """Версии справочника, снимки которых ещё хранятся."""
+    return _snapshots.keys()
+
+
+def on_catalog_change(callback: Callable[[Catalog], None]) -> None:
+    """Подписка на замену справочника (например, чтобы перестроить кэши)."""
+    _listeners.append(callback)
+
+
+def _install(snapshot: Catalog) -> None:
+    global _current
+    _snapshots[snapshot.version] = snapshot
+    _snapshots.move_to_end(snapshot.version)
+    while len(_snapshots) > _KEEP_SNAPSHOTS:
+        _snapshots.popitem(last=False)
+    # атомарная замена ссылки: читатели видят либо старый, либо новый снимок
+    _current = snapshot
+    for callback in _listeners:
+        try:
+            callback(snapshot)
+        except Exception:
+            logging.exception("Ошибка в обработчике смены справочника")
+
+
+async def load_catalog() -> Catalog:
+    """Загружает справочник из БД и делает его актуальным.
+
+    Справочник с числом модулей больше ``MAX_MODULES`` отклоняется: остаётся текущий.
+    """
+    raw = await fetch_catalog()
+    if len(raw["modules"]) > MAX_MODULES:
+        logging.error(
+            "Справочник версии %s отклонён: модулей %d, допустимо не больше %d",
+            raw["version"],
+            len(raw["modules"]),
+            MAX_MODULES,
+        )
+        return _current
+    snapshot = _catalog_from_rows(raw)
+    if snapshot.version != _current.version:
+        _install(snapshot)
+        logging.info("Справочник калькулятора загружен, версия %s", snapshot.version)
+    return _current
+
+
+async def _reload() -> None:
+    global _reload_requested
+    while True:
+        _reload_requested = False
+        try:
+            await load_catalog()
+        except Exception:
+            logging.exception("Не удалось перечитать справочник")
+        # уведомления, пришедшие во время загрузки, схлопываются в одну перезагрузку
+        if not _reload_requested:
+            return
+
+
+def _on_notify(payload: str) -> None:
+    global _reload_task, _reload_requested
+    if payload.isdigit() and int(payload) <= _current.version:
+        return
+    if _reload_task is not None and not _reload_task.done():
+        _reload_requested = True
+        return
+    _reload_task = asyncio.create_task(_reload())
+
+
+async def _wait_lost(conn: asyncpg.Connection) -> None:
+    lost = asyncio.Event()
+    conn.add_termination_listener(lambda _conn: lost.set())
+    while not lost.is_set():
+        try:
+            await asyncio.wait_for(lost.wait(), timeout=_LISTEN_CHECK_INTERVAL)
+        except asyncio.TimeoutError:
+            try:
+                await conn.fetchval("SELECT 1", timeout=_LISTEN_RECONNECT_DELAY)
+            except Exception:
+                conn.terminate()
+                return
+
+
+async def _keep_listening(conn: asyncpg.Connection) -> None:
+    try:
+        while True:
+            await _wait_lost(conn)
+            logging.warning("Соединение LISTEN справочника потеряно, переподключаемся")
+            while True:
+                await asyncio.sleep(_LISTEN_RECONNECT_DELAY)
+                try:
+                    conn = await listen_catalog_changes(_on_notify)
+                    break
+                except Exception:
+                    logging.exception("Не удалось переподключить LISTEN справочника")
+            # уведомления, пришедшие без соединения, потеряны — перечитываем справочник
+            _on_notify("")
+    finally:
+        if not conn.is_closed():
+            await conn.close()
+
+
+async def _stop_listener() -> None:
+    if _listener_task is not None:
+        _listener_task.cancel()
+        await asyncio.gather(_listener_task, return_exceptions=True)
+
+
+async def start_catalog_listener() -> None:
+    """Подписывается на NOTIFY и перечитывает справочник при его изменении.
+
+    При обрыве соединения (рестарт БД, переключение реплики) подписка
+    восстанавливается, после чего справочник перечитывается.
+    """
+    global _listener_task
+    conn = await listen_catalog_changes(_on_notify)
+    _listener_task = asyncio.create_task(_keep_listening(conn), name="catalog:listen")
+    register_shutdown_hook(_stop_listener)
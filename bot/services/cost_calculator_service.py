@@ -1,5 +1,8 @@
 from typing import List
 
+# Встроенный справочник. Используется как начальные данные миграции каталога
+# и до загрузки актуального справочника из БД (см. services/catalog.py).
+
 COST_TEMPLATES = {
     "infobot": {
         "name": "Информационный-бот",
@@ -74,10 +77,43 @@ SUPPORT_PACKAGES = {
 }
 
 
+# Эмодзи для модулей
+MODULE_EMOJIS = {
+    "calendar": "🗓️",
+    "payments": "💳",
+    "portfolio": "🖼️",
+    "mailing": "📧",
+    "loyalty": "🎁",
+    "crm": "📋",
+    "documents": "📄",
+    "webapp": "🌐",
+    "webapp_shop": "🛒",
+    "quest": "🎲",
+    "admin_panel": "🛠️",
+    "booking": "📆",
+}
+
+# Эмодзи для шаблонов
+TEMPLATE_EMOJIS = {
+    "infobot": "🤖",
+    "tickets": "🎟️",
+    "schedule": "📆",
+    "courses": "📚",
+    "photo": "📷",
+    "coursebot": "🎓",
+    "shop": "🛒",
+    "builder": "🧩",
+}
+
+# Эмодзи для пакетов поддержки
+SUPPORT_EMOJIS = {
+    "no_support": "🚫",
+    "support_6": "🔄",
+    "support_12": "🤝",
+}
+
+
 def calculate_total(*, template_key: str, module_keys: List[str], support_key: str) -> int:
-    """Вычисляет итоговую стоимость проекта в рублях (фиксированные цены)."""
-    template = COST_TEMPLATES[template_key]
-    base = template["base_price"]
-    modules_total = sum(MODULES[key]["price"] for key in module_keys)
-    support_cost = SUPPORT_PACKAGES[support_key]["price"]
-    return base + modules_total + support_cost 
\ No newline at end of file
+    """Вычисляет итоговую стоимость проекта в рублях по актуальному справочнику."""
+    from services.catalog import current_catalog  # local import to avoid cycles
+    return current_catalog().pricing.quote(template_key, module_keys, support_key).total 
\ No newline at end of file
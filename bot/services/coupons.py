@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+from typing import Dict, NamedTuple, Optional
+
+from config import settings
+from database.connection import register_shutdown_hook
+from database.coupon_repo import fetch_coupons, redeem_coupon
+from utils.metrics import REGISTRY
+from .pricing_engine import Discount
+
+__all__ = [
+    "Coupon",
+    "REDEEMED",
+    "ALREADY_REDEEMED",
+    "UNAVAILABLE",
+    "coupon_discount",
+    "describe_discount",
+    "redeem",
+    "load_coupons",
+    "start_coupon_refresh",
+]
+
+# Результаты погашения
+REDEEMED = "redeemed"
+ALREADY_REDEEMED = "already_redeemed"
+UNAVAILABLE = "unavailable"
+
+_redemptions = REGISTRY.counter("bot_coupon_redemptions_total", "Попытки погасить купон", ("result",))
+
+
+class Coupon(NamedTuple):
+    code: str
+    discount: Discount
+    # time.time(), после которого купон не действует; None — бессрочный
+    expires_at: Optional[float] = None
+
+    def valid(self, now: float) -> bool:
+        return self.expires_at is None or now < self.expires_at
+
+
+# Встроенные купоны (совпадают с начальными данными миграции) — до загрузки из БД
+_coupons: Dict[str, Coupon] = {"BOT5": Coupon("BOT5", Discount("percent", 5))}
+_refresh_task: Optional[asyncio.Task] = None
+
+
+def coupon_discount(code: Optional[str]) -> Optional[Discount]:
+    """Скидка по коду из кэша определений, без обращения к БД; None — купон не действует."""
+    if not code:
+        return None
+    coupon = _coupons.get(code)
+    if coupon is None or not coupon.valid(time.time()):
+        return None
+    return coupon.discount
+
+
+def describe_discount(discount: Discount) -> str:
+    """Размер скидки для текста: «5%» или «1 000 ₽»."""
+    if discount.kind == "percent":
+        return f"{discount.value}%"
+    return f"{discount.value:,} ₽".replace(",", " ")
+
+
+async def redeem(user_id: int, code: str) -> str:
+    """Погашает купон (атомарно в БД): REDEEMED, ALREADY_REDEEMED или UNAVAILABLE."""
+    result = await redeem_coupon(code, user_id)
+    outcome = REDEEMED if result else ALREADY_REDEEMED if result is False else UNAVAILABLE
+    _redemptions.labels(outcome).inc()
+    return outcome
+
+
+async def load_coupons() -> int:
+    """Перечитывает действующие купоны из БД; возвращает их число."""
+    global _coupons
+    _coupons = {
+        row["code"]: Coupon(
+            row["code"],
+            Discount(row["discount_type"], row["discount_value"]),
+            row["expires_at"].timestamp() if row["expires_at"] is not None else None,
+        )
+        for row in await fetch_coupons()
+    }
+    return len(_coupons)
+
+
+async def _refresh_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.coupon_refresh_interval)
+        try:
+            await load_coupons()
+        except Exception:
+            logging.exception("Не удалось перечитать купоны")
+
+
+async def _stop() -> None:
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+
+
+async def start_coupon_refresh() -> None:
+    """Загружает купоны и периодически их перечитывает (``coupon_refresh_interval``)."""
+    global _refresh_task
+    logging.info("Купонов загружено: %d", await load_coupons())
+    _refresh_task = asyncio.create_task(_refresh_loop(), name="coupons:refresh")
+    register_shutdown_hook(_stop)
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from config import settings
+from database.connection import register_shutdown_hook
+from database.events_repo import (
+    FunnelStep,
+    ensure_event_partitions,
+    load_event_keys,
+    register_event_keys,
+    refresh_funnel_rollups,
+    save_events,
+    save_funnel_steps,
+)
+
+__all__ = [
+    "FUNNELS",
+    "OTHER_KEY",
+    "record_event",
+    "funnel_steps_of",
+    "start_interaction_events",
+    "flush_events",
+    "events_stats",
+]
+
+# Ключ для всего, что не помещается в словарь (подделанные callback_data и т.п.)
+OTHER_KEY = "other"
+_MAX_KEY_LENGTH = 64
+
+# Воронки: шаг -> (точные ключи, префиксы ключей). Шаги идут по порядку.
+FUNNELS: Dict[str, Tuple[Tuple[str, Tuple[str, ...], Tuple[str, ...]], ...]] = {
+    # мастер CostCalculatorStates
+    "calculator": (
+        ("start", ("calc_cost",), ()),
+        ("category", ("services", "sales", "builder", "all"), ()),
+        # tpl:<key> открывает карточку шаблона; tpl_<key>, tpl_ok_<key> — старые сообщения
+        ("template", (), ("tpl:", "tpl_")),
+        ("modules", ("done_modules",), ()),
+        ("summary", ("no_support",), ("support_",)),
+        ("contact", ("contact_me",), ()),
+    ),
+    # викторина NeedBotGameStates
+    "need_bot": (
+        ("start", ("need_bot",), ()),
+        ("answer", (), ("nb_opt:", "nb_opt_")),
+        ("next", ("nb_next",), ()),
+        ("coupon", ("need_bot_coupon",), ()),
+    ),
+}
+
+# (time.time(), user_id, key). Кольцевой буфер: при переполнении теряются самые старые
+_ring: Deque[Tuple[float, int, str]] = deque(maxlen=settings.events_buffer_size)
+_key_ids: Dict[str, int] = {}
+_dropped = 0
+_written = 0
+_flush_lock = asyncio.Lock()
+_wakeup: Optional[asyncio.Event] = None
+_tasks: List[asyncio.Task] = []
+
+
+def record_event(user_id: int, key: str) -> None:
+    """Кладёт событие в буфер. O(1), без обращения к БД."""
+    global _dropped
+    if len(_ring) == _ring.maxlen:
+        _dropped += 1
+    _ring.append((time.time(), user_id, key))
+    if _wakeup is not None and len(_ring) >= settings.events_flush_batch_size:
+        _wakeup.set()
+
+
+def funnel_steps_of(key: str) -> List[Tuple[str, int, str]]:
+    """Шаги воронок, к которым относится ключ: [(funnel, step, name)]."""
+    steps = []
+    for funnel, funnel_steps in FUNNELS.items():
+        for index, (name, exact, prefixes) in enumerate(funnel_steps):
+            if key in exact or key.startswith(prefixes):
+                steps.append((funnel, index, name))
+                break
+    return steps
+
+
+def _steps_for(key_ids: Dict[str, int]) -> Iterable[FunnelStep]:
+    for key, key_id in key_ids.items():
+        for funnel, step, name in funnel_steps_of(key):
+            yield funnel, key_id, step, name
+
+
+async def _resolve_keys(keys: Iterable[str]) -> None:
+    new_keys = []
+    for key in keys:
+        if key in _key_ids:
+            continue
+        if len(key) > _MAX_KEY_LENGTH or len(_key_ids) + len(new_keys) >= settings.events_max_keys:
+            continue
+        new_keys.append(key)
+    new_keys.append(OTHER_KEY)
+    new_keys = [key for key in dict.fromkeys(new_keys) if key not in _key_ids]
+    if not new_keys:
+        return
+    registered = await register_event_keys(new_keys)
+    _key_ids.update(registered)
+    await save_funnel_steps(_steps_for(registered))
+
+
+async def flush_events() -> None:
+    """Записывает накопленные события пачками (COPY)."""
+    global _written
+    async with _flush_lock:
+        while _ring:
+            batch = []
+            for _ in range(min(len(_ring), settings.events_flush_batch_size)):
+                batch.append(_ring.popleft())
+            try:
+                await _resolve_keys({key for _, _, key in batch})
+                other = _key_ids[OTHER_KEY]
+                records = [
+                    (datetime.fromtimestamp(ts, timezone.utc), user_id, _key_ids.get(key, other))
+                    for ts, user_id, key in batch
+                ]
+                await save_events(records)
+            except Exception:
+                logging.exception("Не удалось записать %d событий", len(batch))
+                # возвращаем пачку в начало буфера, если там есть место
+                room = _ring.maxlen - len(_ring)
+                _ring.extendleft(reversed(batch[len(batch) - room:] if room < len(batch) else batch))
+                return
+            _written += len(records)
+
+
+async def _flush_loop() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.events_flush_interval)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        await flush_events()
+
+
+async def _rollup_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.funnel_refresh_interval)
+        try:
+            await ensure_event_partitions()
+            await refresh_funnel_rollups(settings.funnel_refresh_lag)
+        except Exception:
+            logging.exception("Не удалось обновить агрегаты воронок")
+
+
+async def _stop() -> None:
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    await flush_events()
+
+
+async def start_interaction_events() -> None:
+    """Загружает словарь ключей, пересобирает шаги воронок и запускает фоновую запись."""
+    global _wakeup
+    await ensure_event_partitions()
+    _key_ids.update(await load_event_keys())
+    await save_funnel_steps(_steps_for(_key_ids), replace=True)
+    _wakeup = asyncio.Event()
+    _tasks.append(asyncio.create_task(_flush_loop(), name="interaction-events:flush"))
+    _tasks.append(asyncio.create_task(_rollup_loop(), name="interaction-events:rollup"))
+    register_shutdown_hook(_stop)
+
+
+def events_stats() -> Dict[str, int]:
+    """Счётчики журнала событий: buffered, written, dropped, keys."""
+    return {"buffered": len(_ring), "written": _written, "dropped": _dropped, "keys": len(_key_ids)}
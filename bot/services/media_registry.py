@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from aiogram import Bot, types
+from aiogram.types import FSInputFile, InputMediaPhoto, InputMediaVideo
+
+from database.media_repo import get_file_ids, save_file_id
+from middlewares.outbound_scheduler import bulk_priority
+
+__all__ = [
+    "MEDIA_DIR",
+    "build_album",
+    "remember_album",
+    "preload",
+    "warm_up",
+]
+
+MEDIA_DIR = "media"
+
+PHOTO_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+VIDEO_EXTENSIONS = {".mp4", ".mov"}
+
+InputMedia = Union[InputMediaPhoto, InputMediaVideo]
+
+# path -> (mtime_ns, size, sha256): хэш пересчитывается только при изменении файла
+_hash_cache: Dict[str, Tuple[int, int, str]] = {}
+# (path, sha256) -> file_id, зеркало таблицы media_files
+_file_ids: Dict[Tuple[str, str], str] = {}
+_loaded = False
+_load_lock = asyncio.Lock()
+
+
+def _is_video(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def _content_hash(path: str) -> str:
+    """Хэш содержимого файла. Изменение mtime/размера автоматически сбрасывает кэш."""
+    stat = os.stat(path)
+    cached = _hash_cache.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    content_hash = await asyncio.to_thread(_sha256, path)
+    _hash_cache[path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+    return content_hash
+
+
+async def _ensure_loaded() -> None:
+    global _loaded
+    if _loaded:
+        return
+    async with _load_lock:
+        if not _loaded:
+            _file_ids.update(await get_file_ids())
+            _loaded = True
+
+
+async def _remember(path: str, content_hash: str, file_id: str) -> None:
+    if _file_ids.get((path, content_hash)) == file_id:
+        return
+    for key in [k for k in _file_ids if k[0] == path]:
+        del _file_ids[key]
+    _file_ids[(path, content_hash)] = file_id
+    await save_file_id(path, content_hash, file_id)
+
+
+def _extract_file_id(message: types.Message) -> Optional[str]:
+    if message.photo:
+        return message.photo[-1].file_id
+    if message.video:
+        return message.video.file_id
+    return None
+
+
+async def build_album(paths: Sequence[str]) -> List[InputMedia]:
+    """Собирает альбом: для уже загруженных файлов подставляет file_id вместо байтов."""
+    await _ensure_loaded()
+    album: List[InputMedia] = []
+    for path in paths:
+        file_id = _file_ids.get((path, await _content_hash(path)))
+        media = file_id or FSInputFile(path)
+        album.append(InputMediaVideo(media=media) if _is_video(path) else InputMediaPhoto(media=media))
+    return album
+
+
+async def remember_album(paths: Sequence[str], messages: Sequence[types.Message]) -> None:
+    """Запоминает file_id, которые Telegram вернул после отправки альбома.
+
+    Альбом к этому моменту уже доставлен, поэтому ошибка записи (БД, чтение
+    файла для хэша) только логируется: следующий показ загрузит файл заново.
+    """
+    for path, message in zip(paths, messages):
+        file_id = _extract_file_id(message)
+        if not file_id:
+            continue
+        try:
+            await _remember(path, await _content_hash(path), file_id)
+        except Exception:
+            logging.exception("Не удалось сохранить file_id для %s", path)
+
+
+def _media_paths() -> List[str]:
+    if not os.path.isdir(MEDIA_DIR):
+        return []
+    return [
+        f"{MEDIA_DIR}/{name}"
+        for name in sorted(os.listdir(MEDIA_DIR))
+        if os.path.splitext(name)[1].lower() in PHOTO_EXTENSIONS | VIDEO_EXTENSIONS
+    ]
+
+
+async def preload() -> int:
+    """Загружает file_id из БД и считает хэши файлов media/ до приёма апдейтов.
+
+    Первый показ кейса после старта не ждёт ни БД, ни чтения видео с диска.
+    Возвращает число файлов, для которых уже известен file_id.
+    """
+    await _ensure_loaded()
+    paths = _media_paths()
+    hashes = await asyncio.gather(*(_content_hash(path) for path in paths))
+    return sum((path, content_hash) in _file_ids for path, content_hash in zip(paths, hashes))
+
+
+async def warm_up(bot: Bot, chat_id: int) -> None:
+    """Предзагружает в Telegram файлы из media/, для которых ещё нет file_id."""
+    if not os.path.isdir(MEDIA_DIR):
+        return
+    await _ensure_loaded()
+    # предзагрузка не должна тормозить ответы пользователям
+    with bulk_priority():
+        await _upload_missing(bot, chat_id)
+
+
+async def _upload_missing(bot: Bot, chat_id: int) -> None:
+    for path in _media_paths():
+        content_hash = await _content_hash(path)
+        if (path, content_hash) in _file_ids:
+            continue
+        try:
+            if _is_video(path):
+                message = await bot.send_video(chat_id, FSInputFile(path), disable_notification=True)
+            else:
+                message = await bot.send_photo(chat_id, FSInputFile(path), disable_notification=True)
+        except Exception:
+            logging.exception("Не удалось предзагрузить %s", path)
+            continue
+        file_id = _extract_file_id(message)
+        if file_id:
+            await _remember(path, content_hash, file_id)
+            logging.info("Медиа %s загружено, file_id сохранён", path)
+        try:
+            await message.delete()
+        except Exception:
+            pass
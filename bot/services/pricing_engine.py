@@ -0,0 +1,164 @@
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+__all__ = [
+    "MAX_MODULES",
+    "Discount",
+    "Quote",
+    "PricingEngine",
+    "builder_price",
+]
+
+# Больше модулей справочник не принимает (см. services/catalog.load_catalog)
+MAX_MODULES = 64
+# Суммы всех подмножеств (2^N на шаблон) строятся только для небольших наборов модулей
+MAX_PRECOMPUTED_MODULES = 16
+
+ModuleSelection = Union[int, Iterable[str]]
+
+
+class Discount(NamedTuple):
+    """Скидка купона: ``percent`` — процент от суммы, ``fixed`` — сумма в рублях."""
+
+    kind: str
+    value: int
+
+    def amount(self, total: int) -> int:
+        if self.kind == "percent":
+            return total * self.value // 100
+        return min(self.value, total)
+
+
+class Quote(NamedTuple):
+    """Расчёт стоимости в рублях (целые числа); ``total`` — к оплате, уже со скидкой."""
+
+    base: int
+    modules: int
+    support: int
+    total: int
+    discount: int = 0
+
+
+def builder_price(price: int) -> int:
+    """Цена модуля в конструкторе: +25% и округление вверх до 1000."""
+    return (price * 5 // 4 + 999) // 1000 * 1000
+
+
+class PricingEngine:
+    """Прайс, скомпилированный в целочисленные таблицы.
+
+    Набор модулей представляется битовой маской (бит i — ``module_keys[i]``).
+    Для каждого шаблона заранее считаются цены модулей с учётом наценки
+    и суммы для всех подмножеств модулей, поэтому ``quote`` — это несколько
+    обращений по индексу. Если модулей больше ``MAX_PRECOMPUTED_MODULES``,
+    таблица сумм не строится и цены выбранных модулей складываются по маске.
+    """
+
+    __slots__ = (
+        "module_keys",
+        "template_keys",
+        "support_keys",
+        "_module_bits",
+        "_template_index",
+        "_support_prices",
+        "_base_prices",
+        "_module_prices",
+        "_subset_sums",
+    )
+
+    def __init__(
+        self,
+        templates: Mapping[str, Mapping[str, Any]],
+        modules: Mapping[str, Mapping[str, Any]],
+        support: Mapping[str, Mapping[str, Any]],
+        *,
+        markup_templates: Iterable[str] = ("builder",),
+    ) -> None:
+        markup = set(markup_templates)
+        self.module_keys: Tuple[str, ...] = tuple(modules)
+        self.template_keys: Tuple[str, ...] = tuple(templates)
+        self.support_keys: Tuple[str, ...] = tuple(support)
+        self._module_bits: Dict[str, int] = {key: 1 << i for i, key in enumerate(self.module_keys)}
+        self._template_index: Dict[str, int] = {key: i for i, key in enumerate(self.template_keys)}
+        self._support_prices: Dict[str, int] = {key: int(pkg["price"]) for key, pkg in support.items()}
+        self._base_prices: List[int] = [int(templates[key]["base_price"]) for key in self.template_keys]
+
+        raw_prices = [int(modules[key]["price"]) for key in self.module_keys]
+        self._module_prices: List[Tuple[int, ...]] = []
+        if len(raw_prices) > MAX_MODULES:
+            raise ValueError(f"Слишком много модулей: {len(raw_prices)} > {MAX_MODULES}")
+        precompute = len(raw_prices) <= MAX_PRECOMPUTED_MODULES
+        self._subset_sums: List[Optional[List[int]]] = []
+        for key in self.template_keys:
+            prices = tuple(builder_price(p) if key in markup else p for p in raw_prices)
+            self._module_prices.append(prices)
+            self._subset_sums.append(self._build_subset_sums(prices) if precompute else None)
+
+    @staticmethod
+    def _build_subset_sums(prices: Sequence[int]) -> List[int]:
+        # sums[mask] = sums[mask без младшего бита] + цена младшего бита
+        sums = [0] * (1 << len(prices))
+        for mask in range(1, len(sums)):
+            low = mask & -mask
+            sums[mask] = sums[mask ^ low] + prices[low.bit_length() - 1]
+        return sums
+
+    def _sum_modules(self, t: int, mask: int) -> int:
+        prices = self._module_prices[t]
+        total = 0
+        while mask:
+            low = mask & -mask
+            total += prices[low.bit_length() - 1]
+            mask ^= low
+        return total
+
+    def mask_of(self, module_keys: Iterable[str]) -> int:
+        bits = self._module_bits
+        mask = 0
+        for key in module_keys:
+            mask |= bits[key]
+        return mask
+
+    def keys_of(self, mask: int) -> List[str]:
+        return [key for i, key in enumerate(self.module_keys) if mask & (1 << i)]
+
+    def module_price(self, template_key: str, module_key: str) -> int:
+        """Цена модуля в рамках шаблона (с наценкой конструктора, если она есть)."""
+        index = self._module_bits[module_key].bit_length() - 1
+        return self._module_prices[self._template_index[template_key]][index]
+
+    def quote(
+        self,
+        template_key: str,
+        modules: ModuleSelection,
+        support_key: str,
+        discount: Optional[Discount] = None,
+    ) -> Quote:
+        mask = modules if isinstance(modules, int) else self.mask_of(modules)
+        t = self._template_index[template_key]
+        base = self._base_prices[t]
+        sums = self._subset_sums[t]
+        modules_total = sums[mask] if sums is not None else self._sum_modules(t, mask)
+        support_cost = self._support_prices[support_key]
+        total = base + modules_total + support_cost
+        off = discount.amount(total) if discount is not None else 0
+        return Quote(base, modules_total, support_cost, total - off, off)
+
+    def quote_many(self, requests: Iterable[Tuple[str, ModuleSelection, str]]) -> List[int]:
+        """Итоговые суммы для пачки запросов ``(template_key, modules, support_key)``.
+
+        Предназначено для аналитики и выгрузок: без создания Quote на каждый расчёт.
+        """
+        index = self._template_index
+        bases = self._base_prices
+        sums = self._subset_sums
+        support = self._support_prices
+        mask_of = self.mask_of
+        sum_modules = self._sum_modules
+        totals = []
+        append = totals.append
+        for template_key, modules, support_key in requests:
+            t = index[template_key]
+            mask = modules if isinstance(modules, int) else mask_of(modules)
+            table = sums[t]
+            append(bases[t] + (table[mask] if table is not None else sum_modules(t, mask)) + support[support_key])
+        return totals
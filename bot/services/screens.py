@@ -0,0 +1,259 @@
+from collections import OrderedDict
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from keyboards.callback_data import QuizAnswerCallback
+from keyboards.cost_calculator_keyboard import (
+    CATEGORY_KEYS,
+    get_category_keyboard,
+    get_modules_keyboard,
+    get_support_keyboard,
+    get_template_keyboard,
+)
+from keyboards.examples_keyboard import get_examples_keyboard
+from services.catalog import Catalog
+
+__all__ = [
+    "Screen",
+    "CatalogScreens",
+    "QUESTIONS",
+    "GREETING",
+    "MENU_PROMPT",
+    "CATEGORY",
+    "CATALOG_UPDATED",
+    "EXAMPLES",
+    "quiz_question",
+    "quiz_answer",
+    "render_template_card",
+    "catalog_screens",
+    "rebuild_screens",
+]
+
+# ---------------------------------------------------------------------------
+# Готовые экраны: текст, клавиатура и parse_mode собираются один раз.
+# Экраны, зависящие только от справочника, строятся на каждую его версию
+# (при старте и при смене справочника); хендлеры их только находят и отправляют.
+# ---------------------------------------------------------------------------
+
+
+class Screen(NamedTuple):
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+    parse_mode: Optional[str] = None
+
+
+def _fmt_price(value: int) -> str:
+    return f"{value:,}".replace(",", " ")
+
+
+# Сколько версий справочника держать (как снимков в services/catalog.py)
+_KEEP_VERSIONS = 16
+
+QUESTIONS = [
+    {
+        "icon": "🤖",
+        "question": "Зачем мне нужен бот?",
+        "options": [
+            "Стать счастливым",
+            "Автоматизировать продажи",
+            "Предоставить поддержку 24/7",
+        ],
+        "bullets": [
+            "💬 отвечают на частые вопросы",
+            "🛒 собирают заявки и совершают продажи",
+        ],
+        "conclusion": "И это всё ПОКА люди ОТДЫХАЮТ",
+    },
+    {
+        "icon": "🎯",
+        "question": "Кому могут быть полезны боты?",
+        "options": [
+            "Экспертам",
+            "Онлайн-школам",
+            "Малому бизнесу",
+        ],
+        "bullets": [
+            "🏪 самозанятым и экспертам",
+            "🎓 онлайн-курсам",
+            "🏋️‍♂️ фитнес-клубам",
+            "🍽 ресторанам и другим оффлайн бизнесам",
+        ],
+        "conclusion": "Практически любому бизнесу с повторяющимися коммуникациями",
+    },
+    {
+        "icon": "⚙️",
+        "question": "Как упрощают задачи?",
+        "options": [
+            "Собирают лиды",
+            "Сегментируют аудиторию",
+            "Автоматизируют оплаты",
+        ],
+        "bullets": [
+            "📥 собирают лиды",
+            "📊 сегментируют аудиторию",
+            "💳 принимают оплаты без участия менеджера",
+            "😊 ДЕЛАЮТ ВАС СЧАСТЛИВЫМИ",
+        ],
+        "conclusion": "Все процессы становятся быстрее и прозрачнее.",
+    },
+]
+
+
+GREETING = Screen(
+    "👋  Вас приветствует AI-ассистент Ильи\u00A0Фомича!\n\n\n"
+    "Чем могу быть полезен?\n\n"
+    "💡 расскажу, зачем нужен Telegram-бот\n\n"
+    "💼 покажу работающие примеры\n\n"
+    "💰 помогу рассчитать стоимость решения\n\n"
+    "✉ свяжу вас напрямую с Ильей"
+)
+# клавиатура меню зависит от купона пользователя и подставляется хендлером
+MENU_PROMPT = "Выберите нужный пункт меню:"
+CATEGORY = Screen("Шаг 1/4. Выберите вашу сферу деятельности:", get_category_keyboard())
+# мастер, чей снимок справочника больше не хранится, начинается заново
+CATALOG_UPDATED = CATEGORY._replace(text="ℹ️ Цены и состав модулей обновились, расчёт начат заново.\n\n" + CATEGORY.text)
+EXAMPLES = Screen(
+    "Выберите интересующий вас демонстрационный проект: \n\n(дальше - больше !)",
+    get_examples_keyboard(),
+)
+
+_BACK_FROM_QUIZ = InlineKeyboardButton(text="↩️ Вернуться в меню", callback_data="back_menu_from_needbot")
+
+
+def _quiz_question_screen(idx: int) -> Screen:
+    buttons = [
+        [InlineKeyboardButton(text=opt, callback_data=QuizAnswerCallback(question=idx, option=option).pack())]
+        for option, opt in enumerate(QUESTIONS[idx]["options"])
+    ]
+    buttons.append([_BACK_FROM_QUIZ])
+    return Screen(
+        f"<b><i>{QUESTIONS[idx]['question']}</i></b>",
+        InlineKeyboardMarkup(inline_keyboard=buttons),
+        "HTML",
+    )
+
+
+def _quiz_answer_screen(idx: int) -> Screen:
+    q = QUESTIONS[idx]
+    # заголовок жирный курсив + пустая строка
+    lines = [f"{q['icon']} <b><i>{q['question']}</i></b>", ""]
+    # специальная вводная строка для первого вопроса
+    if idx == 0:
+        lines.append("Боты берут на себя рутину:")
+    # пункты преимущества курсивные
+    lines.extend(f"<i>{b}</i>" for b in q["bullets"])
+    lines.append("")
+    # заключительная строка как код
+    lines.append(f"<code>{q['conclusion']}</code>")
+
+    kb = []
+    if idx < len(QUESTIONS) - 1:
+        kb.append([InlineKeyboardButton(text="👉 Далее", callback_data="nb_next")])
+        kb.append([_BACK_FROM_QUIZ])
+    else:
+        kb.append([InlineKeyboardButton(text="🎁 Получить купон 5%", callback_data="need_bot_coupon")])
+    return Screen("\n".join(lines), InlineKeyboardMarkup(inline_keyboard=kb), "HTML")
+
+
+_QUIZ_QUESTIONS: Tuple[Screen, ...] = tuple(_quiz_question_screen(idx) for idx in range(len(QUESTIONS)))
+_QUIZ_ANSWERS: Tuple[Screen, ...] = tuple(_quiz_answer_screen(idx) for idx in range(len(QUESTIONS)))
+
+
+def quiz_question(idx: int) -> Screen:
+    return _QUIZ_QUESTIONS[idx]
+
+
+def quiz_answer(idx: int) -> Screen:
+    return _QUIZ_ANSWERS[idx]
+
+
+# ---------------------------------------------------------------------------
+# Экраны калькулятора, зависящие от справочника
+# ---------------------------------------------------------------------------
+
+
+class CatalogScreens(NamedTuple):
+    version: int
+    # category -> «Шаг 2/4» со списком шаблонов
+    template_lists: Mapping[str, Screen]
+    # template_key -> карточка шаблона с клавиатурой модулей без выбора
+    template_cards: Mapping[str, Screen]
+    # «Шаг 2/3» конструктора: все модули без выбора
+    builder_modules: Screen
+    # «Шаг 4/4»: пакеты поддержки
+    support: Screen
+
+
+def render_template_card(catalog: Catalog, template_key: str) -> str:
+    """Текст карточки шаблона: цена, описание и модули, входящие по умолчанию."""
+    tpl = catalog.templates[template_key]
+    included = tpl.get("included", [])
+    lines = [
+        f"🗂 {tpl['name']} — <b>{_fmt_price(tpl['base_price'])} ₽</b>",
+        tpl["description"],
+        "",
+        "<b>Уже входит:</b>",
+    ]
+    if included:
+        for m in included:
+            mod = catalog.modules[m]
+            lines.append(f"{catalog.module_emojis.get(m, '🧩')} {mod['name']} — {_fmt_price(mod['price'])} ₽")
+    else:
+        lines.append("—")
+
+    # Подсказка перед кнопками модулей
+    lines.extend(["", "<i>Выберите доп модули с помощью кнопок ниже:</i>"])
+    return "\n".join(lines)
+
+
+def _build_catalog_screens(catalog: Catalog) -> CatalogScreens:
+    return CatalogScreens(
+        version=catalog.version,
+        template_lists={
+            category: Screen("Шаг 2/4. Выберите шаблон:", get_template_keyboard(category, catalog=catalog), "HTML")
+            for category in CATEGORY_KEYS
+        },
+        template_cards={
+            key: Screen(
+                render_template_card(catalog, key),
+                get_modules_keyboard(selected=[], template_key=key, catalog=catalog),
+                "HTML",
+            )
+            for key in catalog.templates
+        },
+        builder_modules=Screen(
+            "Шаг 2/3. Выберите необходимые модули:\n"
+            "<i>*Итоговая стоимость может отличаться от предварительной!</i>",
+            get_modules_keyboard(selected=[], template_key="builder", catalog=catalog),
+            "HTML",
+        ),
+        support=Screen(
+            "Шаг 4/4. Выберите пакет технической поддержки:\n\n"
+            "🔄 Обновления контента по запросу\n"
+            "🛡️ Гарантия стабильной работы\n"
+            "💬 Консультация и ответы на вопросы",
+            get_support_keyboard(catalog=catalog),
+        ),
+    )
+
+
+_catalog_screens: "OrderedDict[int, CatalogScreens]" = OrderedDict()
+
+
+def rebuild_screens(catalog: Catalog) -> CatalogScreens:
+    """Строит экраны для версии справочника. Вызывается при старте и при смене справочника."""
+    screens = _build_catalog_screens(catalog)
+    _catalog_screens[catalog.version] = screens
+    _catalog_screens.move_to_end(catalog.version)
+    while len(_catalog_screens) > _KEEP_VERSIONS:
+        _catalog_screens.popitem(last=False)
+    return screens
+
+
+def catalog_screens(catalog: Catalog) -> CatalogScreens:
+    """Экраны для снимка справочника; для вытесненной версии строятся заново."""
+    screens = _catalog_screens.get(catalog.version)
+    if screens is None:
+        screens = rebuild_screens(catalog)
+    return screens
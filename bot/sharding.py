@@ -0,0 +1,302 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiohttp import ClientError, ClientSession, ClientTimeout, web
+
+from config import settings
+from metrics_server import start_metrics_server
+from utils.metrics import REGISTRY
+from webhook import create_forwarding_app, start_webhook, stop_accepting
+
+__all__ = [
+    "shard_of",
+    "Supervisor",
+    "consume_updates",
+]
+
+MAIN_PY = Path(__file__).resolve().parent / "main.py"
+# длинный опрос getUpdates (сек.)
+_POLL_TIMEOUT = 30
+# обновление в одну строку JSON; сообщения Telegram заметно меньше
+_MAX_LINE = 1 << 20
+# обработчик, проработавший дольше (сек.), при падении перезапускается без нарастающей паузы
+_STABLE_UPTIME = 60.0
+_MAX_RESTART_DELAY = 60.0
+
+_forwarded = REGISTRY.counter("bot_shard_updates_total", "Апдейты, переданные обработчикам", ("worker",))
+_restarts = REGISTRY.counter("bot_shard_restarts_total", "Перезапуски упавших обработчиков", ("worker",))
+
+
+def shard_of(update: Dict[str, Any], workers: int) -> int:
+    """Номер обработчика для апдейта.
+
+    Апдейты одного пользователя всегда попадают в один процесс: по ``from.id``,
+    если его нет — по чату, иначе по ``update_id``.
+    """
+    for value in update.values():
+        if isinstance(value, dict):
+            owner = value.get("from") or value.get("chat")
+            if owner:
+                return owner["id"] % workers
+    return update.get("update_id", 0) % workers
+
+
+class _Worker:
+    __slots__ = ("index", "queue", "process", "unsent", "forwarded")
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        # апдейты, ждущие записи в stdin; переживают перезапуск процесса
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=settings.worker_queue_size)
+        self.process: Optional[asyncio.subprocess.Process] = None
+        # строка, запись которой прервало падение обработчика: уйдёт первой после перезапуска
+        self.unsent: Optional[bytes] = None
+        self.forwarded = _forwarded.labels(str(index))
+
+
+class Supervisor:
+    """Приём апдейтов и раздача их ``settings.workers`` процессам-обработчикам.
+
+    Супервизор сам апдейты не обрабатывает и к БД не подключается: он получает
+    их (getUpdates или вебхук), выбирает обработчик по :func:`shard_of` и пишет
+    апдейт в его stdin одной строкой JSON. Каждый обработчик — обычный
+    ``bot/main.py`` с ``WORKER_INDEX``: свой пул БД, горячий слой FSM, лимиты
+    нажатий и кэши, которые благодаря шардированию по пользователю не пересекаются.
+
+    Порядок апдейтов пользователя сохраняется: у обработчика одна очередь и
+    один канал. Упавший обработчик перезапускается, его очередь ждёт нового
+    процесса; теряются только апдейты, уже прочитанные упавшим процессом.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher) -> None:
+        self.bot = bot
+        self.dp = dp
+        self.workers = [_Worker(index) for index in range(settings.workers)]
+        self._supervisors: List[asyncio.Task] = []
+        self._stop = asyncio.Event()
+        self._stopping = False
+        self._metrics_runner: Optional[web.AppRunner] = None
+        self._session: Optional[ClientSession] = None
+        REGISTRY.gauge(
+            "bot_shard_queue_size",
+            "Апдейты в очереди обработчика",
+            lambda: {(str(worker.index),): worker.queue.qsize() for worker in self.workers},
+            ("worker",),
+        )
+        REGISTRY.gauge(
+            "bot_shard_worker_up",
+            "Запущен ли процесс обработчика",
+            lambda: {
+                (str(worker.index),): int(worker.process is not None and worker.process.returncode is None)
+                for worker in self.workers
+            },
+            ("worker",),
+        )
+
+    # -- обработчики ------------------------------------------------------------
+
+    def _worker_env(self, index: int) -> Dict[str, str]:
+        env = dict(os.environ)
+        env["WORKER_INDEX"] = str(index)
+        # лимит Bot API общий на токен, поэтому делится между обработчиками;
+        # лимиты чатов не делятся — чат пользователя обслуживает один процесс
+        env["OUTBOUND_GLOBAL_RATE"] = str(settings.outbound_global_rate / len(self.workers))
+        env["OUTBOUND_GLOBAL_BURST"] = str(max(1.0, settings.outbound_global_burst / len(self.workers)))
+        if settings.metrics_port:
+            # метрики обработчика i — на следующем за супервизором порту + i
+            env["METRICS_PORT"] = str(settings.metrics_port + 1 + index)
+        return env
+
+    async def _feed(self, worker: _Worker) -> None:
+        stdin = worker.process.stdin
+        try:
+            while True:
+                if worker.unsent is None:
+                    worker.unsent = await worker.queue.get()
+                stdin.write(worker.unsent)
+                await stdin.drain()
+                worker.unsent = None
+                worker.queue.task_done()
+        except (BrokenPipeError, ConnectionResetError):
+            # процесс завершился; перезапуском занимается _supervise
+            pass
+
+    async def _supervise(self, worker: _Worker) -> None:
+        failures = 0
+        while not self._stopping:
+            started = time.monotonic()
+            worker.process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                str(MAIN_PY),
+                stdin=asyncio.subprocess.PIPE,
+                env=self._worker_env(worker.index),
+            )
+            logging.info("Обработчик %d запущен (pid %d)", worker.index, worker.process.pid)
+            feeder = asyncio.create_task(self._feed(worker), name=f"shard:feed:{worker.index}")
+            code = await worker.process.wait()
+            feeder.cancel()
+            await asyncio.gather(feeder, return_exceptions=True)
+            if self._stopping:
+                logging.info("Обработчик %d остановлен (код %s)", worker.index, code)
+                return
+            _restarts.labels(str(worker.index)).inc()
+            # обработчик, падающий сразу после старта (например, БД недоступна), перезапускается всё реже
+            failures = 0 if time.monotonic() - started > _STABLE_UPTIME else failures + 1
+            delay = min(settings.worker_restart_delay * 2 ** failures, _MAX_RESTART_DELAY)
+            logging.error("Обработчик %d завершился с кодом %s, перезапуск через %.0f с", worker.index, code, delay)
+            await asyncio.sleep(delay)
+
+    async def _forward(self, update: Dict[str, Any]) -> None:
+        worker = self.workers[shard_of(update, len(self.workers))]
+        # при переполнении очереди приём апдейтов ждёт обработчик
+        await worker.queue.put(json.dumps(update, ensure_ascii=False, separators=(",", ":")).encode() + b"\n")
+        worker.forwarded.inc()
+
+    # -- запуск -----------------------------------------------------------------
+
+    async def startup(self) -> None:
+        """Запускает обработчики; миграции и остальной старт выполняют они сами."""
+        if settings.metrics_port:
+            self._metrics_runner = await start_metrics_server()
+        self._supervisors = [
+            asyncio.create_task(self._supervise(worker), name=f"shard:supervise:{worker.index}")
+            for worker in self.workers
+        ]
+        logging.info("Супервизор: обработчиков %d", len(self.workers))
+
+    # -- приём апдейтов ---------------------------------------------------------
+
+    def request_stop(self) -> None:
+        if not self._stop.is_set():
+            logging.info("Получен сигнал остановки, прекращаем приём апдейтов")
+            self._stop.set()
+
+    async def _poll(self) -> None:
+        # апдейты не разбираются в модели aiogram: супервизору нужен только from.id
+        base = (settings.telegram_api_url or "https://api.telegram.org").rstrip("/")
+        url = f"{base}/bot{settings.bot_token}/getUpdates"
+        allowed_updates = self.dp.resolve_used_update_types()
+        self._session = ClientSession(timeout=ClientTimeout(total=_POLL_TIMEOUT + 10))
+        offset = 0
+        while True:
+            params = {"offset": offset, "timeout": _POLL_TIMEOUT, "allowed_updates": allowed_updates}
+            try:
+                async with self._session.post(url, json=params) as response:
+                    payload = await response.json()
+            except (ClientError, asyncio.TimeoutError, ValueError) as exc:
+                logging.warning("getUpdates: %r", exc)
+                await asyncio.sleep(1)
+                continue
+            if not payload.get("ok"):
+                logging.error("getUpdates: %s", payload.get("description"))
+                await asyncio.sleep(payload.get("parameters", {}).get("retry_after", 1))
+                continue
+            for update in payload["result"]:
+                offset = update["update_id"] + 1
+                await self._forward(update)
+
+    async def serve(self) -> None:
+        """Принимает апдейты до сигнала остановки, затем дописывает очереди и останавливает обработчики."""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except NotImplementedError:
+                pass
+        if settings.run_mode == "webhook":
+            runner = await start_webhook(self.dp, self.bot, create_forwarding_app(self._forward))
+            try:
+                await self._stop.wait()
+                stop_accepting(runner)
+                await self._stop_workers()
+            finally:
+                await runner.cleanup()
+            return
+        await self.bot.delete_webhook()
+        polling = asyncio.create_task(self._poll())
+        stop = asyncio.create_task(self._stop.wait())
+        await asyncio.wait((polling, stop), return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        polling.cancel()
+        (result,) = await asyncio.gather(polling, return_exceptions=True)
+        await self._stop_workers()
+        if isinstance(result, Exception):
+            raise result
+
+    # -- остановка --------------------------------------------------------------
+
+    async def _stop_workers(self) -> None:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(worker.queue.join() for worker in self.workers)),
+                settings.shutdown_drain_timeout,
+            )
+        except asyncio.TimeoutError:
+            logging.warning(
+                "Остановка: в очередях обработчиков осталось %d апдейтов",
+                sum(worker.queue.qsize() for worker in self.workers),
+            )
+        self._stopping = True
+        # EOF в stdin — сигнал обработчику: дождаться начатых апдейтов и завершиться
+        for worker in self.workers:
+            if worker.process is not None and worker.process.returncode is None:
+                worker.process.stdin.close()
+        left = max(0.0, settings.shutdown_drain_timeout - (time.perf_counter() - started))
+        # запас на сброс буферов и закрытие пула после ожидания апдейтов
+        done, pending = await asyncio.wait(self._supervisors, timeout=left + 10)
+        for task in pending:
+            task.cancel()
+        for worker in self.workers:
+            if worker.process is not None and worker.process.returncode is None:
+                logging.warning("Обработчик %d не завершился вовремя", worker.index)
+                worker.process.kill()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def shutdown(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+        await self.bot.session.close()
+
+
+# -- сторона обработчика --------------------------------------------------------
+
+
+async def _process(bot: Bot, dp: Dispatcher, update: Dict[str, Any]) -> None:
+    try:
+        result = await dp.feed_raw_update(bot, update)
+        # как при поллинге: метод, возвращённый хендлером, отправляется отдельным запросом
+        if isinstance(result, TelegramMethod):
+            await bot(result)
+    except Exception:
+        logging.exception("Ошибка обработки апдейта %s", update.get("update_id"))
+
+
+async def consume_updates(bot: Bot, dp: Dispatcher) -> None:
+    """Читает апдейты от супервизора (строка JSON на апдейт в stdin) до EOF.
+
+    Апдейты запускаются в порядке поступления, каждый отдельной задачей, как
+    при поллинге aiogram; их завершения ждёт вызывающий.
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=_MAX_LINE)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    tasks = set()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        task = asyncio.create_task(_process(bot, dp, json.loads(line)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+__all__ = [
+    "MISSING",
+    "TTLCache",
+]
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Маркер отсутствия значения: позволяет кэшировать None («купона нет»)
+MISSING: Any = object()
+
+
+class TTLCache(Generic[K, V]):
+    """Ограниченный LRU-кэш с временем жизни записей и счётчиками попаданий.
+
+    ``ttl=None`` — записи не устаревают, вытесняются только по LRU.
+    """
+
+    __slots__ = ("maxsize", "ttl", "hits", "misses", "_data")
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        """Есть ли живая запись; счётчики и порядок LRU не меняются."""
+        item = self._data.get(key)
+        return item is not None and (self.ttl is None or item[0] > time.monotonic())
+
+    def get(self, key: K, default: Any = MISSING) -> Any:
+        item = self._data.get(key)
+        if item is not None:
+            expires_at, value = item
+            if self.ttl is None or expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: K, value: V) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else 0.0
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
@@ -0,0 +1,153 @@
+import inspect
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type, Union
+
+from aiogram import Router, types
+from aiogram.filters.callback_data import CallbackData
+from aiogram.fsm.state import State
+
+__all__ = [
+    "CallbackRoute",
+    "CallbackIndex",
+    "handler_name",
+]
+
+Handler = Callable[..., Awaitable[Any]]
+StateArg = Union[State, str, None]
+
+
+class CallbackRoute:
+    """Хендлер нажатия и имена параметров, которые он принимает из ``data`` диспетчера."""
+
+    __slots__ = ("handler", "name", "params", "schema")
+
+    def __init__(self, handler: Handler, schema: Optional[Type[CallbackData]] = None) -> None:
+        self.handler = handler
+        self.name = handler.__name__
+        self.schema = schema
+        # первый параметр — сам CallbackQuery, остальные берутся из data по имени
+        self.params = tuple(list(inspect.signature(handler).parameters)[1:])
+
+    async def __call__(self, callback: types.CallbackQuery, data: Dict[str, Any]) -> Any:
+        kwargs = {name: data[name] for name in self.params if name in data}
+        if self.schema is not None and "callback_data" in self.params:
+            kwargs["callback_data"] = self.schema.unpack(callback.data)
+        return await self.handler(callback, **kwargs)
+
+
+def _state_key(state: StateArg) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+class CallbackIndex:
+    """Маршрутизация нажатий по словарям вместо перебора фильтров aiogram.
+
+    Маршрут ищется по паре (состояние FSM, callback_data) в таком порядке:
+
+    1. точное значение в текущем состоянии, затем в любом состоянии;
+    2. префикс в текущем состоянии, затем в любом (длинный префикс важнее короткого);
+    3. хендлер «по умолчанию» текущего состояния (например, выбор модуля по его ключу).
+
+    Префиксов разной длины единицы, поэтому поиск — несколько обращений к словарю
+    и не зависит от числа экранов. В router регистрируется один хендлер;
+    найденный маршрут кладётся в ``data["callback_route"]`` ещё на этапе фильтра,
+    так что middleware видят настоящее имя хендлера (см. :func:`handler_name`).
+    """
+
+    def __init__(self) -> None:
+        self._exact: Dict[Tuple[Optional[str], str], CallbackRoute] = {}
+        self._prefixes: Dict[Tuple[Optional[str], str], CallbackRoute] = {}
+        self._defaults: Dict[str, CallbackRoute] = {}
+        # длины зарегистрированных префиксов, от длинных к коротким
+        self._prefix_lengths: List[int] = []
+
+    # -- регистрация ----------------------------------------------------------
+
+    def exact(self, *values: str, state: StateArg = None) -> Callable[[Handler], Handler]:
+        """Хендлер для точных значений callback_data; ``state=None`` — в любом состоянии."""
+
+        def decorator(handler: Handler) -> Handler:
+            route = CallbackRoute(handler)
+            for value in values:
+                self._add(self._exact, (_state_key(state), value), route)
+            return handler
+
+        return decorator
+
+    def prefix(self, prefix: str, *, state: StateArg = None) -> Callable[[Handler], Handler]:
+        """Хендлер для callback_data, начинающихся с ``prefix``."""
+
+        def decorator(handler: Handler) -> Handler:
+            self._add_prefix(prefix, state, CallbackRoute(handler))
+            return handler
+
+        return decorator
+
+    def schema(self, schema: Type[CallbackData], *, state: StateArg = None) -> Callable[[Handler], Handler]:
+        """Хендлер для payload вида ``<prefix>:<поля>``; разобранный объект придёт в ``callback_data``."""
+
+        def decorator(handler: Handler) -> Handler:
+            self._add_prefix(schema.__prefix__ + schema.__separator__, state, CallbackRoute(handler, schema))
+            return handler
+
+        return decorator
+
+    def default(self, *, state: StateArg) -> Callable[[Handler], Handler]:
+        """Хендлер для всех прочих нажатий в состоянии ``state``."""
+
+        def decorator(handler: Handler) -> Handler:
+            self._add(self._defaults, _state_key(state), CallbackRoute(handler))
+            return handler
+
+        return decorator
+
+    def _add_prefix(self, prefix: str, state: StateArg, route: CallbackRoute) -> None:
+        self._add(self._prefixes, (_state_key(state), prefix), route)
+        if len(prefix) not in self._prefix_lengths:
+            self._prefix_lengths.append(len(prefix))
+            self._prefix_lengths.sort(reverse=True)
+
+    @staticmethod
+    def _add(table: Dict[Any, CallbackRoute], key: Any, route: CallbackRoute) -> None:
+        if key in table:
+            raise ValueError(f"Маршрут {key!r} уже занят хендлером {table[key].name}")
+        table[key] = route
+
+    # -- поиск ------------------------------------------------------------------
+
+    def resolve(self, data: str, state: Optional[str]) -> Optional[CallbackRoute]:
+        exact = self._exact
+        route = exact.get((state, data)) if state is not None else None
+        if route is None:
+            route = exact.get((None, data))
+        if route is not None:
+            return route
+        prefixes = self._prefixes
+        for length in self._prefix_lengths:
+            if length > len(data):
+                continue
+            head = data[:length]
+            route = (prefixes.get((state, head)) if state is not None else None) or prefixes.get((None, head))
+            if route is not None:
+                return route
+        return self._defaults.get(state) if state is not None else None
+
+    def attach(self, router: Router) -> None:
+        """Регистрирует в router единственный хендлер callback_query, который ведёт по индексу."""
+
+        async def match(callback: types.CallbackQuery, raw_state: Optional[str] = None) -> Any:
+            route = self.resolve(callback.data or "", raw_state)
+            return {"callback_route": route} if route is not None else False
+
+        async def dispatch(callback: types.CallbackQuery, callback_route: CallbackRoute, **data: Any) -> Any:
+            return await callback_route(callback, data)
+
+        router.callback_query.register(dispatch, match)
+
+
+def handler_name(data: Dict[str, Any]) -> Optional[str]:
+    """Имя хендлера апдейта: маршрут индекса нажатий или обычный хендлер aiogram."""
+    route = data.get("callback_route")
+    if route is not None:
+        return route.name
+    callback = getattr(data.get("handler"), "callback", None)
+    return getattr(callback, "__name__", None)
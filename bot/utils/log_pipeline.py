@@ -0,0 +1,135 @@
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Optional, Union
+
+__all__ = [
+    "EVENTS_LOGGER",
+    "setup_logging",
+    "log_event",
+    "truncate_preview",
+    "dropped_records",
+]
+
+# Логгер структурированных событий взаимодействия (кнопки, сообщения)
+EVENTS_LOGGER = "bot.events"
+
+_events = logging.getLogger(EVENTS_LOGGER)
+_dropped = 0
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который не блокирует цикл событий при переполнении очереди.
+
+    Запись, не поместившаяся в очередь, отбрасывается и учитывается в счётчике.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись; поля события кладутся на верхний уровень."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "event_fields", None)
+        if fields:
+            payload.update(fields)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Человекочитаемый формат: поля события дописываются как key=value."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = getattr(record, "event_fields", None)
+        if not fields:
+            return text
+        preview = fields.get("preview")
+        pairs = " ".join(f"{k}={v}" for k, v in fields.items() if k != "preview" and v is not None)
+        text = f"{text} | {pairs}"
+        if preview:
+            text = f"{text}\n{preview}"
+        return text
+
+
+def setup_logging(
+    *,
+    level: Union[int, str] = logging.INFO,
+    fmt: str = "json",
+    queue_size: int = 10000,
+) -> QueueListener:
+    """Настраивает корневой логгер на запись через очередь.
+
+    Обработчики событий кладут записи в очередь, форматирование и вывод
+    выполняет фоновый поток ``QueueListener``. Возвращает уже запущенный
+    listener — его нужно остановить (``stop()``) при завершении, чтобы
+    дописать хвост очереди.
+    """
+    if fmt == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter("\n%(asctime)s | %(levelname)s | %(message)s")
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(formatter)
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_DroppingQueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def truncate_preview(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[: limit - 1] + "…"
+
+
+def log_event(
+    message: str,
+    *,
+    level: int = logging.INFO,
+    sample: float = 1.0,
+    preview: Optional[Callable[[], str]] = None,
+    **fields: Any,
+) -> None:
+    """Пишет структурированное событие в логгер ``bot.events``.
+
+    ``preview`` — функция, строящая превью ответа; вызывается, только если
+    уровень включён и событие прошло сэмплирование. ``sample`` — доля
+    событий, которые попадут в лог (1.0 — все).
+    """
+    if not _events.isEnabledFor(level):
+        return
+    if sample < 1.0 and random.random() >= sample:
+        return
+    if preview is not None:
+        fields["preview"] = preview()
+    if sample < 1.0:
+        fields["sample"] = sample
+    _events.log(level, message, extra={"event_fields": fields})
+
+
+def dropped_records() -> int:
+    """Сколько записей отброшено из-за переполненной очереди логирования."""
+    return _dropped
@@ -0,0 +1,188 @@
+import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+__all__ = [
+    "DEFAULT_BUCKETS",
+    "Histogram",
+    "Counter",
+    "MetricFamily",
+    "Registry",
+    "REGISTRY",
+]
+
+# Границы корзин по умолчанию (секунды): от 0.5 мс до 10 с
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class Histogram:
+    """Кумулятивная гистограмма в стиле Prometheus: счётчики по корзинам, сумма и количество."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        self.bounds: Sequence[float] = tuple(sorted(buckets))
+        # последняя корзина — +Inf
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        """Число наблюдений ``<= bound`` для каждой границы и для +Inf."""
+        total = 0
+        result = []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip([*map(str, self.bounds), "+Inf"], self.cumulative())),
+        }
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+Child = Union[Histogram, Counter]
+
+
+class MetricFamily:
+    """Метрика с метками. Дочерние объекты создаются один раз и переиспользуются.
+
+    Все обновления идут из цикла событий одного потока, поэтому блокировки не нужны:
+    ``family.labels("x").inc()`` — это поиск в словаре и сложение.
+    """
+
+    __slots__ = ("name", "help", "kind", "labelnames", "buckets", "_children")
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children: Dict[LabelValues, Child] = {}
+
+    def labels(self, *values: str) -> Child:
+        child = self._children.get(values)
+        if child is None:
+            child = Histogram(self.buckets) if self.kind == "histogram" else Counter()
+            self._children[values] = child
+        return child
+
+    def __len__(self) -> int:
+        return len(self._children)
+
+    def get(self, *values: str) -> Optional[Child]:
+        """Уже созданный дочерний объект или None (без создания новой серии)."""
+        return self._children.get(values)
+
+    def items(self) -> List[Tuple[LabelValues, Child]]:
+        return list(self._children.items())
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [(n, v) for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = ",".join(
+        '%s="%s"' % (n, str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for n, v in pairs
+    )
+    return "{%s}" % escaped
+
+
+class Registry:
+    """Набор метрик процесса и их вывод в текстовом формате Prometheus."""
+
+    def __init__(self) -> None:
+        self._families: Dict[str, MetricFamily] = {}
+        # name -> (help, функция, возвращающая {label_values: value})
+        self._gauges: Dict[str, Tuple[str, Sequence[str], Callable[[], Dict[LabelValues, float]]]] = {}
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        existing = self._families.get(family.name)
+        if existing is not None:
+            return existing
+        self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        """Счётчик; имя по соглашению Prometheus оканчивается на ``_total``."""
+        return self._register(MetricFamily(name, help, "counter", labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> MetricFamily:
+        return self._register(MetricFamily(name, help, "histogram", labelnames, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Dict[LabelValues, float]],
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        """Gauge, значение которого вычисляется в момент выгрузки метрик."""
+        self._gauges[name] = (help, tuple(labelnames), collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in self._families.values():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in family.items():
+                if isinstance(child, Counter):
+                    lines.append(f"{family.name}{_format_labels(family.labelnames, values)} {child.value}")
+                    continue
+                bounds = [*map(repr, child.bounds), "+Inf"]
+                for bound, count in zip(bounds, child.cumulative()):
+                    labels = _format_labels(family.labelnames, values, ("le", bound))
+                    lines.append(f"{family.name}_bucket{labels} {count}")
+                labels = _format_labels(family.labelnames, values)
+                lines.append(f"{family.name}_sum{labels} {child.sum}")
+                lines.append(f"{family.name}_count{labels} {child.count}")
+        for name, (help, labelnames, collect) in self._gauges.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            try:
+                samples = collect()
+            except Exception:
+                # сломанный сборщик не должен ломать выгрузку остальных метрик
+                continue
+            for values, value in samples.items():
+                lines.append(f"{name}{_format_labels(labelnames, values)} {value}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+REGISTRY = Registry()
@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Generic, Hashable, List, Optional, TypeVar
+
+__all__ = ["TokenBucketStore"]
+
+K = TypeVar("K", bound=Hashable)
+
+
+class TokenBucketStore(Generic[K]):
+    """Набор token bucket'ов с ограниченной памятью.
+
+    Бакеты хранятся в порядке последнего обращения: самые давние — в начале,
+    поэтому простаивающие бакеты и переполнение вытесняются за O(1) на вызов.
+    Бакет, простоявший ``idle_ttl`` секунд, считается полным, и его можно
+    забыть без потери точности (при ``idle_ttl >= burst / rate``).
+    """
+
+    __slots__ = ("maxsize", "idle_ttl", "allowed", "rejected", "_buckets")
+
+    def __init__(self, maxsize: int, idle_ttl: float) -> None:
+        self.maxsize = maxsize
+        self.idle_ttl = idle_ttl
+        self.allowed = 0
+        self.rejected = 0
+        # key -> [tokens, last_refill]
+        self._buckets: "OrderedDict[K, List[float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def consume(self, key: K, rate: float, burst: float, now: Optional[float] = None) -> bool:
+        """Забирает один токен. False — лимит исчерпан."""
+        if now is None:
+            now = time.monotonic()
+        buckets = self._buckets
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = [burst, now]
+        else:
+            tokens = bucket[0] + (now - bucket[1]) * rate
+            bucket[0] = tokens if tokens < burst else burst
+            bucket[1] = now
+            buckets.move_to_end(key)
+        self._evict(now)
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            self.allowed += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        if len(buckets) > self.maxsize:
+            buckets.popitem(last=False)
+        # за вызов убираем не больше двух устаревших бакетов — амортизированно O(1)
+        for _ in range(2):
+            if not buckets:
+                return
+            oldest = next(iter(buckets.values()))
+            if now - oldest[1] < self.idle_ttl:
+                return
+            buckets.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"allowed": self.allowed, "rejected": self.rejected, "size": len(self._buckets)}
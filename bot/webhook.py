@@ -0,0 +1,88 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from config import settings
+
+__all__ = ["create_webhook_app", "create_forwarding_app", "start_webhook", "stop_accepting"]
+
+
+@web.middleware
+async def _reject_when_stopping(request: web.Request, handler):
+    if not request.app["accepting"]:
+        # при остановке апдейт не теряется: Telegram повторит доставку следующему экземпляру
+        return web.Response(status=503)
+    return await handler(request)
+
+
+@web.middleware
+async def _check_secret(request: web.Request, handler):
+    # заголовок проверяется здесь: SimpleRequestHandler aiogram 3.0.0b7 секрет не проверяет
+    if settings.webhook_secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != settings.webhook_secret:
+        return web.Response(status=401)
+    return await handler(request)
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot) -> web.Application:
+    """aiohttp-приложение, передающее апдейты из вебхука в тот же Dispatcher.
+
+    Апдейт обрабатывается внутри запроса (``handle_in_background=False``), поэтому
+    метод, который вернул хендлер (например, ``callback.answer()``), уходит
+    в Telegram прямо в ответе на вебхук, без отдельного исходящего запроса.
+    """
+    app = web.Application(middlewares=[_reject_when_stopping, _check_secret])
+    app["accepting"] = True
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=False,
+    ).register(app, path=settings.webhook_path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+def create_forwarding_app(forward: Callable[[Dict[str, Any]], Awaitable[None]]) -> web.Application:
+    """aiohttp-приложение супервизора: апдейт передаётся в ``forward`` как словарь
+    и подтверждается сразу, без ответа хендлера в теле (его обрабатывает другой процесс).
+    """
+
+    async def handle(request: web.Request) -> web.Response:
+        await forward(await request.json())
+        return web.Response()
+
+    app = web.Application(middlewares=[_reject_when_stopping, _check_secret])
+    app["accepting"] = True
+    app.router.add_post(settings.webhook_path, handle)
+    return app
+
+
+async def start_webhook(dp: Dispatcher, bot: Bot, app: Optional[web.Application] = None) -> web.AppRunner:
+    """Поднимает HTTP-сервер вебхука и регистрирует его в Telegram.
+
+    ``app`` по умолчанию — :func:`create_webhook_app`. Сервер останавливает
+    вызывающий: сначала :func:`stop_accepting`, после завершения начатых
+    апдейтов — ``runner.cleanup()``.
+    """
+    if app is None:
+        app = create_webhook_app(dp, bot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.webapp_host, port=settings.webapp_port)
+    await site.start()
+    logging.info("Вебхук слушает %s:%s%s", settings.webapp_host, settings.webapp_port, settings.webhook_path)
+    if settings.webhook_base_url:
+        await bot.set_webhook(
+            url=settings.webhook_base_url.rstrip("/") + settings.webhook_path,
+            secret_token=settings.webhook_secret,
+            max_connections=settings.webhook_max_connections,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+    return runner
+
+
+def stop_accepting(runner: web.AppRunner) -> None:
+    """Новые апдейты получают 503 (Telegram доставит их повторно), начатые дорабатывают."""
+    runner.app["accepting"] = False
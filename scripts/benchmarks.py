@@ -0,0 +1,225 @@
+"""Микробенчмарки горячих путей калькулятора: цены, клавиатуры, тексты экранов.
+
+Всё, что измеряется, выполняется на каждое нажатие: ``calculate_total``,
+клавиатуры шаблонов и модулей (из кэша и построение с нуля), карточка шаблона,
+итог расчёта из ``support_chosen`` вместе с ``get_contact_keyboard`` (quote URL)
+и превью для ``log_button``. Данные — встроенный справочник, для каждого шаблона
+берутся пустой и максимальный выбор модулей, поэтому результаты между запусками
+сопоставимы. БД и Telegram не нужны.
+
+    python scripts/benchmarks.py --save benchmarks/baseline.json    # снять базовую линию
+    python scripts/benchmarks.py --compare benchmarks/baseline.json # сравнить с ней
+
+При сравнении печатается изменение по каждому бенчмарку; если какой-то стал
+медленнее больше чем на ``--max-regression``, скрипт завершается с кодом 1.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BOT_DIR = Path(__file__).resolve().parent.parent / "bot"
+
+# настройки читаются при импорте config; токен бенчмаркам не нужен
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+sys.path.insert(0, str(BOT_DIR))
+
+Benchmark = Tuple[str, Callable[[], Any]]
+
+
+def _collect() -> List[Benchmark]:
+    """Набор бенчмарков на фиксированном встроенном справочнике (версия 0)."""
+    from handlers.navigation_menu_handlers import _button_preview, render_summary
+    from keyboards.cost_calculator_keyboard import (
+        CATEGORY_KEYS,
+        _build_modules_keyboard,
+        _build_template_keyboard,
+        _get_available_modules,
+        get_contact_keyboard,
+        get_modules_keyboard,
+        get_template_keyboard,
+    )
+    from services.catalog import current_catalog
+    from services.cost_calculator_service import calculate_total
+    from services.screens import _build_catalog_screens, catalog_screens, render_template_card
+
+    catalog = current_catalog()
+    benchmarks: List[Benchmark] = []
+    add = benchmarks.append
+
+    for category in CATEGORY_KEYS:
+        add((f"keyboard.template.cached[{category}]", lambda c=category: get_template_keyboard(c, catalog=catalog)))
+        add((f"keyboard.template.build[{category}]", lambda c=category: _build_template_keyboard(catalog, c)))
+
+    for template_key in catalog.templates:
+        available = _get_available_modules(catalog, template_key)
+        worst = list(available)
+        for label, selected in (("none", []), ("all", worst)):
+            case = f"{template_key}-{label}"
+            add((
+                f"pricing.calculate_total[{case}]",
+                lambda t=template_key, s=selected: calculate_total(template_key=t, module_keys=s, support_key="support_12"),
+            ))
+            add((
+                f"keyboard.modules.cached[{case}]",
+                lambda t=template_key, s=selected: get_modules_keyboard(selected=s, template_key=t, catalog=catalog),
+            ))
+            add((
+                f"keyboard.modules.build[{case}]",
+                lambda t=template_key, s=selected, a=available: _build_modules_keyboard(
+                    catalog, a, selected=s, template_key=t
+                ),
+            ))
+        add((f"render.template_card[{template_key}]", lambda t=template_key: render_template_card(catalog, t)))
+        add((f"screens.template_card[{template_key}]", lambda t=template_key: catalog_screens(catalog).template_cards[t]))
+        add((
+            f"render.summary[{template_key}-all-coupon]",
+            lambda t=template_key, s=worst: render_summary(catalog, t, s, "support_12", "BOT5"),
+        ))
+        summary, _ = render_summary(catalog, template_key, worst, "support_12", "BOT5")
+        add((f"log.button_preview[{template_key}-all]", lambda text=summary: _button_preview(text)))
+
+    add(("screens.build[catalog]", lambda: _build_catalog_screens(catalog)))
+
+    # самый длинный текст для URL: все модули, все входящие, купон
+    module_lines = "\n".join(f"🧩 {module['name']} — {module['price']} ₽" for module in catalog.modules.values())
+    add((
+        "keyboard.contact[all-modules]",
+        lambda: get_contact_keyboard(
+            owner_username="iwebix_man",
+            template="Интернет-магазин — 45000 ₽",
+            included=module_lines,
+            modules=module_lines,
+            support_line="🤝 Пакет поддержки: Поддержка 12 мес. (+5 500 ₽)",
+            total=150000,
+            coupon_code="BOT5",
+            discount=7500,
+        ),
+    ))
+    return benchmarks
+
+
+def measure(func: Callable[[], Any], *, min_time: float, repeat: int) -> Dict[str, float]:
+    """Лучшее и медианное время одного вызова (нс) по ``repeat`` сериям.
+
+    Число вызовов в серии подбирается так, чтобы серия шла не меньше ``min_time / repeat``.
+    """
+    target = min_time / repeat
+    loops = 1
+    while True:
+        started = time.perf_counter_ns()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter_ns() - started
+        if elapsed >= target * 1e9 or loops >= 1 << 24:
+            break
+        loops *= 2
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter_ns()
+            for _ in range(loops):
+                func()
+            samples.append((time.perf_counter_ns() - started) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {"best_ns": min(samples), "median_ns": statistics.median(samples), "loops": loops}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=BOT_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _fmt_ns(value: float) -> str:
+    if value >= 1e6:
+        return f"{value / 1e6:.2f} ms"
+    if value >= 1e3:
+        return f"{value / 1e3:.2f} µs"
+    return f"{value:.0f} ns"
+
+
+def _compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], max_regression: float) -> int:
+    base_results = baseline.get("results", {})
+    meta = baseline.get("meta", {})
+    print(f"\nbaseline: {meta.get('revision') or '?'} from {meta.get('created', '?')}, python {meta.get('python', '?')}")
+    print(f"{'benchmark':<52}{'baseline':>12}{'current':>12}{'change':>9}")
+    regressions = 0
+    for name, result in results.items():
+        base = base_results.get(name)
+        if base is None:
+            print(f"{name:<52}{'—':>12}{_fmt_ns(result['best_ns']):>12}{'new':>9}")
+            continue
+        change = result["best_ns"] / base["best_ns"] - 1
+        mark = ""
+        if change > max_regression:
+            regressions += 1
+            mark = "  <-- slower"
+        print(
+            f"{name:<52}{_fmt_ns(base['best_ns']):>12}{_fmt_ns(result['best_ns']):>12}{change * 100:>+8.1f}%{mark}"
+        )
+    missing = sorted(set(base_results) - set(results))
+    if missing:
+        print(f"not measured this run: {', '.join(missing)}")
+    print(f"\nregressions over {max_regression * 100:.0f}%: {regressions}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default=None, help="запускать только бенчмарки, содержащие подстроку")
+    parser.add_argument("--min-time", type=float, default=0.2, help="время на один бенчмарк (сек.)")
+    parser.add_argument("--repeat", type=int, default=5, help="число серий; в отчёт идут лучшая и медиана")
+    parser.add_argument("--save", type=Path, default=None, help="сохранить результаты в JSON (базовая линия)")
+    parser.add_argument("--compare", type=Path, default=None, help="сравнить с сохранённым JSON")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="допустимое замедление (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, func in _collect():
+        if args.filter and args.filter not in name:
+            continue
+        func()  # прогрев: кэши клавиатур и ленивые структуры справочника
+        results[name] = measure(func, min_time=args.min_time, repeat=args.repeat)
+        print(f"{name:<52}{_fmt_ns(results[name]['best_ns']):>12}  (median {_fmt_ns(results[name]['median_ns'])})")
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "meta": {
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "revision": _git_revision(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "min_time": args.min_time,
+                "repeat": args.repeat,
+            },
+            "results": results,
+        }
+        args.save.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nsaved {len(results)} results to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if _compare(results, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""Фейковый отправитель апдейтов Telegram для нагрузочного теста режима вебхука.
+
+Скрипт изображает серверы Telegram: параллельно для ``--users`` пользователей
+прогоняет сценарий нажатий (викторина → калькулятор) и шлёт апдейты POST-запросами
+на вебхук бота. Ответы вебхука с inline-методом (answerCallbackQuery) считаются
+отдельно. Флаг ``--api-port`` дополнительно поднимает заглушку Bot API,
+чтобы исходящие запросы бота не уходили в Telegram:
+
+    TELEGRAM_API_URL=http://127.0.0.1:8081 RUN_MODE=webhook WEBHOOK_SECRET=s python bot/main.py
+    python scripts/fake_telegram_sender.py --url http://127.0.0.1:8080/webhook --secret s --api-port 8081
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from aiohttp import ClientSession, web
+
+SCENARIO = [
+    "/start",
+    "need_bot",
+    "nb_opt:0:1",
+    "nb_next",
+    "nb_opt:1:0",
+    "nb_next",
+    "nb_opt:2:2",
+    "need_bot_coupon",
+    "calc_cost",
+    "services",
+    "tpl:infobot",
+    "calendar",
+    "mailing",
+    "calendar",
+    "done_modules",
+    "support_6",
+]
+
+# вызовы заглушки Bot API по методам (как их назвал бот, например editMessageText)
+API_CALLS: Counter = Counter()
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1000)
+
+
+def _user(user_id: int) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": f"Load{user_id}", "username": f"load{user_id}"}
+
+
+def _message(user_id: int, text: str) -> Dict[str, Any]:
+    return {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": _user(user_id),
+        "text": text,
+    }
+
+
+def build_update(user_id: int, action: str) -> Dict[str, Any]:
+    if action.startswith("/"):
+        return {"update_id": next(_update_ids), "message": _message(user_id, action)}
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "message": _message(user_id, "..."),
+            "data": action,
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# Заглушка Bot API: отвечает на любой метод правдоподобным результатом
+# ---------------------------------------------------------------------------
+
+
+def _fake_result(method: str, payload: Dict[str, Any]) -> Any:
+    method = method.lower()
+    chat_id = int(payload.get("chat_id") or 1)
+    message = {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "text": str(payload.get("text", "")),
+    }
+    if method == "getme":
+        return {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+    if method == "sendmediagroup":
+        media = payload.get("media") or "[]"
+        count = len(json.loads(media)) if isinstance(media, str) else len(media)
+        return [dict(message, message_id=next(_message_ids)) for _ in range(count)]
+    if method.startswith("send") or method.startswith("edit") or method == "copymessage":
+        return message
+    return True
+
+
+async def _fake_api_handler(request: web.Request) -> web.Response:
+    method = request.match_info["method"]
+    API_CALLS[method] += 1
+    latency = request.app["latency"]
+    if latency:
+        await asyncio.sleep(latency)
+    if request.content_type == "application/json":
+        payload = await request.json()
+    else:
+        payload = dict(await request.post())
+    return web.json_response({"ok": True, "result": _fake_result(method, payload)})
+
+
+async def start_fake_api(port: int, latency: float = 0.0) -> web.AppRunner:
+    """Поднимает заглушку Bot API; ``latency`` — искусственная задержка ответа (сек.)."""
+    app = web.Application()
+    app["latency"] = latency
+    app.router.add_post("/bot{token}/{method}", _fake_api_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+# ---------------------------------------------------------------------------
+# Нагрузка
+# ---------------------------------------------------------------------------
+
+
+async def run_user(session: ClientSession, args: argparse.Namespace, user_id: int, stats: Dict[str, List]) -> None:
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+    for action in SCENARIO:
+        started = time.perf_counter()
+        async with session.post(args.url, json=build_update(user_id, action), headers=headers) as resp:
+            body = await resp.read()
+            stats["latency"].append(time.perf_counter() - started)
+            if resp.status != 200:
+                stats["errors"].append(resp.status)
+            elif body and b"method" in body:
+                stats["inline"].append(action)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--secret", default=None)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--api-port", type=int, default=None, help="поднять заглушку Bot API на этом порту")
+    parser.add_argument("--first-user-id", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    api_runner = await start_fake_api(args.api_port) if args.api_port else None
+    stats: Dict[str, List] = {"latency": [], "errors": [], "inline": []}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(user_id: int) -> None:
+        async with semaphore:
+            await run_user(session, args, user_id, stats)
+
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*(limited(args.first_user_id + i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    latency = sorted(stats["latency"])
+    total = len(latency)
+    print(f"updates: {total}, errors: {len(stats['errors'])}, inline answers: {len(stats['inline'])}")
+    print(f"throughput: {total / elapsed:.1f} updates/s over {elapsed:.2f}s")
+    if latency:
+        def pct(q: float) -> float:
+            return latency[min(total - 1, int(q * total))] * 1000
+
+        print(
+            f"latency ms: mean {statistics.mean(latency) * 1000:.1f}, "
+            f"p50 {pct(0.50):.1f}, p95 {pct(0.95):.1f}, p99 {pct(0.99):.1f}"
+        )
+    if api_runner is not None:
+        await api_runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
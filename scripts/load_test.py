@@ -0,0 +1,232 @@
+"""Офлайн-нагрузочный тест бота целиком: диспетчер, FSM, БД и исходящие запросы.
+
+В отличие от ``fake_telegram_sender.py`` (HTTP-запросы к работающему вебхуку),
+скрипт собирает бота в своём процессе теми же ``create_bot``/``create_dispatcher``
+и ``Lifecycle.startup``, что и ``bot/main.py``, и подаёт апдейты прямо в
+``Dispatcher.feed_raw_update``. Исходящие запросы уходят в заглушку Bot API
+(она считает вызовы по методам), данные — в настоящий PostgreSQL:
+уже запущенный (``--database-url``) или временный, поднятый через
+``initdb``/``pg_ctl`` (``--pg-tmp``).
+
+Каждый пользователь проходит сценарий /start → викторина → калькулятор →
+шаблон → модули → поддержка с паузами ``--think-time`` между шагами.
+В конце печатаются пропускная способность, p50/p95/p99 по шагам,
+обращения к БД по операциям и вызовы Bot API:
+
+    python scripts/load_test.py --pg-tmp --users 2000 --concurrency 500
+
+По умолчанию лимиты исходящих запросов Telegram (OUTBOUND_*) сняты, чтобы
+мерить сам бот; ``--telegram-limits`` оставляет их как в проде. Лимиты нажатий
+(THROTTLE_*) действуют всегда — отклонённые нажатия печатаются отдельно.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fake_telegram_sender import API_CALLS, build_update, start_fake_api
+
+BOT_DIR = Path(__file__).resolve().parent.parent / "bot"
+
+# (шаг отчёта, действие пользователя)
+SCRIPT: List[Tuple[str, str]] = [
+    ("start", "/start"),
+    ("need_bot", "need_bot"),
+    ("quiz_answer", "nb_opt:0:1"),
+    ("quiz_next", "nb_next"),
+    ("quiz_answer", "nb_opt:1:0"),
+    ("quiz_next", "nb_next"),
+    ("quiz_answer", "nb_opt:2:2"),
+    ("quiz_coupon", "need_bot_coupon"),
+    ("calc_cost", "calc_cost"),
+    ("category", "services"),
+    ("template", "tpl:infobot"),
+    ("module_toggle", "calendar"),
+    ("module_toggle", "mailing"),
+    ("module_toggle", "calendar"),
+    ("done_modules", "done_modules"),
+    ("support", "support_6"),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_temp_postgres() -> Tuple[str, str]:
+    """Временный кластер PostgreSQL: возвращает (каталог данных, DSN)."""
+    initdb, pg_ctl = shutil.which("initdb"), shutil.which("pg_ctl")
+    if not initdb or not pg_ctl:
+        sys.exit("--pg-tmp: initdb/pg_ctl не найдены в PATH")
+    data_dir = tempfile.mkdtemp(prefix="iwebix-load-pg-")
+    port = _free_port()
+    subprocess.run([initdb, "-D", data_dir, "-U", "postgres", "-A", "trust"], check=True, stdout=subprocess.DEVNULL)
+    options = f"-p {port} -k {data_dir} -c listen_addresses=127.0.0.1 -c fsync=off"
+    subprocess.run(
+        [pg_ctl, "-D", data_dir, "-o", options, "-l", os.path.join(data_dir, "server.log"), "-w", "start"],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return data_dir, f"postgresql://postgres@127.0.0.1:{port}/postgres"
+
+
+def _stop_temp_postgres(data_dir: str) -> None:
+    subprocess.run([shutil.which("pg_ctl"), "-D", data_dir, "-m", "fast", "-w", "stop"], stdout=subprocess.DEVNULL)
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _configure_env(args: argparse.Namespace, api_port: int, database_url: str) -> None:
+    # настройки бота читаются при импорте config, поэтому окружение готовится заранее
+    os.environ["BOT_TOKEN"] = "123456:load-test"
+    os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{api_port}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["METRICS_PORT"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not args.telegram_limits:
+        os.environ.setdefault("OUTBOUND_GLOBAL_RATE", "1000000")
+        os.environ.setdefault("OUTBOUND_GLOBAL_BURST", "1000000")
+        os.environ.setdefault("OUTBOUND_CHAT_RATE", "1000000")
+        os.environ.setdefault("OUTBOUND_CHAT_BURST", "1000000")
+    sys.path.insert(0, str(BOT_DIR))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _query_counts() -> Dict[str, int]:
+    from database.connection import pool_stats
+
+    return {name: snapshot["count"] for name, snapshot in pool_stats()["queries"].items()}
+
+
+def _throttled_total() -> int:
+    from utils.metrics import REGISTRY
+
+    family = REGISTRY.counter("bot_throttled_callbacks_total", "", ("group",))
+    return sum(child.value for _, child in family.items())
+
+
+async def run_user(bot: Any, dp: Any, args: argparse.Namespace, user_id: int, stats: Dict[str, Any]) -> None:
+    from aiogram.methods import TelegramMethod
+
+    for step, action in SCRIPT:
+        started = time.perf_counter()
+        try:
+            result = await dp.feed_raw_update(bot, build_update(user_id, action))
+            # как при поллинге: метод, возвращённый хендлером, отправляется отдельным запросом
+            if isinstance(result, TelegramMethod):
+                await bot(result)
+        except Exception as exc:
+            stats["errors"][f"{step}: {type(exc).__name__}"] += 1
+        stats["latency"][step].append(time.perf_counter() - started)
+        if args.think_time:
+            await asyncio.sleep(args.think_time * random.uniform(0.5, 1.5))
+
+
+def _report(stats: Dict[str, Any], elapsed: float, queries: Dict[str, int], throttled: int) -> None:
+    total = sum(len(values) for values in stats["latency"].values())
+    print(f"updates: {total} in {elapsed:.2f}s, throughput {total / elapsed:.1f} updates/s")
+    print(f"errors: {sum(stats['errors'].values())}, throttled callbacks: {throttled}")
+    for name, count in sorted(stats["errors"].items(), key=lambda item: -item[1]):
+        print(f"  {name}: {count}")
+
+    print(f"\n{'step':<14}{'count':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for step in dict.fromkeys(step for step, _ in SCRIPT):
+        values = sorted(stats["latency"][step])
+        if not values:
+            continue
+        print(
+            f"{step:<14}{len(values):>8}{statistics.mean(values) * 1000:>9.2f}"
+            f"{_percentile(values, 0.50) * 1000:>9.2f}{_percentile(values, 0.95) * 1000:>9.2f}"
+            f"{_percentile(values, 0.99) * 1000:>9.2f}"
+        )
+
+    print(f"\nDB operations: {sum(queries.values())} ({sum(queries.values()) / max(total, 1):.2f} per update)")
+    for name, count in sorted(queries.items(), key=lambda item: -item[1]):
+        print(f"  {name:<40}{count:>8}")
+
+    print(f"\nBot API calls: {sum(API_CALLS.values())} ({sum(API_CALLS.values()) / max(total, 1):.2f} per update)")
+    for method, count in API_CALLS.most_common():
+        print(f"  {method:<40}{count:>8}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    from lifecycle import Lifecycle
+    from main import create_bot, create_dispatcher
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    lifecycle = Lifecycle(bot, dp)
+    await lifecycle.startup()
+    stats: Dict[str, Any] = {"latency": defaultdict(list), "errors": defaultdict(int)}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(index: int) -> None:
+        # пользователи приходят равномерно в течение --ramp секунд
+        if args.ramp:
+            await asyncio.sleep(args.ramp * index / args.users)
+        async with semaphore:
+            await run_user(bot, dp, args, args.first_user_id + index, stats)
+
+    try:
+        API_CALLS.clear()
+        queries_before = _query_counts()
+        throttled_before = _throttled_total()
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(i) for i in range(args.users)))
+        elapsed = time.perf_counter() - started
+        queries_after = _query_counts()
+        queries = {
+            name: count - queries_before.get(name, 0)
+            for name, count in queries_after.items()
+            if count - queries_before.get(name, 0)
+        }
+        _report(stats, elapsed, queries, _throttled_total() - throttled_before)
+    finally:
+        await lifecycle.shutdown()
+
+
+async def main(args: argparse.Namespace) -> None:
+    api_port = args.api_port or _free_port()
+    api_runner = await start_fake_api(api_port, latency=args.api_latency)
+    data_dir: Optional[str] = None
+    database_url = args.database_url
+    if args.pg_tmp:
+        data_dir, database_url = _start_temp_postgres()
+    elif database_url is None:
+        sys.exit("укажите --database-url или --pg-tmp")
+    try:
+        _configure_env(args, api_port, database_url)
+        await run(args)
+    finally:
+        await api_runner.cleanup()
+        if data_dir is not None:
+            _stop_temp_postgres(data_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200, help="одновременно активных пользователей")
+    parser.add_argument("--ramp", type=float, default=5.0, help="за сколько секунд приходят все пользователи")
+    parser.add_argument("--think-time", type=float, default=0.5, help="средняя пауза между шагами (сек.)")
+    parser.add_argument("--first-user-id", type=int, default=20_000_000)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--pg-tmp", action="store_true", help="поднять временный PostgreSQL (initdb/pg_ctl)")
+    parser.add_argument("--api-port", type=int, default=None, help="порт заглушки Bot API (по умолчанию свободный)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа заглушки Bot API (сек.)")
+    parser.add_argument("--telegram-limits", action="store_true", help="не снимать лимиты OUTBOUND_*")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# модули бота импортируются как в bot/main.py: из каталога bot
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+os.environ.setdefault("BOT_TOKEN", "42:TEST")
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("aiogram")
+
+from aiogram import Bot, Dispatcher
+from aiohttp.test_utils import TestClient, TestServer
+
+import webhook
+from config import settings
+
+SECRET = "s3cret"
+UPDATE = {"update_id": 1}
+
+
+def _post_statuses(app, headers_list):
+    async def run():
+        statuses = []
+        async with TestClient(TestServer(app)) as client:
+            for headers in headers_list:
+                response = await client.post(settings.webhook_path, json=UPDATE, headers=headers)
+                statuses.append(response.status)
+        return statuses
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def secret(monkeypatch):
+    monkeypatch.setattr(settings, "webhook_secret", SECRET)
+
+
+def test_webhook_rejects_missing_or_wrong_secret(secret):
+    app = webhook.create_webhook_app(Dispatcher(), Bot("42:TEST"))
+    statuses = _post_statuses(
+        app,
+        [
+            {},
+            {"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+            {"X-Telegram-Bot-Api-Secret-Token": SECRET},
+        ],
+    )
+    assert statuses == [401, 401, 200]
+
+
+def test_forwarding_app_rejects_missing_or_wrong_secret(secret):
+    forwarded = []
+
+    async def forward(update):
+        forwarded.append(update)
+
+    statuses = _post_statuses(
+        webhook.create_forwarding_app(forward),
+        [
+            {},
+            {"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+            {"X-Telegram-Bot-Api-Secret-Token": SECRET},
+        ],
+    )
+    assert statuses == [401, 401, 200]
+    assert forwarded == [UPDATE]